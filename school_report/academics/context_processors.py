@@ -1,16 +1,28 @@
 """
 Context processors for the academics app.
 """
-from .views import get_current_school_year_and_term
+from django.utils.functional import SimpleLazyObject
+
+from core.context import get_request_calendar
+
 
 def current_school_year_and_term(request):
     """
     Context processor to add current school year and term to all templates.
-    Uses the session-based function to avoid repeated database queries.
+
+    The values are lazy: nothing is looked up unless a template actually uses
+    them, and then only once per request (see core.context.get_request_calendar).
     """
     # Only process if user is authenticated
     if not request.user.is_authenticated:
         return {}
 
-    # Use the helper function that handles session caching
-    return get_current_school_year_and_term(request)
+    def calendar_value(index):
+        return SimpleLazyObject(lambda: get_request_calendar(request)[index])
+
+    return {
+        'current_year': calendar_value(0),
+        'current_term': calendar_value(1),
+        'vacation_status': calendar_value(2),
+        'is_on_vacation': SimpleLazyObject(lambda: get_request_calendar(request)[2] is not None),
+    }
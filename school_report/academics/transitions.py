@@ -0,0 +1,334 @@
+"""
+Whole-school academic transition.
+
+Applies the Std 5 → Inf 1 graduation/advancement sequence for every standard
+(and every group within a standard) in a single batched transaction, instead of
+the one-standard-at-a-time flow in GraduateStudentsView.
+"""
+import csv
+import io
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.audit import audit_changeset
+from core.cache import bump_school_version
+
+from .models import SchoolYear, Term, AcademicTransition, SchoolEnrollment, StandardEnrollment
+
+
+# Processing order: Std 5 graduates first, then each standard advances into the
+# slot the standard above it has just vacated.
+TRANSITION_ORDER = ['STD5', 'STD4', 'STD3', 'STD2', 'STD1', 'INF2', 'INF1']
+
+# Standard code -> standard code for the new year (STD5 graduates)
+ADVANCEMENT_MAP = {
+    'STD4': 'STD5',
+    'STD3': 'STD4',
+    'STD2': 'STD3',
+    'STD1': 'STD2',
+    'INF2': 'STD1',
+    'INF1': 'INF2',
+}
+
+# Standard code -> AcademicTransition flag field
+TRANSITION_FLAGS = {
+    'STD5': 'std5_processed',
+    'STD4': 'std4_processed',
+    'STD3': 'std3_processed',
+    'STD2': 'std2_processed',
+    'STD1': 'std1_processed',
+    'INF2': 'inf2_processed',
+    'INF1': 'inf1_processed',
+}
+
+ADVANCE = 'advance'
+REPEAT = 'repeat'
+
+# Accepted spellings in decision files/API payloads
+DECISION_ALIASES = {
+    'advance': ADVANCE,
+    'promote': ADVANCE,
+    'graduate': ADVANCE,
+    'repeat': REPEAT,
+    'retain': REPEAT,
+}
+
+
+class TransitionError(Exception):
+    """Raised when a school transition cannot be run."""
+    pass
+
+
+def mark_standard_processed(transition, standard_code, when=None):
+    """
+    Set the AcademicTransition flag (and timestamp) for a standard code.
+    Returns the list of updated field names, or [] for an unknown code.
+    """
+    field_name = TRANSITION_FLAGS.get(standard_code)
+    if not field_name:
+        return []
+
+    setattr(transition, field_name, True)
+    setattr(transition, f'{field_name}_at', when or timezone.now())
+    return [field_name, f'{field_name}_at']
+
+
+def normalize_decision(value):
+    """Map a raw decision string to ADVANCE/REPEAT, or None if unrecognised."""
+    if value is None:
+        return None
+    return DECISION_ALIASES.get(str(value).strip().lower())
+
+
+def parse_decisions_csv(file_obj):
+    """
+    Parse a decisions CSV with `student_id` and `decision` columns.
+
+    `student_id` is the student's database id (as shown on the graduation
+    page). Returns (decisions, errors) where decisions maps the raw key to
+    ADVANCE/REPEAT.
+    """
+    content = file_obj.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+
+    reader = csv.DictReader(io.StringIO(content))
+    fieldnames = [name.strip().lower() for name in (reader.fieldnames or [])]
+    if 'student_id' not in fieldnames or 'decision' not in fieldnames:
+        raise TransitionError("Decisions file must have 'student_id' and 'decision' columns.")
+
+    decisions = {}
+    errors = []
+    for row_num, row in enumerate(reader, start=2):
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        key = row.get('student_id')
+        if not key:
+            continue
+
+        decision = normalize_decision(row.get('decision'))
+        if decision is None:
+            errors.append(f"Row {row_num}: unknown decision '{row.get('decision')}' for student {key}")
+            continue
+
+        decisions[key] = decision
+
+    return decisions, errors
+
+
+def get_transition_years(school):
+    """
+    Return (from_year, to_year) for the school's summer transition.
+    Raises TransitionError outside of summer vacation or without a previous year.
+    """
+    from core.utils import get_current_year_and_term
+
+    current_year, _, vacation_status = get_current_year_and_term(school=school)
+    if vacation_status != 'summer':
+        raise TransitionError("Academic transition is only available during summer vacation period.")
+
+    from_year = SchoolYear.objects.filter(
+        school=school,
+        start_year=current_year.start_year - 1
+    ).first()
+    if not from_year:
+        raise TransitionError(f"No previous academic year found for {school.name}.")
+
+    return from_year, current_year
+
+
+def _current_roster(school, from_year):
+    """
+    Latest from_year standard per active student, in one query.
+    Returns {student_id: standard_id} (standard_id is None for unassigned).
+    """
+    rows = StandardEnrollment.objects.filter(
+        year=from_year,
+        student__school_registrations__school=school,
+        student__school_registrations__is_active=True,
+    ).order_by('student_id', '-created_at', '-id').values_list('student_id', 'standard_id')
+
+    roster = {}
+    for student_id, standard_id in rows:
+        # First row per student is the latest (history table pattern)
+        roster.setdefault(student_id, standard_id)
+    return roster
+
+
+def _recommendations(school, from_year):
+    """Term 3 advancement recommendations as {student_id: bool}."""
+    from reports.models import StudentTermReview
+
+    final_term = Term.objects.filter(year=from_year, term_number=3).first()
+    if not final_term:
+        return {}
+
+    return dict(
+        StudentTermReview.objects.filter(
+            term=final_term,
+            student__school_registrations__school=school,
+        ).values_list('student_id', 'recommend_for_advancement')
+    )
+
+
+def _resolve_decision_keys(decisions, roster):
+    """
+    Translate decision keys (student ids as str/int) into ids on the roster.
+    Returns ({student_id: decision}, [unknown keys]).
+    """
+    resolved = {}
+    unknown = []
+    for key, decision in decisions.items():
+        key = str(key).strip()
+        if key.isdigit() and int(key) in roster:
+            resolved[int(key)] = decision
+        else:
+            unknown.append(key)
+    return resolved, unknown
+
+
+def run_school_transition(school, decisions=None, performed_by=None, dry_run=False):
+    """
+    Graduate/advance every standard of a school in one batched transaction.
+
+    Args:
+        school: School instance
+        decisions: optional {student key: 'advance'|'repeat'}; students without
+            a decision fall back to their Term 3 recommendation (default advance)
+        performed_by: UserProfile recorded as enrolled_by / created_by
+        dry_run: compute the summary and roll everything back
+
+    The run is all-or-nothing: if any standard fails (e.g. TransitionError
+    for a missing next standard) nothing is changed. Standards whose
+    AcademicTransition flag is already set, because they were processed one
+    at a time in GraduateStudentsView, are skipped. Records are written with
+    bulk_create/update, so per-row model signals (activity stream) are not
+    fired; the new enrollments and graduations are audited as one changeset.
+
+    Returns a summary dict.
+    """
+    from schools.models import Standard
+
+    from_year, to_year = get_transition_years(school)
+    today = timezone.now().date()
+
+    summary = {
+        'school': school.slug,
+        'from_year': str(from_year),
+        'to_year': str(to_year),
+        'dry_run': dry_run,
+        'standards': [],
+        'skipped_standards': [],
+        'graduated': 0,
+        'advanced': 0,
+        'repeated': 0,
+        'already_placed': 0,
+        'unknown_students': [],
+    }
+
+    with transaction.atomic():
+        with audit_changeset(
+            performed_by, f"Year transition {from_year} to {to_year}", school=school
+        ) as changeset:
+            transition, _ = AcademicTransition.objects.select_for_update().get_or_create(
+                school=school,
+                from_year=from_year,
+                to_year=to_year,
+                defaults={'created_by': performed_by},
+            )
+
+            # Everything the run needs, loaded up front
+            standards = list(Standard.objects.filter(school=school).order_by('name', 'group_number'))
+            standards_by_id = {standard.id: standard for standard in standards}
+            standards_by_key = {(standard.name, standard.group_number): standard for standard in standards}
+            first_group = {}
+            for standard in standards:
+                first_group.setdefault(standard.name, standard)
+
+            roster = _current_roster(school, from_year)
+            recommendations = _recommendations(school, from_year)
+            resolved, unknown = _resolve_decision_keys(decisions or {}, roster)
+            summary['unknown_students'] = unknown
+
+            # Students who already have a placement in the new year are left alone
+            already_placed = set(
+                StandardEnrollment.objects.filter(
+                    year=to_year, student_id__in=roster.keys()
+                ).values_list('student_id', flat=True)
+            )
+
+            # Group the roster by standard code
+            by_code = {code: [] for code in TRANSITION_ORDER}
+            for student_id, standard_id in roster.items():
+                standard = standards_by_id.get(standard_id)
+                if standard is not None and standard.name in by_code:
+                    by_code[standard.name].append((student_id, standard))
+
+            for code in TRANSITION_ORDER:
+                flag = TRANSITION_FLAGS[code]
+                if getattr(transition, flag):
+                    summary['skipped_standards'].append(code)
+                    continue
+
+                graduating = []
+                new_enrollments = []
+                counts = {'code': code, 'graduated': 0, 'advanced': 0, 'repeated': 0, 'already_placed': 0}
+
+                for student_id, standard in by_code[code]:
+                    if student_id in already_placed:
+                        counts['already_placed'] += 1
+                        continue
+
+                    decision = resolved.get(student_id)
+                    if decision is None:
+                        decision = ADVANCE if recommendations.get(student_id, True) else REPEAT
+
+                    if decision == REPEAT:
+                        target = standard
+                        counts['repeated'] += 1
+                    elif code == 'STD5':
+                        graduating.append(student_id)
+                        counts['graduated'] += 1
+                        continue
+                    else:
+                        next_code = ADVANCEMENT_MAP[code]
+                        # Keep the student's group; fall back to the first group of the next standard
+                        target = standards_by_key.get((next_code, standard.group_number)) or first_group.get(next_code)
+                        if target is None:
+                            raise TransitionError(f"Next standard {next_code} not found for {school.name}.")
+                        counts['advanced'] += 1
+
+                    new_enrollments.append(StandardEnrollment(
+                        year=to_year,
+                        standard=target,
+                        student_id=student_id,
+                        enrolled_by=performed_by,
+                    ))
+
+                if graduating:
+                    # Only the current registration; older inactive ones keep their graduation_date
+                    graduated = SchoolEnrollment.objects.filter(
+                        school=school, student_id__in=graduating, is_active=True
+                    )
+                    changeset.log_updated(
+                        SchoolEnrollment, list(graduated.values_list('pk', flat=True)),
+                        is_active=False, graduation_date=today
+                    )
+                    graduated.update(is_active=False, graduation_date=today, updated_at=timezone.now())
+                if new_enrollments:
+                    StandardEnrollment.objects.bulk_create(new_enrollments, batch_size=500)
+                    changeset.log_created(new_enrollments)
+                transition.save(update_fields=mark_standard_processed(transition, code))
+
+                summary['standards'].append(counts)
+                for key in ('graduated', 'advanced', 'repeated', 'already_placed'):
+                    summary[key] += counts[key]
+
+        # After the changeset block, which writes the changeset on exit
+        if dry_run:
+            transaction.set_rollback(True)
+        elif summary['standards']:
+            # bulk_create/update skip model signals, so invalidate cached rosters here
+            transaction.on_commit(lambda: bump_school_version(school.id))
+
+    return summary
@@ -13,4 +13,5 @@ urlpatterns = [
     # Academic Transition
     path('transition/', views.TransitionDashboardView.as_view(), name='transition_dashboard'),
     path('transition/graduate/<str:standard_code>/', views.GraduateStudentsView.as_view(), name='graduate_students'),
+    path('transition/run/', views.TransitionRunView.as_view(), name='transition_run'),
 ]
@@ -1,7 +1,11 @@
+import json
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.views import View
 from django.views.generic import CreateView, UpdateView, DeleteView, ListView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q, Count
 from django import forms
 from django.core.exceptions import ValidationError
@@ -12,6 +16,11 @@ from .models import SchoolYear, Term, AcademicTransition, StandardEnrollment
 from schools.models import School, Standard, Student
 from core.mixins import SchoolAdminRequiredMixin, SchoolAccessRequiredMixin
 from core.utils import get_current_year_and_term
+from core.activity_buffer import collapse_activities
+from core.audit import audit_changeset
+from .transitions import (
+    mark_standard_processed, normalize_decision, parse_decisions_csv, run_school_transition, TransitionError
+)
 
 class YearForm(forms.ModelForm):
     """
@@ -216,13 +225,8 @@ class YearUpdateView(SchoolAdminRequiredMixin, UpdateView):
     def form_valid(self, form):
         response = super().form_valid(form)
 
-        # Clear any existing session data to force recalculation
-        if 'current_year_id' in self.request.session:
-            del self.request.session['current_year_id']
-        if 'current_term' in self.request.session:
-            del self.request.session['current_term']
-        if 'is_on_vacation' in self.request.session:
-            del self.request.session['is_on_vacation']
+        # Saving the year bumps the school's cache version, which refreshes
+        # the session snapshot on the next request (AuthContextMiddleware)
 
         messages.success(self.request, "School year has been updated successfully!")
         return response
@@ -295,13 +299,8 @@ class SchoolYearSetupView(SchoolAdminRequiredMixin, CreateView):
         # Save the form
         year = form.save()
 
-        # Clear any existing session data to force recalculation
-        if 'current_year_id' in self.request.session:
-            del self.request.session['current_year_id']
-        if 'current_term' in self.request.session:
-            del self.request.session['current_term']
-        if 'is_on_vacation' in self.request.session:
-            del self.request.session['is_on_vacation']
+        # Saving the year bumps the school's cache version, which refreshes
+        # the session snapshot on the next request (AuthContextMiddleware)
 
         messages.success(self.request, "School year has been set up successfully!")
         return redirect(self.get_success_url())
@@ -315,51 +314,17 @@ class SchoolYearSetupView(SchoolAdminRequiredMixin, CreateView):
 def get_current_school_year_and_term(request):
     """
     Helper function to determine the current school year and term
-    Uses session for caching to avoid repeated database queries
+    Uses the request calendar (per-school cache, memoized per request)
     """
-    # Check if we have cached data in the session
-    if 'current_year_id' in request.session and 'current_term' in request.session:
-        try:
-            current_year = SchoolYear.objects.get(pk=request.session['current_year_id'])
-            current_term = request.session['current_term']
-            vacation_status = request.session.get('vacation_status')
-            is_on_vacation = request.session.get('is_on_vacation', False)
-
-            return {
-                'current_year': current_year,
-                'current_term': current_term,
-                'vacation_status': vacation_status,
-                'is_on_vacation': is_on_vacation
-            }
-        except SchoolYear.DoesNotExist:
-            # If the year no longer exists, clear the session data
-            if 'current_year_id' in request.session:
-                del request.session['current_year_id']
-            if 'current_term' in request.session:
-                del request.session['current_term']
-            if 'vacation_status' in request.session:
-                del request.session['vacation_status']
-            if 'is_on_vacation' in request.session:
-                del request.session['is_on_vacation']
-
-    # If not in session or session data is invalid, return None values
-    # This function should only be called when user has a school association
-    return {
-        'current_year': None,
-        'current_term': None,
-        'vacation_status': None,
-        'is_on_vacation': True
-    }
-    
-    # Store in session for future requests
-    request.session['current_year_id'] = current_year.id if current_year else None
-    request.session['current_term'] = current_term
-    request.session['is_on_vacation'] = is_on_vacation
-    
+    from core.context import get_request_calendar
+
+    current_year, current_term, vacation_status = get_request_calendar(request)
+
     return {
         'current_year': current_year,
         'current_term': current_term,
-        'is_on_vacation': is_on_vacation
+        'vacation_status': vacation_status,
+        'is_on_vacation': vacation_status is not None
     }
 
 
@@ -653,19 +618,31 @@ class GraduateStudentsView(SchoolAdminRequiredMixin, TemplateView):
             else:  # 'repeat' or no decision defaults to repeat
                 repeating_students.append(enrollment.student)
 
-        # Process the decisions
-        if self.standard_code == 'STD5':
-            # Standard 5 students graduate (set inactive)
-            self._graduate_students(advancing_students)
-        else:
-            # Other standards advance to next level
-            self._advance_students(advancing_students, current_year)
-
-        # Students who repeat stay in their current standard for the new year
-        self._repeat_students(repeating_students, current_year, standard)
-
-        # Update transition status
-        self._update_transition_status(from_year, current_year)
+        # Process the decisions in one transaction, recording one activity entry
+        # and one audit changeset for the whole class; a failure part way
+        # through leaves no partial enrollments behind
+        with transaction.atomic(), audit_changeset(
+            request.user, f"Year transition for {standard.get_name_display()} into {current_year}", school=self.school
+        ), collapse_activities(
+            request.user.profile,
+            verb='enrolled',
+            description=f"Moved {len(advancing_students) + len(repeating_students)} students from "
+                        f"{standard.get_name_display()} into {current_year}",
+            target=standard,
+            school_id=self.school.id
+        ):
+            if self.standard_code == 'STD5':
+                # Standard 5 students graduate (set inactive)
+                self._graduate_students(advancing_students)
+            else:
+                # Other standards advance to next level
+                self._advance_students(advancing_students, current_year)
+
+            # Students who repeat stay in their current standard for the new year
+            self._repeat_students(repeating_students, current_year, standard)
+
+            # Update transition status
+            self._update_transition_status(from_year, current_year)
 
         # Success message
         messages.success(request,
@@ -734,21 +711,67 @@ class GraduateStudentsView(SchoolAdminRequiredMixin, TemplateView):
             )
 
             # Update the appropriate field based on standard
-            field_map = {
-                'std5': 'std5_processed',
-                'std4': 'std4_processed',
-                'std3': 'std3_processed',
-                'std2': 'std2_processed',
-                'std1': 'std1_processed',
-                'inf2': 'inf2_processed',
-                'inf1': 'inf1_processed',
-            }
-
-            field_name = field_map.get(self.standard_code)
-            if field_name:
-                setattr(transition, field_name, True)
-                setattr(transition, f'{field_name}_at', timezone.now())
-                transition.save()
+            updated_fields = mark_standard_processed(transition, self.standard_code)
+            if updated_fields:
+                transition.save(update_fields=updated_fields)
 
         except AcademicTransition.DoesNotExist:
             messages.error(self.request, "Transition record not found.")
+
+
+class TransitionRunView(SchoolAdminRequiredMixin, View):
+    """
+    API endpoint that runs the whole-school transition (Std 5 → Inf 1) in one go.
+
+    Accepts either a multipart upload (`decisions` CSV file, optional `dry_run`)
+    or a JSON body: {"decisions": {"<student id>": "advance"|"repeat"}, "dry_run": true}.
+    Students without a decision fall back to their Term 3 recommendation.
+    """
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        errors = []
+
+        try:
+            if request.content_type == 'application/json':
+                payload = json.loads(request.body or b'{}')
+                if not isinstance(payload, dict):
+                    return JsonResponse({'success': False, 'error': "Expected a JSON object."}, status=400)
+                raw_decisions = payload.get('decisions')
+                if raw_decisions is None:
+                    raw_decisions = {}
+                elif not isinstance(raw_decisions, dict):
+                    return JsonResponse({
+                        'success': False,
+                        'error': "'decisions' must be an object mapping student ids to decisions."
+                    }, status=400)
+                decisions = {}
+                for key, value in raw_decisions.items():
+                    decision = normalize_decision(value)
+                    if decision is None:
+                        errors.append(f"Unknown decision '{value}' for student {key}")
+                    else:
+                        decisions[key] = decision
+                dry_run = bool(payload.get('dry_run', False))
+            else:
+                decisions = {}
+                if 'decisions' in request.FILES:
+                    decisions, errors = parse_decisions_csv(request.FILES['decisions'])
+                dry_run = request.POST.get('dry_run') in ('1', 'true', 'on')
+        except (ValueError, TransitionError) as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+        if errors:
+            return JsonResponse({'success': False, 'errors': errors}, status=400)
+
+        try:
+            summary = run_school_transition(
+                self.school,
+                decisions=decisions,
+                performed_by=request.user.profile,
+                dry_run=dry_run,
+            )
+        except TransitionError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+        return JsonResponse({'success': True, 'summary': summary})
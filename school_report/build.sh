@@ -17,6 +17,9 @@ python manage.py collectstatic --no-input
 # Apply database migrations
 python manage.py migrate
 
+# Create the database cache table (no-op if it exists or the cache is not database-backed)
+python manage.py createcachetable
+
 # Create superuser if it doesn't exist
 # We use a conditional check to ensure it only runs once and doesn't error on subsequent builds
 if [ -n "$DJANGO_SUPERUSER_USERNAME" ] && [ -n "$DJANGO_SUPERUSER_EMAIL" ] && [ -n "$DJANGO_SUPERUSER_PASSWORD" ]; then
@@ -0,0 +1,223 @@
+"""
+Buffered writer for the activity stream.
+
+actstream's action.send() inserts one Action row per call, in the middle of
+whatever the caller is doing. Entries recorded with record_activity() are
+instead collected for the current atomic block and written with a single
+bulk_create once the transaction commits; entries from a transaction or
+savepoint that rolls back are dropped with it. Outside a transaction an entry
+is written straight away.
+
+Each buffer's flush is registered with transaction.on_commit() from the
+block it collects for, so Django discards it along with that block's other
+commit callbacks on rollback. Buffers are only weakly referenced here: one
+whose flush has been discarded is gone, and the next entry starts a new one.
+
+Bulk operations (e.g. a CSV import) can wrap their work in
+collapse_activities() so the entries they generate are replaced by a single
+summary entry.
+
+With ACTIVITY_STREAM_BACKGROUND_FLUSH enabled the insert runs in a background
+thread, so the request does not wait for it.
+
+bulk_create() does not send post_save for the Action rows, so the cached
+activity feeds of the schools involved are invalidated here directly.
+"""
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _object_ref(obj):
+    """(ContentType, pk) for a model instance or a (model class, pk) pair."""
+    if isinstance(obj, tuple):
+        model, pk = obj
+    else:
+        model, pk = obj, obj.pk
+    return ContentType.objects.get_for_model(model), pk
+
+
+def build_action(actor, verb, action_object=None, target=None, timestamp=None, **data):
+    """Build an unsaved actstream Action, filled in the same way as action.send()."""
+    from actstream.models import Action
+
+    actor_type, actor_id = _object_ref(actor)
+    activity = Action(
+        actor_content_type=actor_type,
+        actor_object_id=actor_id,
+        verb=str(verb),
+        public=True,
+        timestamp=timestamp or timezone.now(),
+    )
+    for name, obj in (('action_object', action_object), ('target', target)):
+        if obj is not None:
+            content_type, object_id = _object_ref(obj)
+            setattr(activity, f'{name}_content_type', content_type)
+            setattr(activity, f'{name}_object_id', object_id)
+    if data:
+        activity.data = data
+    return activity
+
+
+class _TransactionActivities:
+    """Entries recorded in one atomic block, written when the transaction commits."""
+
+    def __init__(self):
+        self.entries = []
+        self.flushed = False
+
+    def flush(self):
+        self.flushed = True
+        entries, self.entries = self.entries, []
+        write_activities(entries)
+
+
+class ActivitySummary:
+    """
+    The summary entry for a collapse_activities() block.
+
+    count is the number of entries collapsed so far. The description can be
+    changed inside the block, e.g. once the totals are known.
+    """
+
+    def __init__(self, description):
+        self.description = description
+        self.count = 0
+
+
+def _collapse_stack():
+    stack = getattr(_local, 'collapse_stack', None)
+    if stack is None:
+        stack = _local.collapse_stack = []
+    return stack
+
+
+def _transaction_activities():
+    """The buffer for the current atomic block, registering its flush on first use."""
+    buffers = getattr(_local, 'buffers', None)
+    if buffers is None:
+        # Only the on_commit() queue holds a buffer: when its block rolls back
+        # the callback is discarded and the buffer (with its entries) with it
+        buffers = _local.buffers = weakref.WeakValueDictionary()
+
+    # Savepoint ids are unique within a transaction, so each block has its own buffer
+    block = tuple(connection.savepoint_ids)
+    buffer = buffers.get(block)
+    if buffer is None or buffer.flushed:
+        buffer = buffers[block] = _TransactionActivities()
+        transaction.on_commit(buffer.flush)
+    return buffer
+
+
+def record_activity(actor, verb, action_object=None, target=None, description=None, **data):
+    """
+    Record an activity stream entry, written when the current transaction commits.
+
+    Takes the same arguments as actstream's action.send(). The actor, action
+    object and target may be model instances or (model class, pk) pairs, so
+    callers holding only a foreign key id do not need to fetch the row. The
+    description may be a callable; it is only rendered if the entry is written
+    rather than collapsed into a summary.
+    """
+    stack = _collapse_stack()
+    if stack:
+        stack[-1].count += 1
+        return
+
+    entry = (build_action(actor, verb, action_object, target, **data), description)
+    if connection.in_atomic_block:
+        _transaction_activities().entries.append(entry)
+    else:
+        write_activities([entry])
+
+
+@contextmanager
+def collapse_activities(actor, verb, description, target=None, **data):
+    """
+    Replace the activity recorded inside the block with one summary entry.
+
+    The summary is recorded when the block exits normally, at least one entry
+    was collapsed and the description has not been set to None:
+
+        with collapse_activities(profile, 'imported', "Imported students",
+                                 target=standard, school_id=school.id) as summary:
+            ...
+            summary.description = f"Imported {count} students into {name}"
+    """
+    summary = ActivitySummary(description)
+    stack = _collapse_stack()
+    stack.append(summary)
+    try:
+        yield summary
+    finally:
+        stack.pop()
+
+    if summary.count and summary.description:
+        record_activity(actor, verb, target=target, description=summary.description, **data)
+
+
+def write_activities(entries):
+    """Render the descriptions and insert the entries in one query."""
+    if not entries:
+        return
+
+    activities = []
+    for activity, description in entries:
+        try:
+            activity.description = description() if callable(description) else description
+        except Exception:
+            logger.exception("Could not render activity description for %r", activity.verb)
+            continue
+        activities.append(activity)
+
+    if getattr(settings, 'ACTIVITY_STREAM_BACKGROUND_FLUSH', False):
+        _background_executor().submit(_insert_in_background, activities)
+    else:
+        _insert(activities)
+
+
+def _insert(activities):
+    from actstream.models import Action
+
+    from core.cache import bump_activity_version
+
+    # The data has already been committed; a failed log write must not fail the request
+    try:
+        Action.objects.bulk_create(activities, batch_size=500)
+    except Exception:
+        logger.exception("Could not write %d activity stream entries", len(activities))
+        return
+
+    # bulk_create() skips post_save, so refresh the cached feeds here
+    for school_id in {(activity.data or {}).get('school_id') for activity in activities}:
+        bump_activity_version(school_id)
+
+
+def _insert_in_background(activities):
+    try:
+        _insert(activities)
+    finally:
+        # The worker thread has its own database connection
+        connection.close()
+
+
+def _background_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='activity-stream')
+    return _executor
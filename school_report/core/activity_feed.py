@@ -0,0 +1,111 @@
+"""
+Queries over the activity stream (actstream Action) for a school.
+
+Actions store their school in the JSON data column ({'school_id': ...}).
+A data__school_id lookup cannot use an index (and Django passes the JSON path
+as a query parameter, which SQLite will not match against an expression
+index), so the school is read through ActionSchoolId instead. It renders the
+same SQL in queries and in the expression index on (school_id, timestamp DESC)
+created by core/migrations/0003, so the index can be used for the filter and
+the ordering.
+
+The full feed is paged with a keyset cursor on (timestamp, id) rather than
+OFFSET, so every page costs the same however far back it is.
+"""
+from datetime import datetime
+
+from django.db.models import F, Func, Index, IntegerField, Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+SCHOOL_ACTIVITY_INDEX = 'actstream_action_school_ts'
+
+
+class InvalidCursor(ValueError):
+    """A feed cursor that was not produced by encode_cursor()."""
+
+
+class ActionSchoolId(Func):
+    """The school id stored in Action.data, as an indexable integer expression."""
+    # The JSON path is inlined rather than passed as a parameter so the
+    # expression is identical in the index and in queries
+    template = "json_extract(%(expressions)s, '$.school_id')"
+    output_field = IntegerField()
+
+    def __init__(self):
+        super().__init__(F('data'))
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="((%(expressions)s ->> 'school_id')::integer)",
+            **extra_context
+        )
+
+
+def school_activity_index():
+    """Index on (school id, newest first) used by the school activity queries."""
+    return Index(ActionSchoolId(), F('timestamp').desc(), name=SCHOOL_ACTIVITY_INDEX)
+
+
+def school_actions(school_id):
+    """All activity stream entries for a school, newest first."""
+    from actstream.models import Action
+
+    return Action.objects.alias(
+        school_key=ActionSchoolId()
+    ).filter(school_key=school_id).order_by('-timestamp')
+
+
+def encode_cursor(action):
+    """Opaque cursor pointing just past `action` in a newest-first feed."""
+    return urlsafe_base64_encode(f'{action.timestamp.isoformat()}|{action.pk}'.encode())
+
+
+def decode_cursor(cursor):
+    """Return the (timestamp, id) encoded in a cursor, or raise InvalidCursor."""
+    try:
+        timestamp, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def actor_filter(profile):
+    """Q matching actions performed by a staff member."""
+    from django.contrib.auth.models import User
+    from django.contrib.contenttypes.models import ContentType
+
+    # The model signals record the UserProfile as actor, core.activity_utils the User
+    return (
+        Q(actor_content_type=ContentType.objects.get_for_model(profile), actor_object_id=str(profile.pk))
+        | Q(actor_content_type=ContentType.objects.get_for_model(User), actor_object_id=str(profile.user_id))
+    )
+
+
+def page_school_actions(school_id, cursor=None, verbs=None, actor=None, limit=20, relations=()):
+    """
+    Get one page of a school's activity, newest first.
+
+    Args:
+        cursor: next_cursor from the previous page (None for the first page)
+        verbs: only include these verbs
+        actor: only include actions by this UserProfile
+        relations: generic relations to prefetch ('actor', 'action_object',
+            'target'); all of them if empty
+
+    Returns (actions, next_cursor); next_cursor is None on the last page.
+    Raises InvalidCursor for a malformed cursor.
+    """
+    actions = school_actions(school_id).order_by('-timestamp', '-id')
+    if verbs:
+        actions = actions.filter(verb__in=verbs)
+    if actor is not None:
+        actions = actions.filter(actor_filter(actor))
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        actions = actions.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+    # One extra row tells us whether there is another page
+    page = list(actions.fetch_generic_relations(*relations)[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
@@ -5,94 +5,95 @@ This module listens to model changes and automatically creates
 user-friendly activity stream entries for important actions.
 """
 
+from functools import lru_cache
+
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from actstream import action
-from django.contrib.contenttypes.models import ContentType
+
+from core.activity_buffer import record_activity
 
 
 def get_actor_from_instance(instance):
     """
-    Try to get the actor (user) from the instance.
-    Returns the UserProfile if found, otherwise None.
-    """
-    # Check if instance has created_by or updated_by
-    if hasattr(instance, 'created_by') and instance.created_by:
-        return instance.created_by
-
-    # Check for model-specific created_by field names
-    if hasattr(instance, 'enrolled_by') and instance.enrolled_by:
-        return instance.enrolled_by
-
-    if hasattr(instance, 'assigned_by') and instance.assigned_by:
-        return instance.assigned_by
+    Get the actor (the UserProfile who made the change) for an instance.
 
-    if hasattr(instance, 'added_by') and instance.added_by:
-        return instance.added_by
+    Returns a (UserProfile, pk) reference built from the instance's foreign
+    key ids, so no profile has to be loaded, or None.
+    """
+    from core.models import UserProfile
 
-    # Check if instance has a user attribute
-    if hasattr(instance, 'user') and instance.user:
-        if hasattr(instance.user, 'profile'):
-            return instance.user.profile
-        return instance.user
+    # Check the model-specific "who did this" fields
+    for field_name in ('created_by', 'enrolled_by', 'assigned_by', 'added_by'):
+        profile_id = getattr(instance, f'{field_name}_id', None)
+        if profile_id:
+            return (UserProfile, profile_id)
 
     # Check if instance has a teacher attribute
-    if hasattr(instance, 'teacher') and instance.teacher:
-        return instance.teacher
-
-    # Check if instance has a student attribute with user
-    if hasattr(instance, 'student') and instance.student:
-        if hasattr(instance.student, 'user') and instance.student.user:
-            if hasattr(instance.student.user, 'profile'):
-                return instance.student.user.profile
+    teacher_id = getattr(instance, 'teacher_id', None)
+    if teacher_id:
+        return (UserProfile, teacher_id)
 
     return None
 
 
+@lru_cache(maxsize=4096)
+def _standard_school_id(standard_id):
+    # Classes never move between schools, so this is safe to memoize
+    from schools.models import Standard
+    return Standard.objects.filter(pk=standard_id).values_list('school_id', flat=True).first()
+
+
 def get_school_from_instance(instance):
     """
-    Try to get the school from the instance for filtering purposes.
-    Returns the School object if found, otherwise None.
+    Get the id of the school an instance belongs to, for filtering the
+    activity feed. Returns None if it cannot be determined.
     """
+    from core.cache_signals import _term_scope, _year_scope
+
     # Direct school attribute
-    if hasattr(instance, 'school') and instance.school:
-        return instance.school
-    
+    school_id = getattr(instance, 'school_id', None)
+    if school_id:
+        return school_id
+
     # Through standard
-    if hasattr(instance, 'standard') and instance.standard:
-        if hasattr(instance.standard, 'school'):
-            return instance.standard.school
-    
+    standard_id = getattr(instance, 'standard_id', None)
+    if standard_id:
+        return _standard_school_id(standard_id)
+
     # Through year
-    if hasattr(instance, 'year') and instance.year:
-        if hasattr(instance.year, 'school'):
-            return instance.year.school
-    
+    year_id = getattr(instance, 'year_id', None)
+    if year_id:
+        scope = _year_scope(year_id)
+        return scope[0] if scope else None
+
     # Through term
-    if hasattr(instance, 'term') and instance.term:
-        if hasattr(instance.term, 'year') and instance.term.year:
-            if hasattr(instance.term.year, 'school'):
-                return instance.term.year.school
-    
+    term_id = getattr(instance, 'term_id', None)
+    if term_id:
+        scope = _term_scope(term_id)
+        return scope[0] if scope else None
+
     return None
 
 
+# Entries are buffered until the transaction commits (see core/activity_buffer.py).
+# Descriptions are passed as callables so the display names are only looked up
+# for entries that are actually written, not for ones collapsed into a summary.
+
 # Test Model Signals
 @receiver(post_save, sender='reports.Test')
 def create_test_activity(sender, instance, created, **kwargs):
     """Create activity when a test is created or updated"""
     if created:
         actor = get_actor_from_instance(instance)
-        school = get_school_from_instance(instance)
-        
+
         if actor:
-            action.send(
+            record_activity(
                 actor,
                 verb='created',
                 action_object=instance,
-                target=instance.standard,
-                description=f"Created {instance.get_test_type_display()} for {instance.standard.get_display_name()}",
-                school_id=school.id if school else None
+                target=(sender.standard.field.related_model, instance.standard_id),
+                description=lambda: f"Created {instance.get_test_type_display()} for {instance.standard.get_display_name()}",
+                school_id=get_school_from_instance(instance)
             )
 
 
@@ -100,14 +101,14 @@ def create_test_activity(sender, instance, created, **kwargs):
 def delete_test_activity(sender, instance, **kwargs):
     """Create activity when a test is deleted"""
     actor = get_actor_from_instance(instance)
-    school = get_school_from_instance(instance)
-    
+
     if actor:
-        action.send(
+        record_activity(
             actor,
             verb='deleted',
+            # Rendered now: the class may be deleted in the same transaction
             description=f"Deleted {instance.get_test_type_display()} for {instance.standard.get_display_name()}",
-            school_id=school.id if school else None
+            school_id=get_school_from_instance(instance)
         )
 
 
@@ -117,16 +118,15 @@ def create_enrollment_activity(sender, instance, created, **kwargs):
     """Create activity when a student is enrolled"""
     if created:
         actor = get_actor_from_instance(instance)
-        school = get_school_from_instance(instance)
-        
+
         if actor:
-            action.send(
+            record_activity(
                 actor,
                 verb='enrolled',
-                action_object=instance.student,
-                target=instance.standard,
-                description=f"Enrolled {instance.student.get_full_name()} in {instance.standard.get_display_name()}",
-                school_id=school.id if school else None
+                action_object=(sender.student.field.related_model, instance.student_id),
+                target=(sender.standard.field.related_model, instance.standard_id),
+                description=lambda: f"Enrolled {instance.student.get_full_name()} in {instance.standard.get_display_name()}",
+                school_id=get_school_from_instance(instance)
             )
 
 
@@ -134,18 +134,17 @@ def create_enrollment_activity(sender, instance, created, **kwargs):
 @receiver(post_save, sender='academics.StandardTeacher')
 def create_teacher_assignment_activity(sender, instance, created, **kwargs):
     """Create activity when a teacher is assigned to a class"""
-    if created:
+    if created and instance.teacher_id and instance.standard_id:
         actor = get_actor_from_instance(instance)
-        school = get_school_from_instance(instance)
 
         if actor:
-            action.send(
+            record_activity(
                 actor,
                 verb='assigned',
-                action_object=instance.teacher,
-                target=instance.standard,
-                description=f"Assigned {instance.teacher.get_full_name()} to {instance.standard.get_display_name()}",
-                school_id=school.id if school else None
+                action_object=(sender.teacher.field.related_model, instance.teacher_id),
+                target=(sender.standard.field.related_model, instance.standard_id),
+                description=lambda: f"Assigned {instance.teacher.get_full_name()} to {instance.standard.get_display_name()}",
+                school_id=get_school_from_instance(instance)
             )
 
 
@@ -155,16 +154,15 @@ def create_subject_activity(sender, instance, created, **kwargs):
     """Create activity when a subject is created"""
     if created:
         actor = get_actor_from_instance(instance)
-        school = get_school_from_instance(instance)
 
         if actor:
-            action.send(
+            record_activity(
                 actor,
                 verb='created',
                 action_object=instance,
-                target=instance.standard,
-                description=f"Created {instance.subject_name} subject for {instance.standard.get_display_name()}",
-                school_id=school.id if school else None
+                target=(sender.standard.field.related_model, instance.standard_id),
+                description=lambda: f"Created {instance.subject_name} subject for {instance.standard.get_display_name()}",
+                school_id=get_school_from_instance(instance)
             )
 
 
@@ -174,23 +172,24 @@ def create_report_finalization_activity(sender, instance, created, update_fields
     """Create activity when reports are finalized"""
     # Only create activity when is_finalized changes to True
     if not created and update_fields and 'is_finalized' in update_fields:
-        if instance.is_finalized and instance.finalized_by:
-            school = get_school_from_instance(instance)
-
-            # Count how many reports were finalized for this term/class
-            from reports.models import StudentTermReview
-            finalized_count = StudentTermReview.objects.filter(
-                term=instance.term,
-                student__current_standard=instance.student.current_standard,
-                is_finalized=True
-            ).count()
-
-            action.send(
-                instance.finalized_by,
+        if instance.is_finalized and instance.finalized_by_id:
+            standard = instance.student.current_standard
+
+            def describe():
+                # Count how many reports were finalized for this term/class
+                finalized_count = sender.objects.filter(
+                    term=instance.term,
+                    student__current_standard=standard,
+                    is_finalized=True
+                ).count()
+                return f"Finalized {finalized_count} reports for {standard.get_display_name()}, {instance.term}"
+
+            record_activity(
+                (sender.finalized_by.field.related_model, instance.finalized_by_id),
                 verb='finalized reports',
-                target=instance.student.current_standard,
-                description=f"Finalized {finalized_count} reports for {instance.student.current_standard.get_display_name()}, {instance.term}",
-                school_id=school.id if school else None
+                target=standard,
+                description=describe,
+                school_id=get_school_from_instance(instance)
             )
 
 
@@ -199,18 +198,19 @@ def create_report_finalization_activity(sender, instance, created, update_fields
 def create_staff_activity(sender, instance, created, **kwargs):
     """Create activity when staff is added to school"""
     if created:
+        staff = (sender.staff.field.related_model, instance.staff_id)
         actor = get_actor_from_instance(instance)
 
         # Get position display
         position = instance.position if instance.position else "Staff"
 
-        action.send(
-            actor if actor else instance.staff,
+        record_activity(
+            actor if actor else staff,
             verb='added',
-            action_object=instance.staff,
-            target=instance.school,
-            description=f"Added {instance.staff.get_full_name()} as {position} to {instance.school.name}",
-            school_id=instance.school.id
+            action_object=staff,
+            target=(sender.school.field.related_model, instance.school_id),
+            description=lambda: f"Added {instance.staff.get_full_name()} as {position} to {instance.school.name}",
+            school_id=instance.school_id
         )
 
 
@@ -220,14 +220,13 @@ def create_student_activity(sender, instance, created, **kwargs):
     """Create activity when a student is created"""
     if created:
         actor = get_actor_from_instance(instance)
-        school = instance.school if hasattr(instance, 'school') else None
 
         if actor:
-            action.send(
+            # Students are linked to schools through SchoolEnrollment, created afterwards
+            record_activity(
                 actor,
                 verb='created',
                 action_object=instance,
-                description=f"Added new student {instance.get_full_name()}",
-                school_id=school.id if school else None
+                description=lambda: f"Added new student {instance.get_full_name()}",
+                school_id=None
             )
-
@@ -4,10 +4,11 @@ Helper functions for creating human-readable activity descriptions.
 
 This module provides utilities to generate user-facing activity feed entries
 that are displayed on the dashboard for principals and administrators.
+Entries are written when the current transaction commits (see
+core/activity_buffer.py).
 """
 
-from actstream import action
-from django.contrib.contenttypes.models import ContentType
+from core.activity_buffer import record_activity
 
 
 def get_actor_display_name(user_profile):
@@ -39,7 +40,7 @@ def create_test_activity(actor, test, verb='created'):
     
     description = f"{verb.capitalize()} {test_type} for {standard_name}"
     
-    action.send(
+    record_activity(
         actor.user if hasattr(actor, 'user') else actor,
         verb=verb,
         action_object=test,
@@ -60,7 +61,7 @@ def create_report_finalization_activity(actor, term, standard, student_count):
     
     description = f"Finalized {student_count} reports for {standard_name}, {term_display}"
     
-    action.send(
+    record_activity(
         actor.user if hasattr(actor, 'user') else actor,
         verb='finalized reports',
         action_object=term,
@@ -81,7 +82,7 @@ def create_student_enrollment_activity(actor, student, standard, verb='enrolled'
     
     description = f"{verb.capitalize()} {student_name} in {standard_name}"
     
-    action.send(
+    record_activity(
         actor.user if hasattr(actor, 'user') else actor,
         verb=verb,
         action_object=student,
@@ -102,7 +103,7 @@ def create_teacher_assignment_activity(actor, teacher, standard, verb='assigned'
     
     description = f"{verb.capitalize()} {teacher_name} to {standard_name}"
     
-    action.send(
+    record_activity(
         actor.user if hasattr(actor, 'user') else actor,
         verb=verb,
         action_object=teacher,
@@ -123,7 +124,7 @@ def create_subject_activity(actor, subject, standard, verb='created'):
     
     description = f"{verb.capitalize()} {subject_name} subject for {standard_name}"
     
-    action.send(
+    record_activity(
         actor.user if hasattr(actor, 'user') else actor,
         verb=verb,
         action_object=subject,
@@ -144,7 +145,7 @@ def create_term_finalization_activity(actor, term):
     
     description = f"Finalized {term_display} for {year_display}"
     
-    action.send(
+    record_activity(
         actor.user if hasattr(actor, 'user') else actor,
         verb='finalized term',
         action_object=term,
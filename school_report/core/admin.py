@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, AuditChangeset
 
 
 class UserProfileInline(admin.StackedInline):
@@ -86,3 +86,18 @@ class UserProfileAdmin(admin.ModelAdmin):
         return obj.is_active
     is_active.boolean = True
     is_active.short_description = 'Active'
+
+
+@admin.register(AuditChangeset)
+class AuditChangesetAdmin(admin.ModelAdmin):
+    list_display = ('timestamp', 'reason', 'actor', 'school', 'object_count')
+    list_filter = ('school',)
+    search_fields = ('reason', 'actor__username')
+    list_select_related = ('actor', 'school')
+    readonly_fields = ('timestamp', 'actor', 'school', 'reason', 'object_count', 'changes')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
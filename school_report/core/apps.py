@@ -8,4 +8,7 @@ class CoreConfig(AppConfig):
     def ready(self):
         import core.signals
         import core.auditlog_registry  # Register models for audit logging
+        from core.audit import connect_changeset_receivers
+        connect_changeset_receivers()  # Bulk operations audit as one changeset
         import core.activity_signals  # Register activity stream signals
+        import core.cache_signals  # Invalidate per-school cached data
@@ -0,0 +1,248 @@
+"""
+Compact audit changesets for bulk operations.
+
+auditlog writes one LogEntry per saved object, each with a full diff (and an
+extra query to load the old row). Bulk operations such as a score grid,
+finalizing a class or a year transition instead run inside
+
+    with audit_changeset(request.user, "Scores entered for Midterm", school=school):
+        ...
+
+While the block runs auditlog is switched off for the current context, and
+the changes to every auditlog-registered model are collected in memory. When
+the block exits normally they are written as one AuditChangeset row holding
+a columnar diff:
+
+    {"reports.testscore": {"update": {"pk": [1, 2],
+                                      "old": {"score": ["5", null]},
+                                      "new": {"score": ["7", null]}}}}
+
+Each column is aligned with "pk"; a null/null cell means the field did not
+change for that object. If the block raises, nothing is written.
+
+Old values come from the state the objects were loaded with (captured on
+post_init while a changeset is open), so objects fetched inside the block
+cost no extra query; objects loaded earlier fall back to one query each, as
+with auditlog.
+
+expand_changeset() and get_object_history() turn changesets back into
+per-object history.
+"""
+import contextvars
+from contextlib import contextmanager
+from copy import copy
+
+from auditlog.context import disable_auditlog
+from auditlog.diff import model_instance_diff
+from auditlog.registry import auditlog
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+
+_current_changeset = contextvars.ContextVar('audit_changeset', default=None)
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+class ChangesetRecorder:
+    """Changes collected by an open audit_changeset() block."""
+
+    def __init__(self):
+        self.rows = []  # (model label, action, pk, {field: [old, new]})
+        self._loaded = {}  # (model, pk) -> field values the object was loaded with
+
+    def __len__(self):
+        return len(self.rows)
+
+    def log(self, model, action, pk, changes):
+        self.rows.append((_label(model), action, pk, changes))
+
+    def log_created(self, objects):
+        """Record objects written with bulk_create() (which sends no signals)."""
+        for obj in objects:
+            self.log(type(obj), CREATE, obj.pk, model_instance_diff(None, obj))
+
+    def log_updated(self, model, pks, **values):
+        """Record a queryset.update() (which sends no signals); old values are not known."""
+        changes = {field: [None, str(value)] for field, value in values.items()}
+        for pk in pks:
+            self.log(model, UPDATE, pk, changes)
+
+    def remember(self, instance):
+        self._loaded[(type(instance), instance.pk)] = {
+            field.attname: instance.__dict__[field.attname]
+            for field in instance._meta.concrete_fields
+            if field.attname in instance.__dict__
+        }
+
+    def old_state(self, instance):
+        """A copy of `instance` as it was before the pending save, or None."""
+        values = self._loaded.get((type(instance), instance.pk))
+        if values is None:
+            return None
+        old = copy(instance)
+        old.__dict__.update(values)
+        return old
+
+    def columnar(self):
+        """The collected rows as a columnar diff (see the module docstring)."""
+        changes = {}
+        for label, action, pk, diff in self.rows:
+            group = changes.setdefault(label, {}).setdefault(action, {'pk': [], 'old': {}, 'new': {}})
+            row = len(group['pk'])
+            group['pk'].append(pk)
+            for column in (group['old'], group['new']):
+                for values in column.values():
+                    values.append(None)
+            for field, (old, new) in diff.items():
+                if field not in group['old']:
+                    group['old'][field] = [None] * (row + 1)
+                    group['new'][field] = [None] * (row + 1)
+                group['old'][field][row] = old
+                group['new'][field][row] = new
+        return changes
+
+
+@contextmanager
+def audit_changeset(actor, reason, school=None):
+    """
+    Record the changes made inside the block as one AuditChangeset.
+
+    actor may be a User or a UserProfile. Nested blocks are folded into the
+    outermost one. Yields the ChangesetRecorder, so bulk_create()/update()
+    calls (which send no signals) can be added with log_created() and
+    log_updated().
+    """
+    from core.models import AuditChangeset
+
+    recorder = _current_changeset.get()
+    if recorder is not None:
+        yield recorder
+        return
+
+    recorder = ChangesetRecorder()
+    token = _current_changeset.set(recorder)
+    try:
+        with disable_auditlog():
+            yield recorder
+    finally:
+        _current_changeset.reset(token)
+
+    if recorder.rows:
+        AuditChangeset.objects.create(
+            actor=getattr(actor, 'user', actor),
+            school=school,
+            reason=reason[:255],
+            object_count=len(recorder.rows),
+            changes=recorder.columnar(),
+        )
+
+
+def expand_changeset(changeset):
+    """Yield one dict per object in a changeset: model, pk, action and changes."""
+    for label, actions in changeset.changes.items():
+        for action, group in actions.items():
+            for row, pk in enumerate(group['pk']):
+                changes = {
+                    field: [group['old'][field][row], group['new'][field][row]]
+                    for field in group['old']
+                    if (group['old'][field][row], group['new'][field][row]) != (None, None)
+                }
+                yield {
+                    'model': label,
+                    'pk': pk,
+                    'action': action,
+                    'changes': changes,
+                    'timestamp': changeset.timestamp,
+                    'actor_id': changeset.actor_id,
+                    'reason': changeset.reason,
+                    'changeset_id': changeset.id,
+                }
+
+
+def get_object_history(instance):
+    """
+    The full audit history of an object, newest first: its auditlog entries
+    merged with the changesets that touched it, in the same dict format as
+    expand_changeset().
+    """
+    from auditlog.models import LogEntry
+    from core.models import AuditChangeset
+
+    label = _label(type(instance))
+    history = [
+        {
+            'model': label,
+            'pk': instance.pk,
+            'action': entry.get_action_display(),
+            'changes': entry.changes_dict,
+            'timestamp': entry.timestamp,
+            'actor_id': entry.actor_id,
+            'reason': None,
+            'changeset_id': None,
+        }
+        for entry in LogEntry.objects.get_for_object(instance)
+    ]
+
+    # Changesets are matched by model in the database and by pk here
+    for changeset in AuditChangeset.objects.filter(changes__has_key=label):
+        history.extend(
+            item for item in expand_changeset(changeset)
+            if item['model'] == label and item['pk'] == instance.pk
+        )
+
+    return sorted(history, key=lambda item: item['timestamp'], reverse=True)
+
+
+# Receivers, connected to every auditlog-registered model by connect_changeset_receivers().
+# They do nothing unless a changeset is open in the current context.
+
+def _remember_loaded(sender, instance, **kwargs):
+    recorder = _current_changeset.get()
+    if recorder is not None and instance.pk is not None:
+        recorder.remember(instance)
+
+
+def _load_old_state(sender, instance, raw=False, **kwargs):
+    recorder = _current_changeset.get()
+    if recorder is None or raw or instance._state.adding or instance.pk is None:
+        return
+    if recorder.old_state(instance) is None:
+        # Loaded before the changeset was opened
+        old = sender._default_manager.filter(pk=instance.pk).first()
+        if old is not None:
+            recorder.remember(old)
+
+
+def _log_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    recorder = _current_changeset.get()
+    if recorder is None or raw:
+        return
+    if created:
+        recorder.log(sender, CREATE, instance.pk, model_instance_diff(None, instance))
+    else:
+        changes = model_instance_diff(recorder.old_state(instance), instance, fields_to_check=update_fields)
+        if changes:
+            recorder.log(sender, UPDATE, instance.pk, changes)
+    # Later saves of the same object are diffed against this state
+    recorder.remember(instance)
+
+
+def _log_delete(sender, instance, **kwargs):
+    recorder = _current_changeset.get()
+    if recorder is not None:
+        recorder.log(sender, DELETE, instance.pk, model_instance_diff(instance, None))
+
+
+def connect_changeset_receivers():
+    """Connect the changeset receivers to the models registered with auditlog."""
+    for model in auditlog.get_models():
+        uid = f'audit_changeset:{_label(model)}'
+        post_init.connect(_remember_loaded, sender=model, dispatch_uid=uid)
+        pre_save.connect(_load_old_state, sender=model, dispatch_uid=uid)
+        post_save.connect(_log_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(_log_delete, sender=model, dispatch_uid=uid)
@@ -0,0 +1,272 @@
+"""
+Archival of old audit trail and activity stream rows.
+
+The auditlog LogEntry, actstream Action and AuditChangeset tables only grow.
+archive_rows() (used by `manage.py archive_audit`) moves rows from closed
+school years out of the database into gzipped newline-delimited JSON files,
+one file per kind of row, school and month:
+
+    AUDIT_ARCHIVE_ROOT/<school id>/<YYYY-MM>/<kind>.ndjson.gz
+
+where kind is 'auditlog', 'activity' or 'changeset', and rows that cannot be
+attributed to a school go under 'none'. The directory layout is the index:
+search_archive() only opens the files for the schools and months asked for.
+
+Rows are read in primary key chunks. Each chunk is appended to the archive
+files (as a new gzip member, which readers see as one stream) and synced to
+disk before its rows are deleted in small batches, so no statement holds
+locks for long. If a run is interrupted between the two steps the next run
+archives those rows again; search_archive() drops the duplicates.
+
+A row is only archived if it is older than both the requested cutoff and the
+start of its school's latest school year, so the open year is never moved.
+Rows that cannot be attributed to a school, and rows of a school without a
+school year, are held to the earliest open year start of any school.
+"""
+import gzip
+import json
+import os
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, time as dt_time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+KINDS = ('auditlog', 'activity', 'changeset')
+NO_SCHOOL = 'none'
+
+ArchivedEntry = namedtuple('ArchivedEntry', ['kind', 'school_id', 'month', 'data'])
+
+
+def archive_root():
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_ROOT', os.path.join(settings.MEDIA_ROOT, 'audit_archives')))
+
+
+def archive_path(root, school_id, month, kind):
+    return Path(root) / str(school_id or NO_SCHOOL) / month / f'{kind}.ndjson.gz'
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def open_year_starts():
+    """{school id: start of the school's latest school year}; rows from then on are kept."""
+    from academics.models import SchoolYear
+
+    starts = {}
+    years = SchoolYear.objects.order_by('school_id', '-start_year').prefetch_related('terms')
+    for year in years:
+        if year.school_id in starts:
+            continue
+        term_starts = [term.start_date for term in year.terms.all()]
+        # Without terms, treat the whole calendar year as open
+        first_day = min(term_starts) if term_starts else datetime(year.start_year, 1, 1).date()
+        starts[year.school_id] = start_of_day(first_day)
+    return starts
+
+
+class ArchiveSource:
+    """How to read, attribute and delete one kind of archived row."""
+
+    def __init__(self, kind, model, school_of, filter_school=None):
+        self.kind = kind
+        self.model = model
+        self.school_of = school_of
+        self.filter_school = filter_school
+
+    def rows(self, before, school_id=None, chunk_size=2000):
+        """Yield lists of row dicts older than `before`, in primary key order."""
+        rows = self.model.objects.filter(timestamp__lt=before).order_by('pk')
+        if school_id is not None and self.filter_school:
+            rows = self.filter_school(rows, school_id)
+
+        last_pk = None
+        while True:
+            chunk = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+            chunk = list(chunk.values()[:chunk_size])
+            if not chunk:
+                return
+            last_pk = chunk[-1]['id']
+            yield chunk
+
+    def delete(self, pks, batch_size=500, pause=0):
+        for start in range(0, len(pks), batch_size):
+            batch = self.model.objects.filter(pk__in=pks[start:start + batch_size])
+            # A plain DELETE: the rows are gone from the archive's point of view,
+            # and delete() would load every row to send post_delete
+            batch._raw_delete(batch.db)
+            if pause:
+                time.sleep(pause)
+
+
+def get_sources():
+    """{kind: ArchiveSource}"""
+    from actstream.models import Action
+    from auditlog.models import LogEntry
+
+    from academics.models import SchoolStaff
+    from core.activity_feed import ActionSchoolId
+    from core.models import AuditChangeset
+    from schools.models import School
+
+    # LogEntry has no school: use the school itself for changes to a School,
+    # the school recorded in the diff for models with a school field, or
+    # else the school that employs the actor
+    staff_schools = dict(
+        SchoolStaff.objects.order_by('is_active').values_list('staff__user_id', 'school_id')
+    )
+    school_type_id = ContentType.objects.get_for_model(School).id
+
+    def logentry_school(row):
+        if row['content_type_id'] == school_type_id:
+            return row['object_id']
+        school_change = (row['changes'] or {}).get('school') if isinstance(row['changes'], dict) else None
+        if school_change:
+            value = school_change[1] if school_change[1] != 'None' else school_change[0]
+            if str(value).isdigit():
+                return int(value)
+        return staff_schools.get(row['actor_id'])
+
+    return {
+        'auditlog': ArchiveSource('auditlog', LogEntry, logentry_school),
+        'activity': ArchiveSource(
+            'activity', Action,
+            lambda row: (row['data'] or {}).get('school_id'),
+            lambda rows, school_id: rows.alias(school_key=ActionSchoolId()).filter(school_key=school_id),
+        ),
+        'changeset': ArchiveSource(
+            'changeset', AuditChangeset,
+            lambda row: row['school_id'],
+            lambda rows, school_id: rows.filter(school_id=school_id),
+        ),
+    }
+
+
+def _content_type_labels(row):
+    """Add "app_label.model" next to each content type id, so archives outlive the ids."""
+    for key in [key for key in row if key.endswith('content_type_id')]:
+        if row[key] is not None:
+            model = ContentType.objects.get_for_id(row[key])
+            row[key[:-3]] = f'{model.app_label}.{model.model}'
+    return row
+
+
+def _write_lines(path, lines):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+            archive.write(''.join(lines).encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive_rows(source, before, root=None, school_id=None, chunk_size=2000, batch_size=500,
+                 pause=0, dry_run=False):
+    """
+    Move the rows of one ArchiveSource from closed years older than `before`
+    (an aware datetime) into the archive.
+
+    Returns {(school id, 'YYYY-MM'): row count}.
+    """
+    root = root or archive_root()
+    open_from = open_year_starts()
+    # For rows whose school has no open year of its own (or is unknown)
+    earliest_open = min(open_from.values(), default=None)
+    counts = defaultdict(int)
+
+    for chunk in source.rows(before, school_id=school_id, chunk_size=chunk_size):
+        files = defaultdict(list)
+        archived_pks = []
+        for row in chunk:
+            row_school = source.school_of(row)
+            if school_id is not None and row_school != school_id:
+                continue
+            keep_from = open_from.get(row_school, earliest_open)
+            if keep_from is not None and row['timestamp'] >= keep_from:
+                continue
+            month = timezone.localtime(row['timestamp']).strftime('%Y-%m')
+            files[(row_school, month)].append(
+                json.dumps(_content_type_labels(row), cls=DjangoJSONEncoder) + '\n'
+            )
+            archived_pks.append(row['id'])
+
+        for key, lines in files.items():
+            counts[key] += len(lines)
+            if not dry_run:
+                _write_lines(archive_path(root, key[0], key[1], source.kind), lines)
+
+        if not dry_run:
+            source.delete(archived_pks, batch_size=batch_size, pause=pause)
+
+    if source.kind == 'activity' and not dry_run:
+        from core.cache import bump_activity_version
+
+        # The rows were deleted without post_delete, so refresh the cached feeds here
+        for school in {school for school, _month in counts}:
+            bump_activity_version(school)
+
+    return dict(counts)
+
+
+def _archive_months(root, school_id=None, since=None, until=None):
+    """Yield (school id, month, directory) for the archived months in range."""
+    root = Path(root)
+    if not root.is_dir():
+        return
+    schools = [str(school_id)] if school_id is not None else sorted(p.name for p in root.iterdir() if p.is_dir())
+    first_month = since.strftime('%Y-%m') if since else None
+    last_month = until.strftime('%Y-%m') if until else None
+
+    for school in schools:
+        school_dir = root / school
+        if not school_dir.is_dir():
+            continue
+        for month_dir in sorted(p for p in school_dir.iterdir() if p.is_dir()):
+            month = month_dir.name
+            if (first_month and month < first_month) or (last_month and month > last_month):
+                continue
+            yield (None if school == NO_SCHOOL else int(school)), month, month_dir
+
+
+def search_archive(school_id=None, kinds=KINDS, since=None, until=None, contains=None, root=None,
+                   **filters):
+    """
+    Search archived rows, oldest month first.
+
+    Args:
+        school_id: only this school's archive (None for every school)
+        kinds: which kinds of row to read ('auditlog', 'activity', 'changeset')
+        since, until: datetime range of the rows' timestamps
+        contains: a substring the raw JSON line must contain; checked before
+            the line is parsed, so it is the cheap way to narrow a search
+        filters: exact values of row fields, e.g. verb='enrolled',
+            content_type='reports.testscore', object_pk='12'
+
+    Yields ArchivedEntry(kind, school_id, month, data).
+    """
+    seen = set()
+    for school, month, month_dir in _archive_months(root or archive_root(), school_id, since, until):
+        for kind in kinds:
+            path = month_dir / f'{kind}.ndjson.gz'
+            if not path.exists():
+                continue
+            with gzip.open(path, 'rt') as archive:
+                for line in archive:
+                    if contains and contains not in line:
+                        continue
+                    row = json.loads(line)
+                    if any(row.get(field) != value for field, value in filters.items()):
+                        continue
+                    timestamp = datetime.fromisoformat(row['timestamp'])
+                    if (since and timestamp < since) or (until and timestamp >= until):
+                        continue
+                    # A row archived twice by an interrupted run
+                    if (kind, row['id']) in seen:
+                        continue
+                    seen.add((kind, row['id']))
+                    yield ArchivedEntry(kind, school, month, row)
@@ -40,7 +40,7 @@ auditlog.register(UserProfile)
 # ============================================================================
 auditlog.register(School)
 auditlog.register(Standard)
-auditlog.register(Student)
+auditlog.register(Student, exclude_fields=['identity_key'])
 
 
 # ============================================================================
@@ -22,3 +22,31 @@ class SessionSetupBackend(ModelBackend):
             setup_user_session(request, user)
         
         return user
+
+
+class StaffContextBackend(ModelBackend):
+    """
+    Authentication backend that loads the user for each request together with
+    their profile and active school membership in one query.
+
+    The SchoolStaff record (or None) is available as user.active_school_staff,
+    used by AuthContextMiddleware and SchoolContext instead of querying again.
+    """
+
+    def get_user(self, user_id):
+        from academics.models import SchoolStaff
+
+        school_staff = SchoolStaff.objects.select_related('staff__user', 'school').filter(
+            staff__user_id=user_id,
+            is_active=True
+        ).first()
+
+        if school_staff:
+            user = school_staff.staff.user
+        else:
+            user = User._default_manager.select_related('profile').filter(pk=user_id).first()
+            if user is None:
+                return None
+
+        user.active_school_staff = school_staff
+        return user if self.user_can_authenticate(user) else None
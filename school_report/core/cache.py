@@ -0,0 +1,223 @@
+"""
+Versioned cache layer for the School Report System.
+
+Cached values live in one of two namespaces:
+
+- school: data that belongs to a school as a whole (calendar, staff, classes)
+- school + year: data for one academic year of a school (rosters, tests, reports)
+
+A school's activity feed has its own version, bumped whenever activity is
+recorded for the school, so the dashboard widget can be cached without being
+invalidated by (or invalidating) the school's other data.
+
+A per-user version tracks changes to a user's role or school
+membership; together with the school version and the year's teacher
+assignment version it tags the session snapshot set up at login (see
+core.utils.setup_user_session). The assignment version is bumped only by
+teacher assignment changes, so entering scores or reports (which bump the
+year) does not rebuild every session of the school.
+
+Each namespace has a version counter that is part of every key in it. Bumping
+a version (see core/cache_signals.py) invalidates everything cached in that
+namespace at once, without having to track individual keys. Bumping a school
+also invalidates all of its year namespaces.
+
+Only cache.get/set/add/incr/get_many are used, so this works with the
+local-memory, file-based, database and Redis cache backends. Note that the
+local-memory backend is per process: with several worker processes use a
+shared backend (file, database or Redis) so invalidation reaches every worker.
+"""
+import functools
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+# Cached values live for the backend's TIMEOUT setting unless invalidated
+# first (DEFAULT_TIMEOUT is Django's sentinel for that; None would keep them
+# forever, including the values orphaned by a version bump)
+
+# Returned by cache.get() on a miss, so that None can be cached as a value
+_MISSING = object()
+
+
+def _school_version_key(school_id):
+    return f'cachever:school:{school_id}'
+
+
+def _year_version_key(school_id, year_id):
+    return f'cachever:school:{school_id}:year:{year_id}'
+
+
+def _activity_version_key(school_id):
+    return f'cachever:activity:{school_id}'
+
+
+def _user_version_key(user_id):
+    return f'cachever:user:{user_id}'
+
+
+def _assignment_version_key(school_id, year_id):
+    return f'cachever:school:{school_id}:year:{year_id}:assignments'
+
+
+def _new_version():
+    # Seed with a timestamp so a lost counter never reuses an old version
+    return int(time.time() * 1000)
+
+
+def _get_versions(*keys):
+    """Fetch (and initialise where missing) version counters in one round trip."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key, _new_version())
+    return [versions[key] for key in keys]
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter missing (evicted or never set) - a fresh seed is a new version
+        cache.set(key, _new_version(), None)
+
+
+def _to_id(obj):
+    """Accept a model instance or a primary key."""
+    return getattr(obj, 'pk', obj)
+
+
+def get_school_version(school_id):
+    """Get the current cache version for a school."""
+    return _get_versions(_school_version_key(school_id))[0]
+
+
+def bump_school_version(school_id):
+    """Invalidate everything cached for a school, including all its years."""
+    if school_id:
+        _bump(_school_version_key(school_id))
+
+
+def bump_year_version(school_id, year_id):
+    """Invalidate everything cached for one academic year of a school."""
+    if school_id and year_id:
+        _bump(_year_version_key(school_id, year_id))
+
+
+def bump_activity_version(school_id):
+    """Invalidate the cached activity feed of a school (new activity recorded)."""
+    if school_id:
+        _bump(_activity_version_key(school_id))
+
+
+def bump_assignment_version(school_id, year_id):
+    """Invalidate the session snapshots of a school year (teacher assignments changed)."""
+    if school_id and year_id:
+        _bump(_assignment_version_key(school_id, year_id))
+
+
+def bump_user_version(user_id):
+    """Invalidate a user's session snapshot (role or school membership changed)."""
+    if user_id:
+        _bump(_user_version_key(user_id))
+
+
+def get_snapshot_version(user_id, school_id=None, year_id=None):
+    """
+    Combined version of a user's own namespace, their school and the school
+    year's teacher assignments, fetched in one round trip. It changes
+    whenever any of them is bumped.
+    """
+    keys = [_user_version_key(user_id)]
+    if school_id:
+        keys.append(_school_version_key(school_id))
+        if year_id:
+            keys.append(_assignment_version_key(school_id, year_id))
+    return '.'.join(str(version) for version in _get_versions(*keys))
+
+
+def school_cache_key(school_id, name, year_id=None):
+    """Build a versioned cache key in the school or (school, year) namespace."""
+    if year_id is None:
+        return f'school:{school_id}:v{get_school_version(school_id)}:{name}'
+
+    school_version, year_version = _get_versions(
+        _school_version_key(school_id),
+        _year_version_key(school_id, year_id)
+    )
+    return f'school:{school_id}:v{school_version}:year:{year_id}:v{year_version}:{name}'
+
+
+def _get_or_compute(key, compute, timeout):
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def cached_for_school(school_id, name, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Return the cached value `name` for a school, computing and storing it
+    with compute() on a miss.
+    """
+    return _get_or_compute(school_cache_key(school_id, name), compute, timeout)
+
+
+def cached_for_year(school_id, year_id, name, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Return the cached value `name` for an academic year of a school,
+    computing and storing it with compute() on a miss.
+    """
+    return _get_or_compute(school_cache_key(school_id, name, year_id=year_id), compute, timeout)
+
+
+def cached_activity_for_school(school_id, name, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Return the cached value `name` for a school's activity feed, computing
+    and storing it with compute() on a miss.
+    """
+    version = _get_versions(_activity_version_key(school_id))[0]
+    return _get_or_compute(f'activity:{school_id}:v{version}:{name}', compute, timeout)
+
+
+def memoize_for_school(name=None, timeout=DEFAULT_TIMEOUT, per_year=False):
+    """
+    Decorator that caches a function's result in the school namespace.
+
+    The decorated function must take the school (instance or id) as its first
+    argument and, with per_year=True, the school year (instance or id) as its
+    second. Any further arguments become part of the cache key, so they must
+    have a stable repr().
+
+        @memoize_for_school('class_averages', per_year=True)
+        def get_class_averages(school, school_year, standard_id):
+            ...
+    """
+    def decorator(func):
+        base_name = name or f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(school, *args, **kwargs):
+            school_id = _to_id(school)
+            year_id = None
+            key_args = args
+            if per_year:
+                if not args or args[0] is None:
+                    return func(school, *args, **kwargs)
+                year_id = _to_id(args[0])
+                key_args = args[1:]
+
+            key_name = base_name
+            if key_args or kwargs:
+                signature = repr((key_args, sorted(kwargs.items())))
+                key_name = f'{base_name}:{hashlib.md5(signature.encode()).hexdigest()}'
+
+            key = school_cache_key(school_id, key_name, year_id=year_id)
+            return _get_or_compute(key, lambda: func(school, *args, **kwargs), timeout)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,201 @@
+"""
+Signals that invalidate cached data (see core/cache.py).
+
+Changes to school-wide data (classes, staff, years, terms) bump the school
+namespace. Changes to data that belongs to one academic year (enrollments,
+teacher and subject assignments, tests, scores, term reports) only bump that
+year's namespace.
+
+Changes to a user's role or school membership bump that user's version, so
+their session snapshot is rebuilt on the next request; teacher assignment
+changes also bump the year's assignment version, which rebuilds the
+snapshots of that school year.
+
+New activity stream entries bump the school's activity feed version.
+
+Bumps are deferred until the surrounding transaction commits, so a request
+running in parallel cannot re-cache data that is about to change.
+"""
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.cache import (
+    bump_activity_version, bump_assignment_version, bump_school_version, bump_user_version, bump_year_version
+)
+
+
+def _on_commit_bump_school(school_id):
+    if school_id:
+        transaction.on_commit(lambda: bump_school_version(school_id))
+
+
+def _on_commit_bump_user(user_id):
+    if user_id:
+        transaction.on_commit(lambda: bump_user_version(user_id))
+
+
+def _on_commit_bump_activity(school_id):
+    if school_id:
+        transaction.on_commit(lambda: bump_activity_version(school_id))
+
+
+def _on_commit_bump_year(scope):
+    school_id, year_id = scope or (None, None)
+    if school_id and year_id:
+        transaction.on_commit(lambda: bump_year_version(school_id, year_id))
+
+
+def _on_commit_bump_assignments(scope):
+    school_id, year_id = scope or (None, None)
+    if school_id and year_id:
+        transaction.on_commit(lambda: bump_assignment_version(school_id, year_id))
+
+
+# Scope lookups. Terms, tests and test subjects never move between school years,
+# so these are safe to memoize for the life of the process.
+
+@lru_cache(maxsize=4096)
+def _year_scope(year_id):
+    from academics.models import SchoolYear
+    school_id = SchoolYear.objects.filter(pk=year_id).values_list('school_id', flat=True).first()
+    return (school_id, year_id) if school_id else None
+
+
+@lru_cache(maxsize=4096)
+def _term_scope(term_id):
+    from academics.models import Term
+    return Term.objects.filter(pk=term_id).values_list('year__school_id', 'year_id').first()
+
+
+@lru_cache(maxsize=4096)
+def _test_scope(test_id):
+    from reports.models import Test
+    return Test.objects.filter(pk=test_id).values_list('term__year__school_id', 'term__year_id').first()
+
+
+@lru_cache(maxsize=4096)
+def _test_subject_scope(test_subject_id):
+    from reports.models import TestSubject
+    return TestSubject.objects.filter(pk=test_subject_id).values_list(
+        'test__term__year__school_id', 'test__term__year_id'
+    ).first()
+
+
+@lru_cache(maxsize=4096)
+def _term_review_scope(term_review_id):
+    from reports.models import StudentTermReview
+    return StudentTermReview.objects.filter(pk=term_review_id).values_list(
+        'term__year__school_id', 'term__year_id'
+    ).first()
+
+
+# School namespace
+
+@receiver(post_save, sender='schools.School')
+def invalidate_school_cache(sender, instance, **kwargs):
+    """School settings (e.g. groups per standard) changed"""
+    _on_commit_bump_school(instance.pk)
+
+
+@receiver(post_save, sender='schools.Standard')
+@receiver(post_delete, sender='schools.Standard')
+@receiver(post_save, sender='academics.SchoolStaff')
+@receiver(post_delete, sender='academics.SchoolStaff')
+@receiver(post_save, sender='academics.SchoolYear')
+@receiver(post_delete, sender='academics.SchoolYear')
+def invalidate_school_member_cache(sender, instance, **kwargs):
+    """A class, staff membership or academic year changed"""
+    _on_commit_bump_school(instance.school_id)
+
+
+@receiver(post_save, sender='academics.Term')
+@receiver(post_delete, sender='academics.Term')
+def invalidate_calendar_cache(sender, instance, **kwargs):
+    """Term dates or finalization changed (affects the cached calendar)"""
+    scope = _year_scope(instance.year_id)
+    if scope:
+        _on_commit_bump_school(scope[0])
+
+
+# User versions (session snapshots)
+
+@receiver(post_save, sender='core.UserProfile')
+@receiver(post_delete, sender='core.UserProfile')
+def invalidate_user_profile_snapshot(sender, instance, **kwargs):
+    """User type changed"""
+    _on_commit_bump_user(instance.user_id)
+
+
+@receiver(post_save, sender='academics.SchoolStaff')
+@receiver(post_delete, sender='academics.SchoolStaff')
+def invalidate_staff_member_snapshot(sender, instance, **kwargs):
+    """Staff member joined, left or moved between schools"""
+    if sender.staff.field.is_cached(instance):
+        user_id = instance.staff.user_id
+    else:
+        from core.models import UserProfile
+        user_id = UserProfile.objects.filter(pk=instance.staff_id).values_list('user_id', flat=True).first()
+    _on_commit_bump_user(user_id)
+
+
+@receiver(post_save, sender='academics.StandardTeacher')
+@receiver(post_delete, sender='academics.StandardTeacher')
+def invalidate_teacher_assignment_snapshots(sender, instance, **kwargs):
+    """Teacher assigned to or unassigned from a class (the teacher's class is in the snapshot)"""
+    _on_commit_bump_assignments(_year_scope(instance.year_id))
+
+
+# (school, year) namespace
+
+@receiver(post_save, sender='academics.StandardEnrollment')
+@receiver(post_delete, sender='academics.StandardEnrollment')
+@receiver(post_save, sender='academics.StandardTeacher')
+@receiver(post_delete, sender='academics.StandardTeacher')
+@receiver(post_save, sender='academics.StandardSubject')
+@receiver(post_delete, sender='academics.StandardSubject')
+def invalidate_year_assignment_cache(sender, instance, **kwargs):
+    """Class enrollment, teacher assignment or subject assignment changed"""
+    _on_commit_bump_year(_year_scope(instance.year_id))
+
+
+@receiver(post_save, sender='reports.Test')
+@receiver(post_delete, sender='reports.Test')
+@receiver(post_save, sender='reports.StudentTermReview')
+@receiver(post_delete, sender='reports.StudentTermReview')
+def invalidate_term_data_cache(sender, instance, **kwargs):
+    """Test or term report created, edited, finalized or deleted"""
+    if instance.term_id:
+        _on_commit_bump_year(_term_scope(instance.term_id))
+
+
+@receiver(post_save, sender='reports.TestSubject')
+@receiver(post_delete, sender='reports.TestSubject')
+def invalidate_test_subject_cache(sender, instance, **kwargs):
+    """Subject added to or removed from a test"""
+    _on_commit_bump_year(_test_scope(instance.test_id))
+
+
+@receiver(post_save, sender='reports.TestScore')
+@receiver(post_delete, sender='reports.TestScore')
+def invalidate_test_score_cache(sender, instance, **kwargs):
+    """Test score entered or changed"""
+    _on_commit_bump_year(_test_subject_scope(instance.test_subject_id))
+
+
+@receiver(post_save, sender='reports.StudentSubjectScore')
+@receiver(post_delete, sender='reports.StudentSubjectScore')
+def invalidate_subject_score_cache(sender, instance, **kwargs):
+    """Term report subject score changed"""
+    _on_commit_bump_year(_term_review_scope(instance.term_review_id))
+
+
+# Activity feeds
+
+@receiver(post_save, sender='actstream.Action')
+@receiver(post_delete, sender='actstream.Action')
+def invalidate_activity_feed_cache(sender, instance, **kwargs):
+    """Activity recorded with action.send() (buffered activity bumps the feed itself)"""
+    _on_commit_bump_activity((getattr(instance, 'data', None) or {}).get('school_id'))
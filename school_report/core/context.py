@@ -0,0 +1,204 @@
+"""
+Request-scoped school context for the School Report System.
+
+Views under /<school_slug>/ all need the same handful of objects: the school,
+the user's profile and staff record, the current academic year and term and,
+for teachers, their current class. SchoolContextMiddleware attaches a
+SchoolContext to the request as request.school_ctx. Every attribute is
+resolved lazily on first access and then memoized for the rest of the request,
+so a view only pays for what it uses and never looks anything up twice:
+
+- staff, school, profile and role come from one joined SchoolStaff query,
+  usually the one that loaded the user (core.auth_backends.StaffContextBackend)
+- year, term_number and vacation_status come from the cached calendar
+  (shared with templates through get_request_calendar())
+- teacher_assignment and teacher_standard come from one StandardTeacher query
+"""
+from functools import cached_property, wraps
+
+from django.contrib import messages
+from django.http import Http404
+from django.shortcuts import redirect
+
+
+class SchoolContext:
+    """Lazily resolved school, staff and calendar information for one request."""
+
+    def __init__(self, request, school_slug):
+        self.request = request
+        self.school_slug = school_slug
+
+    @cached_property
+    def staff(self):
+        """The user's active SchoolStaff record for this school, or None."""
+        from academics.models import SchoolStaff
+
+        if not self.request.user.is_authenticated:
+            return None
+
+        # Already loaded with the user by StaffContextBackend
+        school_staff = getattr(self.request.user, 'active_school_staff', None)
+        if school_staff and school_staff.school.slug == self.school_slug:
+            return school_staff
+
+        return SchoolStaff.objects.select_related('school', 'staff').filter(
+            school__slug=self.school_slug,
+            staff__user_id=self.request.user.id,
+            is_active=True
+        ).first()
+
+    @cached_property
+    def school(self):
+        """The school for this request (raises Http404 if it does not exist)."""
+        from schools.models import School
+
+        if self.staff:
+            return self.staff.school
+        school = School.objects.filter(slug=self.school_slug).first()
+        if not school:
+            raise Http404("No School matches the given query.")
+        return school
+
+    @cached_property
+    def profile(self):
+        """The user's UserProfile, or None."""
+        if self.staff:
+            return self.staff.staff
+        return getattr(self.request.user, 'profile', None)
+
+    @cached_property
+    def role(self):
+        """The user's type ('principal', 'administration' or 'teacher'), or None."""
+        return self.profile.user_type if self.profile else None
+
+    @property
+    def is_staff_member(self):
+        return self.staff is not None
+
+    @cached_property
+    def calendar(self):
+        from core.utils import get_cached_year_and_term
+
+        # Share the request calendar when this is the user's own school
+        if self.school_slug == self.request.session.get('user_school_slug'):
+            return get_request_calendar(self.request)
+        return get_cached_year_and_term(self.school)
+
+    @property
+    def year(self):
+        """The current SchoolYear, or None."""
+        return self.calendar[0]
+
+    @property
+    def term_number(self):
+        """The current term number (1-3), or None during vacations."""
+        return self.calendar[1]
+
+    @property
+    def vacation_status(self):
+        return self.calendar[2]
+
+    @cached_property
+    def term(self):
+        """The current Term, or None during vacations."""
+        if not self.year or not self.term_number:
+            return None
+        return self.year.terms.filter(term_number=self.term_number).first()
+
+    @cached_property
+    def teacher_assignment(self):
+        """The teacher's current StandardTeacher record for this year, or None."""
+        from core.utils import get_current_teacher_assignment
+
+        if self.role != 'teacher' or not self.year:
+            return None
+        return get_current_teacher_assignment(self.profile, self.year)
+
+    @property
+    def teacher_standard(self):
+        """The teacher's current class, or None."""
+        return self.teacher_assignment.standard if self.teacher_assignment else None
+
+
+def get_request_calendar(request):
+    """
+    Get (current_year, current_term, vacation_status) for the user's school.
+
+    Resolved from the per-school calendar cache on first use and memoized on
+    the request, so views, SchoolContext and templates share one lookup. The
+    calendar values kept in the session are refreshed if they have gone stale
+    (e.g. a new term started since login).
+    """
+    calendar = getattr(request, '_school_calendar', None)
+    if calendar is None:
+        from core.utils import get_cached_year_and_term
+
+        calendar = get_cached_year_and_term(request.session.get('user_school_id'))
+        _refresh_session_calendar(request.session, calendar)
+        request._school_calendar = calendar
+    return calendar
+
+
+def _refresh_session_calendar(session, calendar):
+    current_year, current_term, vacation_status = calendar
+    values = {
+        'current_year_id': current_year.id if current_year else None,
+        'current_term': current_term,
+        'vacation_status': vacation_status,
+        'is_on_vacation': (vacation_status is not None) if current_year else None,
+    }
+    for key, value in values.items():
+        # Only write changed keys, so an up-to-date session is not re-saved
+        if session.get(key) != value:
+            session[key] = value
+
+
+def get_school_context(request, school_slug):
+    """
+    Get the SchoolContext for a request, creating it if the middleware has not
+    (e.g. for views that take the school slug from somewhere other than the URL).
+    """
+    ctx = getattr(request, 'school_ctx', None)
+    if ctx is None or ctx.school_slug != school_slug:
+        ctx = SchoolContext(request, school_slug)
+        request.school_ctx = ctx
+    return ctx
+
+
+def school_staff_required(roles=None, role_message="Access denied.", staff_message=None):
+    """
+    Decorator for function views that take a school_slug argument.
+
+    Resolves request.school_ctx and redirects to the home page with an error
+    message if the user's role is not in `roles`, or - when staff_message is
+    given - if the user is not an active staff member of the school.
+    """
+    if isinstance(roles, str):
+        roles = [roles]
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, school_slug, *args, **kwargs):
+            ctx = get_school_context(request, school_slug)
+            ctx.school  # 404 for unknown schools before any permission message
+
+            if roles and ctx.role not in roles:
+                messages.error(request, role_message)
+                return redirect('core:home')
+
+            if staff_message and not ctx.is_staff_member:
+                messages.error(request, staff_message)
+                return redirect('core:home')
+
+            return view_func(request, school_slug, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def teacher_required(staff_message):
+    """Shortcut for school_staff_required() on teacher-only views."""
+    return school_staff_required(
+        'teacher',
+        role_message="Only teachers can access this page.",
+        staff_message=staff_message
+    )
@@ -0,0 +1,116 @@
+"""
+Server-side processing for DataTables (https://datatables.net/manual/server-side).
+
+Large lists are not rendered into the page. The table is initialised with
+`serverSide: true` and an `ajax` URL pointing at a view using
+DataTablesMixin, which answers each draw with one page of rows:
+
+- search: every word of the search box must match one of the searchable
+  columns (case-insensitive contains), so "ann smi" finds Anne Smith
+- ordering: the requested columns, mapped to database fields
+- paging: start and length, capped at MAX_PAGE_LENGTH
+
+so filtering, counting, ordering and slicing all happen in the database.
+"""
+from django.db.models import Q
+from django.http import JsonResponse
+
+MAX_PAGE_LENGTH = 100
+
+
+class DataTableColumn:
+    """
+    A column of a server-side DataTable.
+
+    order_by: fields to sort by when the column is ordered (empty = not orderable)
+    search: fields matched against the search words (empty = not searchable)
+    """
+
+    def __init__(self, name, order_by=(), search=()):
+        self.name = name
+        self.order_by = tuple(order_by)
+        self.search = tuple(search)
+
+
+def _int_param(params, name, default):
+    try:
+        return int(params.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class DataTablesMixin:
+    """
+    View mixin answering DataTables server-side requests with JSON.
+
+    Subclasses set `columns` (DataTableColumn, in table order) and implement
+    get_queryset() (the unfiltered rows the user may see) and render_row()
+    (one row as a list of cell values or HTML). get_default_order() gives the
+    ordering used when the request has none.
+    """
+    columns = []
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def render_row(self, obj):
+        raise NotImplementedError
+
+    def get_default_order(self):
+        return []
+
+    def get_page_context(self, objects):
+        """Hook to look up data for a whole page of rows at once"""
+        return {}
+
+    def filter_search(self, queryset, value):
+        words = value.split()
+        fields = [field for column in self.columns for field in column.search]
+        if not words or not fields:
+            return queryset
+        for word in words:
+            matches = Q()
+            for field in fields:
+                matches |= Q(**{f'{field}__icontains': word})
+            queryset = queryset.filter(matches)
+        return queryset
+
+    def get_ordering(self, params):
+        ordering = []
+        index = 0
+        while f'order[{index}][column]' in params:
+            column_index = _int_param(params, f'order[{index}][column]', -1)
+            descending = params.get(f'order[{index}][dir]') == 'desc'
+            if 0 <= column_index < len(self.columns):
+                for field in self.columns[column_index].order_by:
+                    ordering.append(f'-{field}' if descending else field)
+            index += 1
+        return ordering or list(self.get_default_order())
+
+    def get(self, request, *args, **kwargs):
+        params = request.GET
+        queryset = self.get_queryset()
+
+        records_total = queryset.count()
+        search = params.get('search[value]', '').strip()
+        if search:
+            queryset = self.filter_search(queryset, search)
+            records_filtered = queryset.count()
+        else:
+            records_filtered = records_total
+
+        start = max(_int_param(params, 'start', 0), 0)
+        length = _int_param(params, 'length', 10)
+        if length < 1 or length > MAX_PAGE_LENGTH:
+            length = MAX_PAGE_LENGTH
+
+        # The primary key keeps paging stable when the sort values tie
+        objects = list(queryset.order_by(*self.get_ordering(params), 'pk')[start:start + length])
+        self.page_context = self.get_page_context(objects)
+
+        return JsonResponse({
+            'draw': _int_param(params, 'draw', 0),
+            'recordsTotal': records_total,
+            'recordsFiltered': records_filtered,
+            'data': [self.render_row(obj) for obj in objects],
+        })
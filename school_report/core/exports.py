@@ -0,0 +1,253 @@
+"""
+Streaming CSV and XLSX exports.
+
+Exports are written while the rows are read, so memory use does not grow with
+the size of the export:
+
+- the caller passes a generator of row tuples, normally built from
+  queryset.values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+- export_response() returns a StreamingHttpResponse that encodes the rows as
+  CSV, or as an XLSX workbook when the request asks for ?format=xlsx
+
+XLSX files are zip archives of XML parts. The sheet is written row by row with
+the standard library zipfile module (which supports unseekable output), so no
+spreadsheet package is needed and the workbook is never built in memory.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows encoded per chunk of the response
+ROWS_PER_CHUNK = 500
+
+# Characters that make a spreadsheet treat a CSV value as a formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Control characters that are not allowed in XML
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# Excel's limit on the length of a cell
+_MAX_CELL_LENGTH = 32767
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+def get_export_format(request):
+    """'xlsx' if the request asks for ?format=xlsx, otherwise 'csv'"""
+    return 'xlsx' if request.GET.get('format') == 'xlsx' else 'csv'
+
+
+def get_filter_object(request, param, queryset):
+    """
+    The object of `queryset` whose ID is in ?<param>=, None when the parameter
+    is absent, and a 404 when it does not name an object of the queryset.
+    """
+    value = request.GET.get(param)
+    if not value:
+        return None
+    if not value.isdigit():
+        raise Http404(f"Invalid {param}.")
+    return get_object_or_404(queryset, pk=value)
+
+
+def export_response(filename, header, rows, file_format='csv'):
+    """
+    Stream `rows` (an iterable of tuples matching `header`) as a CSV or XLSX
+    download named `filename` plus the extension.
+    """
+    if file_format == 'xlsx':
+        response = StreamingHttpResponse(stream_xlsx(header, rows), content_type=XLSX_CONTENT_TYPE)
+    else:
+        response = StreamingHttpResponse(stream_csv(header, rows), content_type=CSV_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
+class _LineBuffer:
+    """File-like object for csv.writer that returns each line instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M') if timezone.is_aware(value) else value.isoformat(' ')
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        # Keep user-entered text from being run as a spreadsheet formula
+        return "'" + value
+    return value
+
+
+def stream_csv(header, rows):
+    """Yield the CSV file as UTF-8 bytes (with a BOM, so Excel detects the encoding)"""
+    writer = csv.writer(_LineBuffer())
+    yield ('\ufeff' + writer.writerow(header)).encode()
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, ROWS_PER_CHUNK))
+        if not chunk:
+            return
+        yield ''.join(writer.writerow([_csv_value(value) for value in row]) for row in chunk).encode()
+
+
+class _StreamBuffer:
+    """Write-only file object for zipfile that hands back what was written so far"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+_CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Cell styles: 0 default, 1 bold header, 2 date, 3 date and time
+_STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/>'
+    '<numFmt numFmtId="165" formatCode="yyyy-mm-dd hh:mm"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews>'
+    '<sheetData>'
+)
+
+_SHEET_END = '</sheetData></worksheet>'
+
+
+def _xlsx_text(value, style=0):
+    value = _ILLEGAL_XML_CHARS.sub('', str(value))[:_MAX_CELL_LENGTH]
+    style_attr = f' s="{style}"' if style else ''
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{escape(value)}</t></is></c>'
+
+
+def _xlsx_cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        return f'<c s="3"><v>{(value - _EXCEL_EPOCH).total_seconds() / 86400:.6f}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="2"><v>{(value - _EXCEL_EPOCH.date()).days}</v></c>'
+    return _xlsx_text(value)
+
+
+def _xlsx_row(cells):
+    return f'<row>{"".join(cells)}</row>'
+
+
+def stream_xlsx(header, rows, sheet_name='Export'):
+    """Yield an XLSX workbook with one sheet holding `header` and `rows`"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr('[Content_Types].xml', _CONTENT_TYPES_XML)
+        workbook.writestr('_rels/.rels', _ROOT_RELS_XML)
+        workbook.writestr('xl/workbook.xml', _WORKBOOK_XML.format(sheet_name=escape(sheet_name[:31])))
+        workbook.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS_XML)
+        workbook.writestr('xl/styles.xml', _STYLES_XML)
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write((_SHEET_START + _xlsx_row(_xlsx_text(title, style=1) for title in header)).encode())
+            yield buffer.drain()
+
+            rows = iter(rows)
+            while True:
+                chunk = list(islice(rows, ROWS_PER_CHUNK))
+                if not chunk:
+                    break
+                sheet.write(''.join(_xlsx_row(_xlsx_cell(value) for value in row) for row in chunk).encode())
+                yield buffer.drain()
+
+            sheet.write(_SHEET_END.encode())
+    # Closing the archive writes its central directory
+    yield buffer.drain()
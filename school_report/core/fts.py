@@ -0,0 +1,120 @@
+"""
+SQLite FTS5 indexes over model tables, used by the development database.
+
+An SqliteFtsIndex is an external-content FTS5 table: it stores only the
+full-text index and reads the text from the model's table, and triggers on
+that table keep it in step with every insert, update and delete (including
+bulk_create and QuerySet.update()). Searches select from it by rowid:
+
+    queryset.filter(id__in=RawSQL(index.match_sql(), [fts_query(words)]))
+
+and rank them with rank_sql().
+
+Migrations create the index with create() inside a vendor check. SQLite
+migrations that alter the model's table rebuild it, which drops its
+triggers, so each app connects ensure_triggers() to post_migrate.
+"""
+from django.db import connections
+
+
+def fts_query(terms, prefix=False):
+    """
+    An FTS5 query matching every term. Terms are quoted, so FTS5 syntax in
+    them is literal and a term of several words matches as a phrase.
+    """
+    suffix = '*' if prefix else ''
+    return ' '.join('"{}"{}'.format(term.replace('"', '""'), suffix) for term in terms)
+
+
+class SqliteFtsIndex:
+    """An FTS5 table named `name` over `columns` of `content_table`."""
+
+    def __init__(self, name, content_table, columns, tokenize='unicode61 remove_diacritics 2', prefix=None):
+        self.name = name
+        self.content_table = content_table
+        self.columns = tuple(columns)
+        self.tokenize = tokenize
+        self.prefix = prefix
+        self._available = {}
+
+    def _triggers(self):
+        columns = ', '.join(self.columns)
+        new_values = ', '.join(f'new.{column}' for column in self.columns)
+        old_values = ', '.join(f'old.{column}' for column in self.columns)
+        delete_old = (
+            f"INSERT INTO {self.name} ({self.name}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values});"
+        )
+        insert_new = f"INSERT INTO {self.name} (rowid, {columns}) VALUES (new.id, {new_values});"
+        return {
+            f'{self.name}_ai': f"AFTER INSERT ON {self.content_table} BEGIN {insert_new} END",
+            f'{self.name}_ad': f"AFTER DELETE ON {self.content_table} BEGIN {delete_old} END",
+            f'{self.name}_au': f"AFTER UPDATE ON {self.content_table} BEGIN {delete_old} {insert_new} END",
+        }
+
+    def create(self, schema_editor):
+        """
+        Create the FTS5 table and its triggers and index the existing rows.
+        Raises OperationalError when SQLite was built without FTS5.
+        """
+        options = [
+            f"content='{self.content_table}'",
+            "content_rowid='id'",
+            f"tokenize='{self.tokenize}'",
+        ]
+        if self.prefix:
+            options.append(f"prefix='{self.prefix}'")
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {self.name} USING fts5({', '.join(self.columns + tuple(options))})")
+        for name, definition in self._triggers().items():
+            schema_editor.execute(f"CREATE TRIGGER {name} {definition}")
+        schema_editor.execute(f"INSERT INTO {self.name} ({self.name}) VALUES ('rebuild')")
+
+    def drop(self, schema_editor):
+        """Remove the FTS5 table and its triggers"""
+        for name in self._triggers():
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {self.name}")
+
+    def is_available(self, using='default'):
+        """Whether the index exists on a SQLite database (it is skipped without FTS5)"""
+        if using not in self._available:
+            db = connections[using]
+            self._available[using] = db.vendor == 'sqlite' and self.name in db.introspection.table_names()
+        return self._available[using]
+
+    def ensure_triggers(self, sender=None, using='default', **kwargs):
+        """
+        post_migrate receiver recreating missing triggers; the index is
+        rebuilt when any had to be recreated.
+        """
+        db = connections[using]
+        if db.vendor != 'sqlite' or self.name not in db.introspection.table_names():
+            return
+
+        with db.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [self.content_table]
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = {name: definition for name, definition in self._triggers().items() if name not in existing}
+            for name, definition in missing.items():
+                cursor.execute(f"CREATE TRIGGER {name} {definition}")
+            if missing:
+                cursor.execute(f"INSERT INTO {self.name} ({self.name}) VALUES ('rebuild')")
+
+    def match_sql(self):
+        """Subquery of the ids of the rows matching an FTS5 query (one parameter)"""
+        return f"SELECT rowid FROM {self.name} WHERE {self.name} MATCH %s"
+
+    def rank_sql(self):
+        """
+        Subquery of the bm25 rank of the outer row for an FTS5 query (one
+        parameter); lower is a better match.
+        """
+        # The LIMIT keeps SQLite from flattening the inner query, so the
+        # matches are ranked once (and auto-indexed by rowid) rather than
+        # the query being run again for every outer row
+        return (
+            f"SELECT ranked.rank FROM (SELECT rowid, rank FROM {self.name} WHERE {self.name} MATCH %s "
+            f"ORDER BY rowid LIMIT -1) AS ranked WHERE ranked.rowid = {self.content_table}.id"
+        )
@@ -0,0 +1,105 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.audit_archive import KINDS, archive_root, archive_rows, get_sources, start_of_day
+from schools.models import School
+
+
+class Command(BaseCommand):
+    help = ('Move audit log, activity stream and audit changeset rows from closed school years '
+            'into gzipped NDJSON archive files (one per school and month)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            required=True,
+            help='Archive rows older than this date (YYYY-MM-DD). Rows from a school\'s '
+                 'latest school year are always kept.'
+        )
+        parser.add_argument(
+            '--school',
+            help='Slug or ID of the school to archive (default: all schools)'
+        )
+        parser.add_argument(
+            '--kind',
+            action='append',
+            choices=KINDS,
+            help='Kind of rows to archive; can be repeated (default: all)'
+        )
+        parser.add_argument(
+            '--root',
+            help='Archive directory (default: AUDIT_ARCHIVE_ROOT)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows read and written to the archive at a time (default: 2000)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows deleted per statement (default: 500)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to wait between delete batches (default: 0)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be archived without writing or deleting anything'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            before = start_of_day(date.fromisoformat(options['before']))
+        except ValueError:
+            raise CommandError(f'Invalid date "{options["before"]}", expected YYYY-MM-DD.')
+
+        school = self.get_school(options['school']) if options['school'] else None
+        root = options['root'] or archive_root()
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('\n--- DRY RUN MODE ---'))
+        self.stdout.write(f'\nArchiving rows before {before:%Y-%m-%d} to {root}')
+        if school:
+            self.stdout.write(f'School: {school}')
+
+        sources = get_sources()
+        total = 0
+        started = time.monotonic()
+        for kind in options['kind'] or KINDS:
+            counts = archive_rows(
+                sources[kind],
+                before,
+                root=root,
+                school_id=school.id if school else None,
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+                pause=options['pause'],
+                dry_run=options['dry_run'],
+            )
+            kind_total = sum(counts.values())
+            total += kind_total
+            self.stdout.write(f'\n{kind}: {kind_total} rows')
+            for (school_id, month), count in sorted(counts.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+                self.stdout.write(f'  school {school_id or "-"} {month}: {count}')
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{"Would archive" if options["dry_run"] else "Archived"} {total} rows in {elapsed:.2f}s'
+        ))
+
+    def get_school(self, value):
+        """Look up a school by slug or ID"""
+        lookup = {'id': int(value)} if value.isdigit() else {'slug': value}
+        try:
+            return School.objects.get(**lookup)
+        except School.DoesNotExist:
+            raise CommandError(f'School "{value}" does not exist.')
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from schools.models import Student
+
+
+class Command(BaseCommand):
+    help = 'Populate Student.identity_key (used for duplicate detection) for existing students'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Students read and updated at a time (default: 1000)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute every key, not only missing ones (e.g. after the normalization changed)'
+        )
+
+    def handle(self, *args, **options):
+        students = Student.objects.only(
+            'id', 'first_name', 'last_name', 'date_of_birth', 'parent_name', 'identity_key'
+        ).order_by('pk')
+        if not options['all']:
+            students = students.filter(identity_key='')
+
+        checked = updated = 0
+        last_pk = 0
+        started = time.monotonic()
+        while True:
+            # Keyset batches, so rows updated by an earlier batch are not skipped or re-read
+            batch = list(students.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            checked += len(batch)
+
+            changed = []
+            for student in batch:
+                key = student.compute_identity_key()
+                if key != student.identity_key:
+                    student.identity_key = key
+                    changed.append(student)
+            # bulk_update skips save() and auditlog: the key is derived data
+            Student.objects.bulk_update(changed, ['identity_key'])
+            updated += len(changed)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} students, updated {updated} identity keys in {elapsed:.2f}s'
+        ))
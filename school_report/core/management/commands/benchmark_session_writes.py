@@ -0,0 +1,99 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.middleware import track_idle_activity
+
+
+class Command(BaseCommand):
+    help = 'Compare session writes from idle tracking with and without write throttling'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Number of simulated page views per user (default: 500)'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10,
+            help='Number of simulated users (default: 10)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds between page views of a user (default: 5)'
+        )
+        parser.add_argument(
+            '--granularity',
+            type=int,
+            default=settings.IDLE_ACTIVITY_GRANULARITY_SECONDS,
+            help='Write granularity in seconds (default: IDLE_ACTIVITY_GRANULARITY_SECONDS)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'\nSession engine: {settings.SESSION_ENGINE}')
+        self.stdout.write(
+            f'{options["users"]} users x {options["requests"]} page views, '
+            f'one every {options["interval"]:g}s\n'
+        )
+
+        baseline = self.run(options, granularity=0)
+        throttled = self.run(options, granularity=options['granularity'])
+
+        self.report('Every request (granularity 0s)', baseline)
+        self.report(f'Throttled (granularity {options["granularity"]}s)', throttled)
+
+        if baseline['saves']:
+            reduction = 100 - throttled['saves'] * 100 / baseline['saves']
+            self.stdout.write(self.style.SUCCESS(f'\nSession writes reduced by {reduction:.1f}%'))
+
+    def run(self, options, granularity):
+        """Simulate page views through the idle tracking and count session saves"""
+        engine = import_module(settings.SESSION_ENGINE)
+        saves = 0
+        sessions = []
+
+        started = time.monotonic()
+        with CaptureQueriesContext(connection) as queries:
+            for user in range(options['users']):
+                session = engine.SessionStore()
+                session['user_id'] = user
+                session.save()
+                sessions.append(session)
+
+                now = time.time()
+
+                for _ in range(options['requests']):
+                    now += options['interval']
+                    track_idle_activity(session, now, granularity=granularity)
+
+                    # Same rule SessionMiddleware uses to decide whether to save
+                    if session.modified:
+                        session.save()
+                        session.modified = False
+                        saves += 1
+        elapsed = time.monotonic() - started
+
+        writes = sum(
+            1 for query in queries.captured_queries
+            if query['sql'].lstrip().upper().startswith(('UPDATE', 'INSERT'))
+        )
+
+        for session in sessions:
+            session.delete()
+
+        return {'saves': saves, 'db_writes': writes, 'elapsed': elapsed}
+
+    def report(self, label, result):
+        self.stdout.write(
+            f'  {label}: {result["saves"]} session saves, '
+            f'{result["db_writes"]} database writes, {result["elapsed"]:.2f}s'
+        )
@@ -0,0 +1,85 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schools.models import School, Student
+from schools.student_matching import DEFAULT_THRESHOLD, active_schools, find_duplicate_pairs, rebuild_match_index
+
+
+class Command(BaseCommand):
+    help = 'Report students that are probably the same child, e.g. entered again with a typo after a transfer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help=f'Minimum similarity from 0 to 1 (default: {DEFAULT_THRESHOLD})'
+        )
+        parser.add_argument(
+            '--school',
+            type=str,
+            help='Only report pairs involving a student registered at this school (slug or ID)'
+        )
+        parser.add_argument(
+            '--cross-school',
+            action='store_true',
+            help='Only report pairs of students registered at different schools'
+        )
+        parser.add_argument(
+            '--rebuild-index',
+            action='store_true',
+            help='Recompute the matching keys of every student first (e.g. after upgrading)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=200,
+            help='Maximum number of pairs to print, best first (default: 200)'
+        )
+
+    def handle(self, *args, **options):
+        if not 0 < options['threshold'] <= 1:
+            raise CommandError('--threshold must be between 0 and 1.')
+        school = self.get_school(options['school']) if options['school'] else None
+
+        started = time.monotonic()
+        if options['rebuild_index']:
+            count = rebuild_match_index()
+            self.stdout.write(f'Indexed {count} students in {time.monotonic() - started:.2f}s')
+
+        pairs = sorted(find_duplicate_pairs(threshold=options['threshold']), reverse=True)
+        schools = active_schools(list({student_id for _score, a, b in pairs for student_id in (a, b)}))
+
+        if school or options['cross_school']:
+            pairs = [
+                (score, a, b) for score, a, b in pairs
+                if (not school or school in (schools.get(a), schools.get(b)))
+                and (not options['cross_school'] or schools.get(a) != schools.get(b))
+            ]
+
+        shown = pairs[:options['limit']]
+        students = Student.objects.in_bulk({student_id for _score, a, b in shown for student_id in (a, b)})
+        for score, a, b in shown:
+            self.stdout.write(f'{score:.0%}')
+            for student_id in (a, b):
+                student = students[student_id]
+                registered = schools.get(student_id)
+                self.stdout.write(
+                    f'  {student.id}: {student.get_full_name()}, born {student.date_of_birth:%Y-%m-%d}, '
+                    f'parent {student.parent_name}, {registered.name if registered else "no school"}'
+                )
+
+        elapsed = time.monotonic() - started
+        more = f' (showing {len(shown)})' if len(shown) < len(pairs) else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'Found {len(pairs)} possible duplicate pairs{more} in {elapsed:.2f}s'
+        ))
+
+    def get_school(self, value):
+        """Look up a school by slug or ID"""
+        lookup = {'id': int(value)} if value.isdigit() else {'slug': value}
+        try:
+            return School.objects.get(**lookup)
+        except School.DoesNotExist:
+            raise CommandError(f'School "{value}" does not exist.')
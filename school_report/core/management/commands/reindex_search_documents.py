@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.search import reindex
+from schools.models import School
+
+
+class Command(BaseCommand):
+    help = ('Bring the report and test search index up to date: index what changed since the last run '
+            'and remove documents of deleted reports and tests')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--school',
+            type=str,
+            help='Only reindex this school (slug or ID)'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Reindex every report and test, also refreshing their classes and teachers '
+                 '(e.g. after the first migration or a bulk import)'
+        )
+
+    def handle(self, *args, **options):
+        school = self.get_school(options['school']) if options['school'] else None
+
+        started = time.monotonic()
+        reviews, tests, removed = reindex(school=school, full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {reviews} term reports and {tests} tests, removed {removed} documents '
+            f'in {time.monotonic() - started:.2f}s'
+        ))
+
+    def get_school(self, value):
+        """Look up a school by slug or ID"""
+        lookup = {'id': int(value)} if value.isdigit() else {'slug': value}
+        try:
+            return School.objects.get(**lookup)
+        except School.DoesNotExist:
+            raise CommandError(f'School "{value}" does not exist.')
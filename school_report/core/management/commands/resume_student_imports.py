@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from schools.models import ImportRun
+from schools.student_import import claim_import, run_import
+
+
+class Command(BaseCommand):
+    help = ('Process student CSV imports that were interrupted (e.g. by a server restart): running imports, '
+            'and pending ones that never started, with no progress for --stale-after minutes')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=getattr(settings, 'STUDENT_IMPORT_STALE_MINUTES', 10),
+            help='Minutes without progress after which an import is taken to be interrupted '
+                 '(default: STUDENT_IMPORT_STALE_MINUTES)'
+        )
+
+    def handle(self, *args, **options):
+        stale_before = timezone.now() - timedelta(minutes=options['stale_after'])
+        runs = ImportRun.objects.filter(
+            status__in=['pending', 'running'],
+            updated_at__lt=stale_before
+        ).order_by('created_at')
+        if not runs:
+            self.stdout.write('No interrupted imports.')
+            return
+
+        for run in runs:
+            # Another worker may have picked the run up since it was listed
+            if not claim_import(run.pk, stale_before=stale_before):
+                self.stdout.write(f'{run.file_name} (run {run.pk}): already being processed, skipped')
+                continue
+
+            self.stdout.write(f'{run.file_name} (run {run.pk}): resuming after {run.processed_rows} rows')
+            run = run_import(run.pk, claimed=True)
+            style = self.style.SUCCESS if run.status == 'completed' else self.style.ERROR
+            self.stdout.write(style(
+                f'  {run.get_status_display()}: {run.created_count} imported, {run.duplicate_count} duplicates, '
+                f'{run.error_count} errors, {run.warning_count} possible duplicates{" - " + run.error_message if run.error_message else ""}'
+            ))
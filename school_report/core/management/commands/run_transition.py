@@ -0,0 +1,106 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schools.models import School
+from academics.transitions import parse_decisions_csv, run_school_transition, TransitionError
+
+
+class Command(BaseCommand):
+    help = 'Run the whole-school academic transition (Std 5 → Inf 1) in one batched transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--school',
+            required=True,
+            help='Slug or ID of the school to transition'
+        )
+        parser.add_argument(
+            '--decisions',
+            help='CSV file with student_id,decision columns (decision: advance or repeat). '
+                 'Students not listed use their Term 3 recommendation.'
+        )
+        parser.add_argument(
+            '--username',
+            help='Username recorded as the user who performed the transition'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be done without saving any changes'
+        )
+
+    def handle(self, *args, **options):
+        school = self.get_school(options['school'])
+
+        performed_by = None
+        if options['username']:
+            from core.models import UserProfile
+            try:
+                performed_by = UserProfile.objects.get(user__username=options['username'])
+            except UserProfile.DoesNotExist:
+                raise CommandError(f'User "{options["username"]}" does not exist.')
+
+        decisions = {}
+        if options['decisions']:
+            try:
+                with open(options['decisions'], 'rb') as f:
+                    decisions, errors = parse_decisions_csv(f)
+            except OSError as e:
+                raise CommandError(f'Cannot read decisions file: {e}')
+            except TransitionError as e:
+                raise CommandError(str(e))
+
+            if errors:
+                for error in errors:
+                    self.stdout.write(self.style.ERROR(f'  {error}'))
+                raise CommandError('Fix the decisions file and try again.')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('\n--- DRY RUN MODE ---'))
+
+        self.stdout.write(f'\nSchool: {school}')
+        self.stdout.write(f'Decisions loaded: {len(decisions)}')
+
+        started = time.monotonic()
+        try:
+            summary = run_school_transition(
+                school,
+                decisions=decisions,
+                performed_by=performed_by,
+                dry_run=options['dry_run'],
+            )
+        except TransitionError as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(f'Transition: {summary["from_year"]} → {summary["to_year"]}\n')
+
+        for code in summary['skipped_standards']:
+            self.stdout.write(f'  {code}: already processed, skipped')
+
+        for counts in summary['standards']:
+            self.stdout.write(
+                f'  {counts["code"]}: {counts["graduated"]} graduated, {counts["advanced"]} advanced, '
+                f'{counts["repeated"]} repeating, {counts["already_placed"]} already placed'
+            )
+
+        if summary['unknown_students']:
+            self.stdout.write(self.style.WARNING(
+                f'\nIgnored {len(summary["unknown_students"])} decision(s) for students not on the roster: '
+                f'{", ".join(summary["unknown_students"][:20])}'
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{"Would process" if options["dry_run"] else "Processed"}: '
+            f'{summary["graduated"]} graduated, {summary["advanced"]} advanced, '
+            f'{summary["repeated"]} repeating in {elapsed:.2f}s'
+        ))
+
+    def get_school(self, value):
+        """Look up a school by slug or ID"""
+        lookup = {'id': int(value)} if value.isdigit() else {'slug': value}
+        try:
+            return School.objects.get(**lookup)
+        except School.DoesNotExist:
+            raise CommandError(f'School "{value}" does not exist.')
@@ -1,4 +1,5 @@
 import time
+from functools import lru_cache
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.contrib import messages
@@ -6,92 +7,153 @@ from django.contrib.auth import logout
 from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 
-class PasswordChangeMiddleware:
+
+@lru_cache(maxsize=None)
+def _exempt_paths():
+    """
+    URLs reversed once per process: (password change exempt, idle timeout exempt)
+    """
+    logout_url = reverse('core:custom_logout')
+    password_change_exempt = frozenset([
+        reverse('core:password_change'),
+        reverse('core:password_change_done'),
+        logout_url,
+    ])
+    idle_exempt = frozenset([reverse('login'), logout_url])
+    return password_change_exempt, idle_exempt
+
+
+def track_idle_activity(session, current_time, granularity=None):
+    """
+    Record user activity at current_time for the idle timeout.
+
+    Returns True if the session has exceeded the idle timeout. To avoid
+    re-saving the session on every page view, the last activity time is only
+    written once it is at least `granularity` seconds old
+    (IDLE_ACTIVITY_GRANULARITY_SECONDS by default). The timeout allows for
+    that granularity, so users are never logged out early - at most that many
+    seconds late.
+    """
+    if granularity is None:
+        granularity = getattr(settings, 'IDLE_ACTIVITY_GRANULARITY_SECONDS', 0)
+
+    # Get last activity time from session
+    last_activity = session.get('last_activity')
+
+    if last_activity:
+        # Recorded activity may lag real activity by up to the granularity
+        idle_time = current_time - last_activity
+        if idle_time > settings.IDLE_TIMEOUT_SECONDS + granularity:
+            return True
+
+        if idle_time < granularity:
+            return False
+
+    # Update last activity time
+    session['last_activity'] = current_time
+    return False
+
+
+class AuthContextMiddleware:
     """
-    Middleware to force users to change their password if required
+    Per-request checks for authenticated users, in one place:
+
+    1. Force users to change their password if required
+    2. Server-side idle timeout (complements the client-side JavaScript timeout)
+    3. Keep the session snapshot set up at login current (see
+       core.utils.revalidate_user_session)
+
+    The user, profile and active SchoolStaff record are loaded in one query by
+    core.auth_backends.StaffContextBackend. With DEBUG on, the time spent in
+    each step is reported in an X-Middleware-Timing response header (in the
+    Server-Timing format, in milliseconds).
     """
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        if request.user.is_authenticated:
-            # Check if user needs to change password
-            try:
-                if request.user.profile.must_change_password:
-                    # Define allowed URLs when password change is required
-                    allowed_urls = [
-                        reverse('core:password_change'),
-                        reverse('core:password_change_done'),
-                        reverse('core:custom_logout'),
-                    ]
-
-                    # Allow access to password change related pages and logout
-                    if request.path not in allowed_urls:
-                        messages.warning(request, "You must change your password before continuing.")
-                        return redirect('core:password_change')
-            except AttributeError:
-                # If profile doesn't exist, just continue
-                pass
-            except Exception:
-                # Handle any other exceptions gracefully
-                pass
-
-        response = self.get_response(request)
-        return response
+        timings = [] if settings.DEBUG else None
 
+        response = self.process(request, timings)
+        if response is None:
+            response = self.get_response(request)
 
-class IdleTimeoutMiddleware(MiddlewareMixin):
-    """
-    Middleware to handle idle timeout for authenticated users.
+        if timings:
+            response['X-Middleware-Timing'] = ', '.join(
+                f'{name};dur={duration * 1000:.2f}' for name, duration in timings
+            )
+        return response
 
-    This provides server-side session timeout that works even when
-    tabs are closed, complementing the client-side JavaScript timeout.
-    """
+    def process(self, request, timings):
+        started = time.perf_counter()
+        is_authenticated = request.user.is_authenticated
+        self._timed(timings, 'auth', started)
 
-    def process_request(self, request):
-        """
-        Check if user session has exceeded idle timeout
-        """
-        # Skip timeout check for unauthenticated users
-        if not request.user.is_authenticated:
+        if not is_authenticated:
             return None
 
+        password_change_exempt, idle_exempt = _exempt_paths()
+
+        # Check if user needs to change password
+        started = time.perf_counter()
+        profile = getattr(request.user, 'profile', None)
+        if profile and profile.must_change_password and request.path not in password_change_exempt:
+            messages.warning(request, "You must change your password before continuing.")
+            return redirect('core:password_change')
+        self._timed(timings, 'password', started)
+
+        started = time.perf_counter()
+        if self._is_idle_tracked(request, idle_exempt) and track_idle_activity(request.session, time.time()):
+            # Log out the user
+            logout(request)
+
+            # Add a message to inform user about timeout
+            messages.warning(
+                request,
+                f'Your session expired after {settings.IDLE_TIMEOUT_MINUTES} minutes of inactivity. '
+                'Please log in again.'
+            )
+
+            # Redirect to login page
+            return redirect('login')
+        self._timed(timings, 'idle', started)
+
+        started = time.perf_counter()
+        from core.utils import revalidate_user_session
+        revalidate_user_session(request, request.user)
+        self._timed(timings, 'session', started)
+
+        return None
+
+    @staticmethod
+    def _is_idle_tracked(request, idle_exempt):
         # Skip timeout check for login/logout pages to avoid redirect loops
-        if request.path in [reverse('login'), reverse('core:custom_logout')]:
-            return None
+        if request.path in idle_exempt:
+            return False
 
         # Skip timeout check for AJAX requests and static files
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return None
+            return False
         if request.path.startswith('/static/') or request.path.startswith('/media/'):
-            return None
-
-        # Get current time
-        current_time = time.time()
-
-        # Get last activity time from session
-        last_activity = request.session.get('last_activity')
-
-        if last_activity:
-            # Calculate idle time
-            idle_time = current_time - last_activity
+            return False
+        return True
 
-            # Check if idle timeout exceeded
-            if idle_time > settings.IDLE_TIMEOUT_SECONDS:
-                # Log out the user
-                logout(request)
+    @staticmethod
+    def _timed(timings, name, started):
+        if timings is not None:
+            timings.append((name, time.perf_counter() - started))
 
-                # Add a message to inform user about timeout
-                messages.warning(
-                    request,
-                    f'Your session expired after {settings.IDLE_TIMEOUT_MINUTES} minutes of inactivity. '
-                    'Please log in again.'
-                )
 
-                # Redirect to login page
-                return redirect('login')
-
-        # Update last activity time
-        request.session['last_activity'] = current_time
+class SchoolContextMiddleware(MiddlewareMixin):
+    """
+    Attach a lazily resolved SchoolContext (see core/context.py) as
+    request.school_ctx for every view that takes a school_slug URL argument.
+    """
 
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        school_slug = view_kwargs.get('school_slug')
+        if school_slug:
+            from core.context import SchoolContext
+            request.school_ctx = SchoolContext(request, school_slug)
         return None
+
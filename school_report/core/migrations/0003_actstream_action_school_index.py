@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# core.activity_feed.school_activity_index() as of this migration, an index on
+# (ActionSchoolId(), -timestamp), written out so later changes to that module
+# do not change what this migration does
+CREATE_INDEX = {
+    'postgresql': (
+        'CREATE INDEX "actstream_action_school_ts" ON "actstream_action" '
+        '''((("data" ->> 'school_id')::integer), "timestamp" DESC)'''
+    ),
+    'sqlite': (
+        'CREATE INDEX "actstream_action_school_ts" ON "actstream_action" '
+        '''((json_extract("data", '$.school_id')), "timestamp" DESC)'''
+    ),
+}
+DROP_INDEX = 'DROP INDEX IF EXISTS "actstream_action_school_ts"'
+
+
+def _has_data_column(apps):
+    Action = apps.get_model('actstream', 'Action')
+    # The data column only exists with ACTSTREAM_SETTINGS['USE_JSONFIELD']
+    return 'data' in {field.name for field in Action._meta.get_fields()}
+
+
+def add_school_index(apps, schema_editor):
+    # Action belongs to actstream, so the index is added directly rather than
+    # through the model's Meta.indexes
+    sql = CREATE_INDEX.get(schema_editor.connection.vendor)
+    if sql and _has_data_column(apps):
+        schema_editor.execute(sql)
+
+
+def remove_school_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_INDEX and _has_data_column(apps):
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_add_term_finalization'),
+        ('actstream', '0003_add_follow_flag'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_school_index, remove_school_index),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-19 05:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_actstream_action_school_index'),
+        ('schools', '0004_student_created_by'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditChangeset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(max_length=255)),
+                ('object_count', models.PositiveIntegerField(default=0)),
+                ('changes', models.JSONField(default=dict, help_text="Columnar diff: {model: {action: {'pk': [...], 'old': {field: [...]}, 'new': {field: [...]}}}}")),
+                ('timestamp', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_changesets', to=settings.AUTH_USER_MODEL)),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_changesets', to='schools.school')),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+    ]
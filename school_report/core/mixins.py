@@ -1,10 +1,10 @@
 """
 Mixins for views in the School Report System
 """
-from django.shortcuts import redirect, get_object_or_404
+from django.shortcuts import redirect
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from schools.models import School
+from core.context import get_school_context
 from core.utils import user_can_access_view, get_user_session_info
 
 class SessionAccessMixin(LoginRequiredMixin):
@@ -39,10 +39,11 @@ class SessionAccessMixin(LoginRequiredMixin):
         # Store session info for easy access in views
         self.session_info = get_user_session_info(request)
 
-        # If school is required, get the school object
+        # If school is required, get the school object from the request context
         if self.require_school and school_slug:
+            self.school_ctx = get_school_context(request, school_slug)
             self.school_slug = school_slug
-            self.school = get_object_or_404(School, slug=school_slug)
+            self.school = self.school_ctx.school
 
         return super().dispatch(request, *args, **kwargs)
 
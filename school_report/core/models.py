@@ -124,3 +124,30 @@ class UserProfile(models.Model):
             return self
         return None
 
+
+
+class AuditChangeset(models.Model):
+    """
+    A single audit record for a bulk operation, written instead of one
+    auditlog LogEntry per object (see core/audit.py)
+    """
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='audit_changesets')
+    school = models.ForeignKey('schools.School', on_delete=models.SET_NULL, null=True, blank=True,
+                               related_name='audit_changesets')
+    reason = models.CharField(max_length=255)
+    object_count = models.PositiveIntegerField(default=0)
+    changes = models.JSONField(default=dict,
+                               help_text="Columnar diff: {model: {action: {'pk': [...], 'old': {field: [...]}, 'new': {field: [...]}}}}")
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-timestamp']
+
+    def __str__(self):
+        return f"{self.reason} ({self.object_count} objects)"
+
+    def expand(self):
+        """Per-object history entries for this changeset"""
+        from core.audit import expand_changeset
+        return list(expand_changeset(self))
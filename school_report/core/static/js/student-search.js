@@ -0,0 +1,101 @@
+/**
+ * Student autocomplete in the navigation bar
+ *
+ * Queries schools:student_search as the user types and lists the matching
+ * students; choosing one (or pressing Enter) opens the student's page.
+ */
+document.addEventListener('DOMContentLoaded', function() {
+    const container = document.getElementById('studentSearch');
+    const input = document.getElementById('studentSearchInput');
+    const results = document.getElementById('studentSearchResults');
+
+    if (!container || !input || !results) {
+        return;
+    }
+
+    let timer = null;
+    let controller = null;
+
+    function hideResults() {
+        results.classList.remove('show');
+        results.innerHTML = '';
+    }
+
+    function showResults(students) {
+        results.innerHTML = '';
+
+        if (students.length === 0) {
+            const empty = document.createElement('li');
+            empty.className = 'dropdown-item-text text-muted';
+            empty.textContent = 'No students found';
+            results.appendChild(empty);
+        }
+
+        students.forEach(function(student) {
+            const item = document.createElement('li');
+            const link = document.createElement('a');
+            link.className = 'dropdown-item';
+            link.href = student.url;
+
+            const name = document.createElement('div');
+            name.textContent = student.name;
+            const details = document.createElement('small');
+            details.className = 'text-muted';
+            details.textContent = [student.class, student.parent_name].filter(Boolean).join(' · ');
+
+            link.appendChild(name);
+            link.appendChild(details);
+            item.appendChild(link);
+            results.appendChild(item);
+        });
+
+        results.classList.add('show');
+    }
+
+    function search() {
+        const query = input.value.trim();
+        if (query.length < 2) {
+            hideResults();
+            return;
+        }
+
+        // Only the latest request matters
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+
+        const url = container.dataset.url + '?q=' + encodeURIComponent(query);
+        fetch(url, { signal: controller.signal, headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+            .then(function(response) { return response.json(); })
+            .then(function(data) { showResults(data.results); })
+            .catch(function(error) {
+                if (error.name !== 'AbortError') {
+                    console.warn('Student search failed', error);
+                }
+            });
+    }
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(search, 200);
+    });
+
+    input.addEventListener('keydown', function(event) {
+        if (event.key === 'Enter') {
+            const first = results.querySelector('a.dropdown-item');
+            if (first) {
+                event.preventDefault();
+                window.location.href = first.href;
+            }
+        } else if (event.key === 'Escape') {
+            hideResults();
+        }
+    });
+
+    document.addEventListener('click', function(event) {
+        if (!container.contains(event.target)) {
+            hideResults();
+        }
+    });
+});
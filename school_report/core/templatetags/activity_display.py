@@ -3,18 +3,31 @@ Template tags for displaying activity streams in templates.
 """
 
 from django import template
-from actstream.models import Action
+from django.template.loader import render_to_string
 from django.utils.timesince import timesince
 from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from django.urls import reverse
+
+from core.activity_feed import page_school_actions
+from core.cache import cached_activity_for_school
 
 register = template.Library()
 
+# The widget shows relative times ("5 minutes ago"), so even without new
+# activity the cached fragment is only kept for a short while
+ACTIVITY_WIDGET_TIMEOUT = 60
 
-@register.inclusion_tag('core/activity_stream_widget.html', takes_context=True)
+
+@register.simple_tag(takes_context=True)
 def show_recent_activities(context, limit=10):
     """
     Display recent activities for the current school.
 
+    The rendered widget is cached per school until new activity is recorded
+    for it (see core/cache.py) or ACTIVITY_WIDGET_TIMEOUT passes.
+
     Usage in template:
         {% load activity_display %}
         {% show_recent_activities 10 %}
@@ -23,21 +36,29 @@ def show_recent_activities(context, limit=10):
 
     # Get school from session
     school_id = request.session.get('user_school_id') if request else None
+    school_slug = request.session.get('user_school_slug') if request else None
 
-    # Filter activities by school
-    if school_id:
-        # Filter by school_id stored in the action's data field
-        activities = Action.objects.filter(
-            data__school_id=school_id
-        ).order_by('-timestamp')[:limit]
-    else:
-        # If no school context, show no activities
-        activities = Action.objects.none()
-
-    return {
-        'activities': activities,
-        'request': request,
-    }
+    def render():
+        activities, next_cursor = [], None
+        if school_id:
+            # Filter by school_id stored in the action's data field (indexed, see core/activity_feed.py)
+            activities, next_cursor = page_school_actions(school_id, limit=limit)
+
+        # Older entries are loaded into the widget from the feed endpoint
+        next_url = None
+        if next_cursor:
+            feed_url = reverse('core:activity_feed', kwargs={'school_slug': school_slug})
+            next_url = f'{feed_url}?format=html&cursor={next_cursor}'
+
+        return render_to_string('core/activity_stream_widget.html', {
+            'activities': activities,
+            'next_url': next_url,
+        })
+
+    # If no school context, show no activities
+    if not school_id:
+        return render()
+    return mark_safe(cached_activity_for_school(school_id, f'widget:{limit}', render, ACTIVITY_WIDGET_TIMEOUT))
 
 
 @register.filter
@@ -2,7 +2,8 @@ from django.urls import path
 from django.contrib.auth import views as auth_views
 from .views import (
     HomeView, SchoolRegistrationView, CustomLogoutView, SchoolUpdateView, CustomLoginView, SessionDebugView,
-    GroupManagementView, GroupChangeConfirmationView, GroupChangeExecuteView, CustomPasswordChangeView
+    GroupManagementView, GroupChangeConfirmationView, GroupChangeExecuteView, CustomPasswordChangeView,
+    ActivityFeedView
 )
 
 app_name = 'core'
@@ -24,6 +25,7 @@ urlpatterns = [
     path('<slug:school_slug>/group-management/', GroupManagementView.as_view(), name='group_management'),
     path('<slug:school_slug>/group-management/confirm/<int:new_groups>/', GroupChangeConfirmationView.as_view(), name='group_change_confirmation'),
     path('<slug:school_slug>/group-management/execute/<int:new_groups>/', GroupChangeExecuteView.as_view(), name='group_change_execute'),
+    path('<slug:school_slug>/activity/', ActivityFeedView.as_view(), name='activity_feed'),
     # path('my-school/', SchoolRedirectView.as_view(), name='my_school'),
 
     # Debug route (remove in production)
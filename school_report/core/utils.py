@@ -49,6 +49,33 @@ def get_current_year_and_term(school=None):
     return current_year, None, vacation_status
 
 
+def get_cached_year_and_term(school):
+    """
+    Cached version of get_current_year_and_term() for a school (instance or id).
+
+    The result is cached per school for the current date, and invalidated
+    along with the rest of the school's cached data when years or terms change.
+    """
+    from core.cache import cached_for_school
+
+    if not school:
+        return None, None, None
+
+    def compute():
+        # Accept a school id too, loading the school only on a cache miss
+        if isinstance(school, int):
+            from schools.models import School
+            return get_current_year_and_term(school=School.objects.filter(pk=school).first())
+        return get_current_year_and_term(school=school)
+
+    today = timezone.now().date()
+    return cached_for_school(
+        getattr(school, 'pk', school),
+        f'calendar:{today.isoformat()}',
+        compute
+    )
+
+
 def _determine_vacation_period(school, current_year, today):
     """
     Determine which vacation period we're currently in.
@@ -261,7 +288,7 @@ def get_current_teacher_assignment(teacher, school_year):
     latest_assignment = StandardTeacher.objects.filter(
         teacher=teacher,
         year=school_year
-    ).order_by('-created_at').first()
+    ).select_related('standard').order_by('-created_at').first()
 
     # Return assignment only if it has a standard (not unassigned)
     if latest_assignment and latest_assignment.standard:
@@ -309,6 +336,123 @@ def get_current_student_enrollment(student, school_year):
     return None
 
 
+def get_current_enrollments(school, school_year, standard=None):
+    """
+    Get the current (latest) class assignment of every student in a school
+    year whose class is at `school`, or is `standard`, as a StandardEnrollment
+    queryset (the set-based version of get_current_student_enrollment()).
+    """
+    from django.db.models import OuterRef, Subquery
+    from academics.models import StandardEnrollment
+
+    latest_enrollment_id = StandardEnrollment.objects.filter(
+        student=OuterRef('student'),
+        year=school_year
+    ).order_by('-created_at', '-id').values('id')[:1]
+
+    enrollments = StandardEnrollment.objects.filter(
+        year=school_year,
+        standard__school=school,
+        id=Subquery(latest_enrollment_id)
+    )
+    if standard:
+        enrollments = enrollments.filter(standard=standard)
+    return enrollments
+
+
+def get_standard_roster_summary(school, school_year):
+    """
+    Get every standard of a school with its current teacher and current
+    student count for a school year, in a single query.
+
+    Applies the same "latest record wins" rules as get_current_standard_teacher()
+    and get_current_student_enrollment(), using correlated subqueries.
+
+    Returns a list of dicts (ordered by standard name and group) with:
+    standard_id, name, name_display, group_number, display_name,
+    teacher_id, teacher_name, student_count
+    """
+    from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce
+    from academics.models import StandardEnrollment, StandardTeacher
+    from schools.models import Standard
+
+    standard_labels = dict(Standard.STANDARD_CHOICES)
+
+    # Latest StandardTeacher record per standard (teacher is null when unassigned)
+    latest_teacher = StandardTeacher.objects.filter(
+        standard=OuterRef('pk'),
+        year=school_year
+    ).order_by('-created_at', '-id')
+
+    # A student counts towards a standard only if their latest enrollment is there
+    latest_enrollment_id = StandardEnrollment.objects.filter(
+        student=OuterRef('student'),
+        year=school_year
+    ).order_by('-created_at', '-id').values('id')[:1]
+
+    current_students = StandardEnrollment.objects.filter(
+        standard=OuterRef('pk'),
+        year=school_year,
+        id=Subquery(latest_enrollment_id)
+    ).order_by().values('standard').annotate(total=Count('id')).values('total')
+
+    standards = Standard.objects.filter(school=school).annotate(
+        teacher_id=Subquery(latest_teacher.values('teacher')[:1]),
+        teacher_title=Subquery(latest_teacher.values('teacher__title')[:1]),
+        teacher_first_name=Subquery(latest_teacher.values('teacher__user__first_name')[:1]),
+        teacher_last_name=Subquery(latest_teacher.values('teacher__user__last_name')[:1]),
+        student_count=Coalesce(Subquery(current_students, output_field=IntegerField()), Value(0)),
+    ).order_by('name', 'group_number').values(
+        'id', 'name', 'group_number', 'teacher_id', 'teacher_title',
+        'teacher_first_name', 'teacher_last_name', 'student_count'
+    )
+
+    summary = []
+    for row in standards:
+        name_display = standard_labels.get(row['name'], row['name'])
+        teacher_name = None
+        if row['teacher_id']:
+            teacher_name = ' '.join(
+                part for part in (row['teacher_title'], row['teacher_first_name'], row['teacher_last_name']) if part
+            )
+            # Mirrors Standard.get_display_name()
+            display_name = f"{name_display} - {row['teacher_title']} {row['teacher_last_name']}"
+        else:
+            display_name = f"{name_display} - {row['group_number']}"
+
+        summary.append({
+            'standard_id': row['id'],
+            'name': row['name'],
+            'name_display': name_display,
+            'group_number': row['group_number'],
+            'display_name': display_name,
+            'teacher_id': row['teacher_id'],
+            'teacher_name': teacher_name,
+            'student_count': row['student_count'],
+        })
+
+    return summary
+
+
+def get_cached_roster_summary(school, school_year):
+    """
+    Cached version of get_standard_roster_summary(), invalidated when
+    enrollments, teacher assignments or standards of the school change.
+    """
+    from core.cache import cached_for_year
+
+    if not school_year:
+        return []
+
+    return cached_for_year(
+        school.id,
+        school_year.id,
+        'roster_summary',
+        lambda: get_standard_roster_summary(school, school_year)
+    )
+
+
 def get_next_term_start_date(current_term):
     """
     Get the start date of the next term after the given term.
@@ -385,48 +529,92 @@ def unassign_teacher(teacher, standard, school_year, assigned_by=None):
     )
 
 
-def unassign_all_teachers_for_school(school, from_year):
+def unassign_all_teachers_for_school(school, from_year, assigned_by=None, dry_run=False):
     """
-    Automatically unassign all teachers from their standards for a school year.
-    This is triggered when summer vacation begins.
+    Unassign every teacher of a school from their standard for a school year,
+    e.g. when summer vacation begins.
+
+    Same result as calling unassign_teacher() for each pair that is still
+    assigned, but set-based: the pairs are found in one query, and all their
+    unassignment records are written with one bulk_create() in a single
+    transaction, audited as one changeset.
+
+    A pair is still assigned when the latest record of the teacher and the
+    latest record of the standard for the year are both that assignment.
 
     Args:
         school: School instance
         from_year: SchoolYear instance to unassign teachers from
+        assigned_by: UserProfile recorded on the unassignment records (optional)
+        dry_run: only compute the summary; nothing is written
+
+    Returns a summary dict with the number of teachers unassigned and their
+    (teacher_id, standard_id) pairs.
     """
+    from django.db import transaction
+    from django.db.models import OuterRef, Subquery
     from academics.models import StandardTeacher
-    from schools.models import Standard
-
-    # Get all current teacher assignments for this school year
-    current_assignments = StandardTeacher.objects.filter(
+    from core.audit import audit_changeset
+    from core.cache import bump_assignment_version, bump_year_version
+
+    latest_teacher_record = StandardTeacher.objects.filter(
+        teacher=OuterRef('teacher'),
+        year=from_year
+    ).order_by('-created_at', '-id').values('id')[:1]
+    latest_standard_record = StandardTeacher.objects.filter(
+        standard=OuterRef('standard'),
+        year=from_year
+    ).order_by('-created_at', '-id').values('id')[:1]
+
+    pairs = list(StandardTeacher.objects.filter(
         year=from_year,
         standard__school=school,
-        standard__isnull=False,  # Only get actual assignments, not unassignment records
-        teacher__isnull=False
-    ).select_related('teacher', 'standard')
-
-    # Get the latest assignment for each teacher-standard pair
-    processed_pairs = set()
-    for assignment in current_assignments.order_by('-created_at'):
-        pair_key = (assignment.teacher_id, assignment.standard_id)
-        if pair_key not in processed_pairs:
-            # Check if this is still the latest assignment (not already unassigned)
-            latest_teacher_record = StandardTeacher.objects.filter(
-                teacher=assignment.teacher,
-                year=from_year
-            ).order_by('-created_at').first()
-
-            latest_standard_record = StandardTeacher.objects.filter(
-                standard=assignment.standard,
-                year=from_year
-            ).order_by('-created_at').first()
-
-            # Only unassign if both sides still show assignment
-            if (latest_teacher_record and latest_teacher_record.standard == assignment.standard and
-                latest_standard_record and latest_standard_record.teacher == assignment.teacher):
-
-                unassign_teacher(assignment.teacher, assignment.standard, from_year)
-                processed_pairs.add(pair_key)
+        standard__isnull=False,  # Only actual assignments, not unassignment records
+        teacher__isnull=False,
+        id=Subquery(latest_teacher_record),
+    ).filter(
+        id=Subquery(latest_standard_record)
+    ).order_by('standard_id').values_list('teacher_id', 'standard_id'))
+
+    summary = {
+        'school': school.slug,
+        'year': str(from_year),
+        'dry_run': dry_run,
+        'unassigned': len(pairs),
+        'pairs': pairs,
+    }
+    if dry_run or not pairs:
+        return summary
+
+    records = []
+    for teacher_id, standard_id in pairs:
+        # Both sides of the pair get an unassignment record, as in unassign_teacher()
+        records.append(StandardTeacher(teacher_id=teacher_id, year=from_year, standard=None, assigned_by=assigned_by))
+        records.append(StandardTeacher(teacher=None, year=from_year, standard_id=standard_id, assigned_by=assigned_by))
+
+    with transaction.atomic(), audit_changeset(
+        assigned_by, f"Teachers unassigned for {from_year}", school=school
+    ) as changeset:
+        StandardTeacher.objects.bulk_create(records, batch_size=500)
+        changeset.log_created(records)
+
+        # bulk_create skips model signals, so invalidate cached rosters and
+        # session snapshots and re-index the affected report remarks here
+        transaction.on_commit(lambda: bump_year_version(school.id, from_year.id))
+        transaction.on_commit(lambda: bump_assignment_version(school.id, from_year.id))
+
+        from reports.models import SearchDocument
+        from reports.search import on_commit_index
+
+        teacher_ids = [teacher_id for teacher_id, _ in pairs]
+        standard_ids = [standard_id for _, standard_id in pairs]
+        on_commit_index('review', SearchDocument.objects.filter(
+            Q(standard_id__in=standard_ids) | Q(teacher_id__in=teacher_ids),
+            kind='review',
+            term__year=from_year
+        ).values_list('object_id', flat=True))
+
+    return summary
 
 
 def unenroll_student(student, school_year, enrolled_by=None):
@@ -665,6 +853,9 @@ def setup_user_session(request, user):
     clear_user_session(request)
 
     if not hasattr(user, 'profile'):
+        # Tag the empty snapshot too, so it is not rebuilt on every request
+        # (creating the profile bumps the user's version)
+        request.session['session_version'] = get_session_snapshot_version(request.session, user.id)
         return False
 
     user_profile = user.profile
@@ -721,6 +912,43 @@ def setup_user_session(request, user):
         request.session['vacation_status'] = None
         request.session['is_on_vacation'] = None
 
+    # Tag the snapshot so it is refreshed when any of the data above changes
+    request.session['session_version'] = get_session_snapshot_version(request.session, user.id)
+
+    return True
+
+
+def get_session_snapshot_version(session, user_id):
+    """
+    Version tag for the session snapshot built by setup_user_session().
+
+    Combines the user and today's date (term and vacation boundaries) with
+    the cache versions of the user, their school and the current year's
+    teacher assignments, which are bumped whenever role, membership, calendar
+    or class assignments change. Scores, tests and reports do not change it.
+    """
+    from core.cache import get_snapshot_version
+
+    versions = get_snapshot_version(
+        user_id,
+        school_id=session.get('user_school_id'),
+        year_id=session.get('current_year_id')
+    )
+    return f'{user_id}:{timezone.now().date().isoformat()}:{versions}'
+
+
+def revalidate_user_session(request, user):
+    """
+    Rebuild the session snapshot if it has gone stale since it was set up.
+
+    Costs one cache round trip when the snapshot is current.
+    Returns True if the snapshot was rebuilt.
+    """
+    session = request.session
+    if session.get('session_version') == get_session_snapshot_version(session, user.id):
+        return False
+
+    setup_user_session(request, user)
     return True
 
 
@@ -731,7 +959,8 @@ def clear_user_session(request):
     session_keys = [
         'user_id', 'user_type', 'user_school_id', 'user_school_slug',
         'user_role', 'user_position', 'current_year_id', 'current_term',
-        'vacation_status', 'is_on_vacation', 'teacher_class_id', 'teacher_class_name'
+        'vacation_status', 'is_on_vacation', 'teacher_class_id', 'teacher_class_name',
+        'session_version'
     ]
     for key in session_keys:
         request.session.pop(key, None)
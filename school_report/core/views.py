@@ -7,12 +7,14 @@ from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.views import PasswordChangeView, LoginView
 from django.contrib.auth.forms import PasswordChangeForm, AuthenticationForm
-from django.http import HttpResponseRedirect, Http404
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, Http404, JsonResponse
+from django.template.loader import render_to_string
 from .models import UserProfile
 from schools.models import School
 from academics.models import SchoolYear, Term, SchoolStaff, StandardTeacher
 from core.utils import get_user_session_info, user_can_access_view, clear_teacher_session, get_current_year_and_term
 from core.mixins import SchoolAdminRequiredMixin
+from core.activity_feed import InvalidCursor, page_school_actions
 
 class HomeView(TemplateView):
     """Home page view"""
@@ -361,6 +363,84 @@ class SessionDebugView(View):
         return JsonResponse(session_info)
 
 
+class ActivityFeedView(SchoolAdminRequiredMixin, View):
+    """
+    The school's activity feed, one page at a time (newest first). It covers
+    the whole school, so like the dashboard widget it loads into, it is only
+    available to the principal and administration staff.
+
+    Query parameters:
+        cursor: next_cursor from the previous page
+        verb: only include this verb (may be repeated)
+        actor: only include actions by this staff member (UserProfile id)
+        limit: page size (default 20, at most 100)
+        format: 'json' (default) or 'html' for a fragment of list items,
+            ending with a "Load more" button when there are more pages
+    """
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        params = request.GET
+        try:
+            limit = min(max(int(params.get('limit', self.default_limit)), 1), self.max_limit)
+            actor_id = int(params['actor']) if params.get('actor') else None
+        except ValueError:
+            return HttpResponseBadRequest("limit and actor must be integers.")
+
+        actor = None
+        if actor_id is not None:
+            # Only staff of this school can be used as a filter
+            actor = UserProfile.objects.filter(
+                pk=actor_id, school_employment__school=self.school
+            ).only('id', 'user_id').first()
+            if actor is None:
+                return HttpResponseBadRequest("Unknown staff member.")
+
+        as_html = params.get('format') == 'html'
+        try:
+            actions, next_cursor = page_school_actions(
+                self.school.id,
+                cursor=params.get('cursor'),
+                verbs=params.getlist('verb'),
+                actor=actor,
+                limit=limit,
+                # JSON only includes the actor's name; the HTML may show the target
+                relations=() if as_html else ('actor',),
+            )
+        except InvalidCursor:
+            return HttpResponseBadRequest("Invalid cursor.")
+
+        next_url = None
+        if next_cursor:
+            next_params = params.copy()
+            next_params['cursor'] = next_cursor
+            next_url = f'{request.path}?{next_params.urlencode()}'
+
+        if as_html:
+            return HttpResponse(render_to_string('core/activity_feed_items.html', {
+                'activities': actions,
+                'next_url': next_url,
+            }, request=request))
+
+        return JsonResponse({
+            'results': [
+                {
+                    'id': action.id,
+                    'timestamp': action.timestamp.isoformat(),
+                    'verb': action.verb,
+                    'description': action.description,
+                    'actor': action.actor.get_full_name() if action.actor else None,
+                    'actor_id': action.actor_object_id,
+                    'target_id': action.target_object_id,
+                }
+                for action in actions
+            ],
+            'next_cursor': next_cursor,
+            'next_url': next_url,
+        })
+
+
 def idle_timeout_context(request):
     """
     Context processor to add idle timeout settings to templates
@@ -372,6 +452,64 @@ def idle_timeout_context(request):
     }
 
 
+def get_group_roster(school):
+    """
+    Current teacher and student count for every class of the school, loaded in
+    one query and cached per school until enrollments or assignments change.
+    """
+    from core.utils import get_cached_roster_summary, get_cached_year_and_term
+
+    current_year, _, _ = get_cached_year_and_term(school)
+    return get_cached_roster_summary(school, current_year)
+
+
+def derive_group_impact(roster, current_groups, new_groups):
+    """
+    Work out, in memory, what changing groups per standard from current_groups
+    to new_groups would do, given the roster from get_group_roster().
+    """
+    from schools.models import Standard
+
+    impact = {
+        'change_type': 'increase' if new_groups > current_groups else 'decrease',
+        'classes_to_remove': [],
+        'classes_to_create': [],
+        'teachers_to_unassign': [],
+        'total_students_affected': 0
+    }
+
+    if new_groups < current_groups:
+        # Decreasing groups - classes with a higher group number will be removed
+        seen_teachers = set()
+        for class_info in roster:
+            if not new_groups < class_info['group_number'] <= current_groups:
+                continue
+
+            impact['classes_to_remove'].append(class_info)
+            impact['total_students_affected'] += class_info['student_count']
+
+            if class_info['teacher_id'] and class_info['teacher_id'] not in seen_teachers:
+                seen_teachers.add(class_info['teacher_id'])
+                impact['teachers_to_unassign'].append({
+                    'teacher_id': class_info['teacher_id'],
+                    'teacher_name': class_info['teacher_name'],
+                    'class_name': class_info['display_name']
+                })
+
+    elif new_groups > current_groups:
+        # Increasing groups - show new classes that will be created
+        for standard_code, standard_name in Standard.STANDARD_CHOICES:
+            for group_num in range(current_groups + 1, new_groups + 1):
+                impact['classes_to_create'].append({
+                    'standard_name': standard_name,
+                    'group_number': group_num,
+                    'display_name': f"{standard_name} - {group_num}",
+                    'is_new': True
+                })
+
+    return impact
+
+
 class GroupManagementView(SchoolAdminRequiredMixin, TemplateView):
     """
     View for managing groups per standard with impact analysis
@@ -393,12 +531,7 @@ class GroupManagementView(SchoolAdminRequiredMixin, TemplateView):
         """
         Analyze the impact of changing groups per standard
         """
-        from schools.models import Standard
-        from academics.models import StandardEnrollment
-        from academics.models import StandardTeacher
-        from core.utils import get_current_year_and_term
-
-        current_year, _, _ = get_current_year_and_term(school=self.school)
+        roster = get_group_roster(self.school)
         current_groups = self.school.groups_per_standard
 
         analysis = {}
@@ -408,70 +541,15 @@ class GroupManagementView(SchoolAdminRequiredMixin, TemplateView):
             if new_groups == current_groups:
                 continue
 
-            impact = {
+            impact = derive_group_impact(roster, current_groups, new_groups)
+            analysis[new_groups] = {
                 'new_groups': new_groups,
-                'change_type': 'increase' if new_groups > current_groups else 'decrease',
-                'affected_classes': [],
-                'affected_teachers': [],
-                'affected_students': 0
+                'change_type': impact['change_type'],
+                'affected_classes': impact['classes_to_remove'] or impact['classes_to_create'],
+                'affected_teachers': impact['teachers_to_unassign'],
+                'affected_students': impact['total_students_affected'],
             }
 
-            if new_groups < current_groups:
-                # Decreasing groups - find classes that will be removed
-                for standard_code, standard_name in Standard.STANDARD_CHOICES:
-                    for group_num in range(new_groups + 1, current_groups + 1):
-                        try:
-                            standard = Standard.objects.get(
-                                school=self.school,
-                                name=standard_code,
-                                group_number=group_num
-                            )
-
-                            # Count students in this class
-                            if current_year:
-                                student_count = StandardEnrollment.objects.filter(
-                                    standard=standard,
-                                    year=current_year
-                                ).count()
-                            else:
-                                student_count = 0
-
-                            # Find assigned teacher
-                            teacher_assignment = None
-                            if current_year:
-                                teacher_assignment = StandardTeacher.objects.filter(
-                                    standard=standard,
-                                    year=current_year,
-                                    teacher__isnull=False
-                                ).first()
-
-                            impact['affected_classes'].append({
-                                'standard': standard,
-                                'student_count': student_count,
-                                'teacher': teacher_assignment.teacher if teacher_assignment else None
-                            })
-
-                            if teacher_assignment and teacher_assignment.teacher:
-                                if teacher_assignment.teacher not in impact['affected_teachers']:
-                                    impact['affected_teachers'].append(teacher_assignment.teacher)
-
-                            impact['affected_students'] += student_count
-
-                        except Standard.DoesNotExist:
-                            continue
-
-            elif new_groups > current_groups:
-                # Increasing groups - show new classes that will be created
-                for standard_code, standard_name in Standard.STANDARD_CHOICES:
-                    for group_num in range(current_groups + 1, new_groups + 1):
-                        impact['affected_classes'].append({
-                            'standard_name': standard_name,
-                            'group_number': group_num,
-                            'is_new': True
-                        })
-
-            analysis[new_groups] = impact
-
         return analysis
 
 
@@ -482,20 +560,17 @@ class GroupChangeConfirmationView(SchoolAdminRequiredMixin, TemplateView):
     template_name = 'core/group_change_confirmation.html'
 
     def dispatch(self, request, *args, **kwargs):
-        # Call parent dispatch first for permission checking
-        response = super().dispatch(request, *args, **kwargs)
-        if response:  # If parent returned a redirect, return it
-            return response
-
-        # Get the new group count from URL
+        # Get the new group count from URL. This has to happen before the
+        # parent dispatch, which runs the handler.
         self.new_groups = int(kwargs.get('new_groups'))
 
         # Validate new_groups
         if self.new_groups < 1 or self.new_groups > 5:
             messages.error(request, "Invalid number of groups. Must be between 1 and 5.")
-            return redirect('core:group_management', school_slug=self.school_slug)
+            return redirect('core:group_management', school_slug=kwargs.get('school_slug'))
 
-        return None  # Continue with normal processing
+        # Parent dispatch handles permission checking
+        return super().dispatch(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -514,80 +589,8 @@ class GroupChangeConfirmationView(SchoolAdminRequiredMixin, TemplateView):
         """
         Get detailed impact analysis for the specific group change
         """
-        from schools.models import Standard, StandardEnrollment
-        from academics.models import StandardTeacher
-        from core.utils import get_current_year_and_term
-
-        current_year, _, _ = get_current_year_and_term(school=self.school)
-        current_groups = self.school.groups_per_standard
-
-        impact = {
-            'change_type': 'increase' if self.new_groups > current_groups else 'decrease',
-            'classes_to_remove': [],
-            'classes_to_create': [],
-            'teachers_to_unassign': [],
-            'total_students_affected': 0
-        }
-
-        if self.new_groups < current_groups:
-            # Decreasing groups - find classes that will be removed
-            for standard_code, standard_name in Standard.STANDARD_CHOICES:
-                for group_num in range(self.new_groups + 1, current_groups + 1):
-                    try:
-                        standard = Standard.objects.get(
-                            school=self.school,
-                            name=standard_code,
-                            group_number=group_num
-                        )
-
-                        # Count students in this class
-                        student_count = 0
-                        if current_year:
-                            student_count = StandardEnrollment.objects.filter(
-                                standard=standard,
-                                year=current_year
-                            ).count()
-
-                        # Find assigned teacher
-                        teacher_assignment = None
-                        if current_year:
-                            teacher_assignment = StandardTeacher.objects.filter(
-                                standard=standard,
-                                year=current_year,
-                                teacher__isnull=False
-                            ).first()
-
-                        class_info = {
-                            'standard': standard,
-                            'student_count': student_count,
-                            'teacher': teacher_assignment.teacher if teacher_assignment else None
-                        }
-
-                        impact['classes_to_remove'].append(class_info)
-                        impact['total_students_affected'] += student_count
-
-                        if teacher_assignment and teacher_assignment.teacher:
-                            teacher_info = {
-                                'teacher': teacher_assignment.teacher,
-                                'class_name': standard.get_display_name()
-                            }
-                            if teacher_info not in impact['teachers_to_unassign']:
-                                impact['teachers_to_unassign'].append(teacher_info)
-
-                    except Standard.DoesNotExist:
-                        continue
-
-        elif self.new_groups > current_groups:
-            # Increasing groups - show new classes that will be created
-            for standard_code, standard_name in Standard.STANDARD_CHOICES:
-                for group_num in range(current_groups + 1, self.new_groups + 1):
-                    impact['classes_to_create'].append({
-                        'standard_name': standard_name,
-                        'group_number': group_num,
-                        'display_name': f"{standard_name} - {group_num}"
-                    })
-
-        return impact
+        roster = get_group_roster(self.school)
+        return derive_group_impact(roster, self.school.groups_per_standard, self.new_groups)
 
 
 class GroupChangeExecuteView(SchoolAdminRequiredMixin, View):
@@ -596,20 +599,17 @@ class GroupChangeExecuteView(SchoolAdminRequiredMixin, View):
     """
 
     def dispatch(self, request, *args, **kwargs):
-        # Call parent dispatch first for permission checking
-        response = super().dispatch(request, *args, **kwargs)
-        if response:  # If parent returned a redirect, return it
-            return response
-
-        # Get the new group count from URL
+        # Get the new group count from URL. This has to happen before the
+        # parent dispatch, which runs the handler.
         self.new_groups = int(kwargs.get('new_groups'))
 
         # Validate new_groups
         if self.new_groups < 1 or self.new_groups > 5:
             messages.error(request, "Invalid number of groups. Must be between 1 and 5.")
-            return redirect('core:group_management', school_slug=self.school_slug)
+            return redirect('core:group_management', school_slug=kwargs.get('school_slug'))
 
-        return None  # Continue with normal processing
+        # Parent dispatch handles permission checking
+        return super().dispatch(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
         """
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
-    Test, TestSubject, TestScore, StudentTermReview, StudentSubjectScore
+    Test, TestSubject, TestScore, StudentTermReview, StudentSubjectScore, SearchDocument
 )
+from .search import filter_documents
 
 @admin.register(Test)
 class TestAdmin(admin.ModelAdmin):
@@ -29,7 +30,7 @@ class StudentTermReviewAdmin(admin.ModelAdmin):
                    'attitude', 'respect', 'parental_support', 'attendance',
                    'assignment_completion', 'class_participation', 'time_management', 'recommend_for_advancement')
     list_filter = ('term__year', 'term__term_number', 'recommend_for_advancement')
-    search_fields = ('student__first_name', 'student__last_name', 'remarks')
+    search_fields = ('student__first_name', 'student__last_name')
 
     fieldsets = (
         ('Student Information', {
@@ -51,6 +52,14 @@ class StudentTermReviewAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        # Remarks are matched through the full-text index rather than icontains
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            matching = filter_documents(SearchDocument.objects.filter(kind='review'), search_term)
+            results |= queryset.filter(id__in=matching.values('object_id'))
+        return results, may_have_duplicates
+
 @admin.register(StudentSubjectScore)
 class StudentSubjectScoreAdmin(admin.ModelAdmin):
     list_display = ('term_review', 'standard_subject', 'term_assessment_percentage',
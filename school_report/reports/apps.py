@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reports'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        import reports.signals  # Keep search documents current
+        from .search import DOCUMENT_FTS
+        post_migrate.connect(DOCUMENT_FTS.ensure_triggers, sender=self)
@@ -0,0 +1,175 @@
+"""
+Class broadsheet: every student of a class against every subject for a term.
+
+The broadsheet is built from one pivot query over StudentTermReview and
+StudentSubjectScore: the reviews of the class are grouped per student and
+each subject becomes a set of conditional aggregate columns (term assessment,
+exam score and exam maximum). Totals and ranking are computed from the result
+in Python, using the same rules as the report card
+(StudentTermReview.overall_average_percentage and overall_grade).
+
+Once a term is finalized its broadsheets no longer change, so they are cached
+in the term's school year namespace (see core/cache.py).
+"""
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum
+
+from schools.exports import class_name
+from .models import StudentTermReview, grade_for_percentage
+
+
+def _subject_columns(index):
+    return f's{index}_term', f's{index}_exam', f's{index}_max'
+
+
+def compute_broadsheet(term, standard):
+    """
+    Build the broadsheet of `standard` for `term` as plain data (so it can be
+    cached):
+
+    - subjects: [{'id', 'name', 'term_average', 'exam_average'}]
+    - rows: one dict per student with review_id, student_id, first_name,
+      last_name, is_finalized, scores ([{'term', 'exam', 'exam_max',
+      'exam_percentage', 'grade'}] in subject order, None where the student
+      has no score), total, max_total, average, grade and position
+    - class_average
+    """
+    from academics.models import StandardEnrollment, StandardSubject
+
+    subjects = list(StandardSubject.objects.filter(
+        standard=standard,
+        year_id=term.year_id
+    ).order_by('subject_name').values('id', 'subject_name'))
+
+    # A student belongs to the class if their latest assignment of the year is there
+    latest_enrollment_id = StandardEnrollment.objects.filter(
+        student=OuterRef('student'),
+        year_id=term.year_id
+    ).order_by('-created_at', '-id').values('id')[:1]
+    class_students = StandardEnrollment.objects.filter(
+        year_id=term.year_id,
+        standard=standard,
+        id=Subquery(latest_enrollment_id)
+    ).values('student_id')
+
+    pivot = {}
+    for index, subject in enumerate(subjects):
+        in_subject = Q(subject_scores__standard_subject_id=subject['id'])
+        term_column, exam_column, max_column = _subject_columns(index)
+        pivot[term_column] = Max('subject_scores__term_assessment_percentage', filter=in_subject)
+        pivot[exam_column] = Max('subject_scores__final_exam_score', filter=in_subject)
+        pivot[max_column] = Max('subject_scores__final_exam_max_score', filter=in_subject)
+
+    reviews = StudentTermReview.objects.filter(
+        term=term,
+        student_id__in=class_students
+    ).values(
+        'id', 'student_id', 'student__first_name', 'student__last_name', 'is_finalized'
+    ).annotate(
+        **pivot,
+        total=Sum('subject_scores__final_exam_score'),
+        max_total=Sum('subject_scores__final_exam_max_score'),
+        subject_count=Count('subject_scores'),
+    ).order_by('student__last_name', 'student__first_name', 'student_id')
+
+    rows = []
+    for review in reviews:
+        scores = []
+        for index in range(len(subjects)):
+            term_column, exam_column, max_column = _subject_columns(index)
+            if review[exam_column] is None:
+                scores.append(None)
+                continue
+            exam_max = review[max_column]
+            exam_percentage = review[exam_column] * 100 / exam_max if exam_max else 0
+            scores.append({
+                'term': review[term_column],
+                'exam': review[exam_column],
+                'exam_max': exam_max,
+                'exam_percentage': exam_percentage,
+                'grade': grade_for_percentage(exam_percentage),
+            })
+
+        average = None
+        if review['subject_count']:
+            average = review['total'] * 100 / review['max_total'] if review['max_total'] else 0
+        rows.append({
+            'review_id': review['id'],
+            'student_id': review['student_id'],
+            'first_name': review['student__first_name'],
+            'last_name': review['student__last_name'],
+            'is_finalized': review['is_finalized'],
+            'scores': scores,
+            'total': review['total'] if review['subject_count'] else None,
+            'max_total': review['max_total'] if review['subject_count'] else None,
+            'average': average,
+            'grade': grade_for_percentage(average) if average is not None else None,
+            'position': None,
+        })
+
+    # Standard competition ranking on the average: ties share a position
+    ranked = sorted((row for row in rows if row['average'] is not None), key=lambda row: row['average'], reverse=True)
+    for place, row in enumerate(ranked, start=1):
+        if place > 1 and row['average'] == ranked[place - 2]['average']:
+            row['position'] = ranked[place - 2]['position']
+        else:
+            row['position'] = place
+
+    for index, subject in enumerate(subjects):
+        subject_scores = [row['scores'][index] for row in rows if row['scores'][index]]
+        subject['name'] = subject.pop('subject_name')
+        subject['term_average'] = _mean(score['term'] for score in subject_scores)
+        subject['exam_average'] = _mean(score['exam_percentage'] for score in subject_scores)
+
+    return {
+        'subjects': subjects,
+        'rows': rows,
+        'class_average': _mean(row['average'] for row in ranked),
+    }
+
+
+def _mean(values):
+    values = list(values)
+    return sum(values) / len(values) if values else None
+
+
+def get_broadsheet(term, standard):
+    """The broadsheet of `standard` for `term`, cached once the term is finalized"""
+    if not term.is_finalized:
+        return compute_broadsheet(term, standard)
+
+    from core.cache import cached_for_year
+
+    return cached_for_year(
+        standard.school_id,
+        term.year_id,
+        f'broadsheet:term{term.id}:class{standard.id}',
+        lambda: compute_broadsheet(term, standard)
+    )
+
+
+def broadsheet_table(broadsheet):
+    """(header, rows) of a broadsheet for core.exports.export_response()"""
+    header = ['Position', 'Student ID', 'First Name', 'Last Name']
+    for subject in broadsheet['subjects']:
+        header += [f"{subject['name']} Term %", f"{subject['name']} Exam", f"{subject['name']} Exam %",
+                   f"{subject['name']} Grade"]
+    header += ['Total', 'Out Of', 'Average %', 'Grade']
+
+    def rows():
+        for row in broadsheet['rows']:
+            values = [row['position'], row['student_id'], row['first_name'], row['last_name']]
+            for score in row['scores']:
+                if score is None:
+                    values += [None] * 4
+                else:
+                    values += [score['term'], score['exam'], round(score['exam_percentage'], 2), score['grade']]
+            average = round(row['average'], 2) if row['average'] is not None else None
+            values += [row['total'], row['max_total'], average, row['grade']]
+            yield values
+
+    return header, rows()
+
+
+def broadsheet_filename(school_slug, term, standard):
+    label = class_name(standard.name, standard.group_number).lower().replace(' ', '')
+    return f"{school_slug}-broadsheet-{term.year.start_year}-term-{term.term_number}-{label}"
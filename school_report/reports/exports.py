@@ -0,0 +1,136 @@
+"""
+Rows for the test score and term review exports (see core/exports.py).
+
+Each function returns (header, rows) where rows is a generator reading its
+queryset with iterator(chunk_size=EXPORT_CHUNK_SIZE).
+"""
+from django.conf import settings
+from django.db.models import OuterRef, Prefetch, Subquery
+
+from schools.exports import class_name
+from schools.models import Standard
+from .models import Test, TestScore, StudentTermReview, StudentSubjectScore
+
+_TEST_TYPE_LABELS = dict(Test.TEST_TYPE_CHOICES)
+
+
+def test_score_rows(school, created_by=None, term=None, test=None):
+    """
+    Every test score of `school`, optionally limited to the tests created by
+    a teacher, one term or one test.
+    """
+    header = [
+        'Test ID', 'Test Date', 'Test Type', 'Academic Year', 'Term', 'Class', 'Subject',
+        'Student ID', 'First Name', 'Last Name', 'Score', 'Max Score', 'Percentage', 'Test Finalized',
+    ]
+
+    scores = TestScore.objects.filter(test_subject__test__standard__school=school)
+    if created_by:
+        scores = scores.filter(test_subject__test__created_by=created_by)
+    if term:
+        scores = scores.filter(test_subject__test__term=term)
+    if test:
+        scores = scores.filter(test_subject__test=test)
+
+    scores = scores.order_by(
+        'test_subject__test__test_date', 'test_subject__test_id',
+        'test_subject__standard_subject__subject_name', 'student__last_name', 'student__first_name', 'student_id'
+    ).values_list(
+        'test_subject__test_id', 'test_subject__test__test_date', 'test_subject__test__test_type',
+        'test_subject__test__term__year__start_year', 'test_subject__test__term__term_number',
+        'test_subject__test__standard__name', 'test_subject__test__standard__group_number',
+        'test_subject__standard_subject__subject_name', 'student_id', 'student__first_name',
+        'student__last_name', 'score', 'test_subject__max_score', 'test_subject__test__is_finalized'
+    )
+
+    def rows():
+        for (test_id, test_date, test_type, start_year, term_number, standard_name, group_number, subject,
+             student_id, first_name, last_name, score, max_score, is_finalized) in scores.iterator(
+                chunk_size=settings.EXPORT_CHUNK_SIZE):
+            yield (
+                test_id, test_date, _TEST_TYPE_LABELS.get(test_type, test_type),
+                f"{start_year}-{start_year + 1}" if start_year else None,
+                f"Term {term_number}" if term_number else None,
+                class_name(standard_name, group_number), subject, student_id, first_name, last_name,
+                score, max_score, round(score * 100 / max_score, 2) if max_score else None, is_finalized,
+            )
+
+    return header, rows()
+
+
+def term_review_rows(school, standard=None, year=None, term=None):
+    """
+    Every term review of `school` with its subject scores, one row per
+    subject (or a single row for a review without subject scores).
+
+    A review's class is the student's current (latest) class assignment in
+    the term's year; `standard` limits the export to one class and `year` or
+    `term` to one academic year or term.
+    """
+    from academics.models import StandardEnrollment
+
+    header = [
+        'Academic Year', 'Term', 'Class', 'Student ID', 'First Name', 'Last Name',
+        'Days Present', 'Days Late', 'Attitude', 'Respect', 'Parental Support', 'Attendance',
+        'Assignment Completion', 'Class Participation', 'Time Management',
+        'Recommended for Advancement', 'Finalized', 'Remarks',
+        'Subject', 'Term Assessment %', 'Final Exam Score', 'Final Exam Max Score', 'Final Exam %',
+    ]
+
+    class_id = StandardEnrollment.objects.filter(
+        student=OuterRef('student'),
+        year=OuterRef('term__year')
+    ).order_by('-created_at', '-id').values('standard')[:1]
+
+    reviews = StudentTermReview.objects.filter(term__year__school=school).annotate(
+        class_id=Subquery(class_id)
+    )
+    if standard:
+        reviews = reviews.filter(class_id=standard.id)
+    if year:
+        reviews = reviews.filter(term__year=year)
+    if term:
+        reviews = reviews.filter(term=term)
+
+    reviews = reviews.select_related('student', 'term__year').prefetch_related(
+        Prefetch(
+            'subject_scores',
+            queryset=StudentSubjectScore.objects.select_related('standard_subject').order_by(
+                'standard_subject__subject_name'
+            )
+        )
+    ).order_by('term__year__start_year', 'term__term_number', 'class_id',
+               'student__last_name', 'student__first_name', 'student_id')
+
+    classes = {
+        standard_id: class_name(name, group_number)
+        for standard_id, name, group_number in Standard.objects.filter(school=school).values_list(
+            'id', 'name', 'group_number'
+        )
+    }
+
+    def rows():
+        # With prefetch_related, iterator() prefetches the subject scores per chunk
+        for review in reviews.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+            review_columns = (
+                str(review.term.year), review.term.get_term_number_display(),
+                classes.get(review.class_id, 'Unassigned'), review.student_id,
+                review.student.first_name, review.student.last_name,
+                review.days_present, review.days_late, review.attitude, review.respect,
+                review.parental_support, review.attendance, review.assignment_completion,
+                review.class_participation, review.time_management,
+                review.recommend_for_advancement, review.is_finalized, review.remarks,
+            )
+            subject_scores = review.subject_scores.all()
+            if not subject_scores:
+                yield review_columns + (None,) * 5
+            for subject_score in subject_scores:
+                yield review_columns + (
+                    subject_score.standard_subject.subject_name,
+                    subject_score.term_assessment_percentage,
+                    subject_score.final_exam_score,
+                    subject_score.final_exam_max_score,
+                    round(subject_score.final_exam_percentage, 2),
+                )
+
+    return header, rows()
@@ -0,0 +1,98 @@
+# Generated by Django 5.2 on 2026-10-19 06:10
+
+import django.db.models.deletion
+from django.db import migrations, models, OperationalError
+
+# The SQL of reports.search's indexes as of this migration, written out so
+# later changes to that module do not change what this migration does
+
+# PostgreSQL: GIN index on document_vector()
+CREATE_SEARCH_INDEX = [
+    "CREATE INDEX reports_searchdoc_body_fts ON reports_searchdocument USING gin "
+    "(to_tsvector('english'::regconfig, COALESCE(body, '')))",
+]
+DROP_SEARCH_INDEX = [
+    "DROP INDEX IF EXISTS reports_searchdoc_body_fts",
+]
+
+# SQLite: DOCUMENT_FTS, the FTS5 index and the triggers keeping it current
+CREATE_FTS = [
+    "CREATE VIRTUAL TABLE reports_searchdocument_fts USING fts5(body, content='reports_searchdocument', "
+    "content_rowid='id', tokenize='porter unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER reports_searchdocument_fts_ai AFTER INSERT ON reports_searchdocument BEGIN "
+    "INSERT INTO reports_searchdocument_fts (rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER reports_searchdocument_fts_ad AFTER DELETE ON reports_searchdocument BEGIN "
+    "INSERT INTO reports_searchdocument_fts (reports_searchdocument_fts, rowid, body) "
+    "VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER reports_searchdocument_fts_au AFTER UPDATE ON reports_searchdocument BEGIN "
+    "INSERT INTO reports_searchdocument_fts (reports_searchdocument_fts, rowid, body) "
+    "VALUES ('delete', old.id, old.body); "
+    "INSERT INTO reports_searchdocument_fts (rowid, body) VALUES (new.id, new.body); END",
+    "INSERT INTO reports_searchdocument_fts (reports_searchdocument_fts) VALUES ('rebuild')",
+]
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS reports_searchdocument_fts_ai",
+    "DROP TRIGGER IF EXISTS reports_searchdocument_fts_ad",
+    "DROP TRIGGER IF EXISTS reports_searchdocument_fts_au",
+    "DROP TABLE IF EXISTS reports_searchdocument_fts",
+]
+
+
+def _execute(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def add_search_index(apps, schema_editor):
+    # The full-text index depends on the database backend, so it is created
+    # here rather than through SearchDocument.Meta.indexes
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _execute(schema_editor, CREATE_SEARCH_INDEX)
+    elif vendor == 'sqlite':
+        try:
+            _execute(schema_editor, CREATE_FTS)
+        except OperationalError:
+            # SQLite built without FTS5: searches fall back to icontains
+            pass
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _execute(schema_editor, DROP_SEARCH_INDEX)
+    elif vendor == 'sqlite':
+        _execute(schema_editor, DROP_FTS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_schoolenrollment_enrolled_by_schoolstaff_added_by_and_more'),
+        ('core', '0004_auditchangeset'),
+        ('reports', '0004_alter_studenttermreview_options_alter_test_options_and_more'),
+        ('schools', '0008_student_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('review', 'Term Report'), ('test', 'Test')], max_length=10)),
+                ('object_id', models.PositiveIntegerField(help_text='ID of the StudentTermReview or Test')),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('source_updated_at', models.DateTimeField(help_text='updated_at of the source when it was indexed')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schools.school')),
+                ('standard', models.ForeignKey(blank=True, help_text="The test's class, or the student's class in the term's year", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='schools.standard')),
+                ('teacher', models.ForeignKey(blank=True, help_text='Who created the test, or who finalized the report (else the class teacher)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.userprofile')),
+                ('term', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='academics.term')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['school', 'kind'], name='reports_searchdoc_school')],
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
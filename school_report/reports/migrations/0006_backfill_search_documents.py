@@ -0,0 +1,105 @@
+from django.db import migrations
+from django.db.models import F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 500
+
+# Frozen copy of Test.TEST_TYPE_CHOICES labels as of this migration
+TEST_TYPE_LABELS = {
+    'assignment': 'Assignment',
+    'quiz': 'Quiz',
+    'midterm': 'Mid-Term Test',
+    'project': 'Project',
+    'final_exam': 'Final Exam',
+    'other': 'Other',
+}
+
+
+# Frozen copies of reports.search.index_reviews() and index_tests() as of
+# this migration; later changes to what is indexed need their own migration
+# (or `reindex_search_documents --full`). On SQLite the FTS5 triggers from
+# 0005 index the inserted documents.
+def _batches(queryset):
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1]['id']
+        yield batch
+
+
+def backfill_search_documents(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    SearchDocument = apps.get_model('reports', 'SearchDocument')
+    StudentTermReview = apps.get_model('reports', 'StudentTermReview')
+    Test = apps.get_model('reports', 'Test')
+    StandardEnrollment = apps.get_model('academics', 'StandardEnrollment')
+    StandardTeacher = apps.get_model('academics', 'StandardTeacher')
+
+    class_id = StandardEnrollment.objects.using(db_alias).filter(
+        student=OuterRef('student'),
+        year=OuterRef('term__year')
+    ).order_by('-created_at', '-id').values('standard')[:1]
+    class_teacher_id = StandardTeacher.objects.using(db_alias).filter(
+        standard=OuterRef('class_id'),
+        year=OuterRef('term__year')
+    ).order_by('-created_at', '-id').values('teacher')[:1]
+
+    reviews = StudentTermReview.objects.using(db_alias).filter(
+        term__isnull=False
+    ).exclude(remarks='').annotate(
+        class_id=Subquery(class_id)
+    ).annotate(
+        teacher_id=Coalesce(F('finalized_by'), Subquery(class_teacher_id), output_field=IntegerField())
+    ).values(
+        'id', 'remarks', 'term_id', 'term__year__school_id', 'class_id', 'teacher_id',
+        'student__first_name', 'student__last_name', 'updated_at'
+    )
+    for batch in _batches(reviews):
+        SearchDocument.objects.using(db_alias).bulk_create([
+            SearchDocument(
+                kind='review',
+                object_id=review['id'],
+                school_id=review['term__year__school_id'],
+                term_id=review['term_id'],
+                standard_id=review['class_id'],
+                teacher_id=review['teacher_id'],
+                title=f"{review['student__first_name']} {review['student__last_name']}"[:255],
+                body=review['remarks'],
+                source_updated_at=review['updated_at'],
+            )
+            for review in batch
+        ], ignore_conflicts=True)
+
+    tests = Test.objects.using(db_alias).exclude(description__isnull=True).exclude(description='').values(
+        'id', 'description', 'term_id', 'standard__school_id', 'standard_id', 'created_by_id',
+        'test_type', 'test_date', 'updated_at'
+    )
+    for batch in _batches(tests):
+        SearchDocument.objects.using(db_alias).bulk_create([
+            SearchDocument(
+                kind='test',
+                object_id=test['id'],
+                school_id=test['standard__school_id'],
+                term_id=test['term_id'],
+                standard_id=test['standard_id'],
+                teacher_id=test['created_by_id'],
+                title=f"{TEST_TYPE_LABELS.get(test['test_type'], test['test_type'])} on {test['test_date']:%Y-%m-%d}",
+                body=test['description'],
+                source_updated_at=test['updated_at'],
+            )
+            for test in batch
+        ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_schoolenrollment_enrolled_by_schoolstaff_added_by_and_more'),
+        ('reports', '0005_search_documents'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,22 @@ from django.apps import apps
 from schools.models import Student
 
 
+def grade_for_percentage(percentage):
+    """Letter grade for a percentage, as printed on report cards"""
+    if percentage >= 90:
+        return 'A+'
+    elif percentage >= 80:
+        return 'A'
+    elif percentage >= 70:
+        return 'B'
+    elif percentage >= 60:
+        return 'C'
+    elif percentage >= 50:
+        return 'D'
+    else:
+        return 'F'
+
+
 class Test(models.Model):
     """
     Represents a test created by a teacher for a standard
@@ -414,18 +430,7 @@ class StudentTermReview(models.Model):
     def overall_grade(self):
         """Calculate overall grade based on overall average percentage"""
         percentage = self.overall_average_percentage
-        if percentage >= 90:
-            return 'A+'
-        elif percentage >= 80:
-            return 'A'
-        elif percentage >= 70:
-            return 'B'
-        elif percentage >= 60:
-            return 'C'
-        elif percentage >= 50:
-            return 'D'
-        else:
-            return 'F'
+        return grade_for_percentage(percentage)
 
     @property
     def subjects_count(self):
@@ -641,18 +646,7 @@ class StudentSubjectScore(models.Model):
     def final_grade(self):
         """Calculate final grade based on final exam percentage"""
         percentage = self.final_exam_percentage
-        if percentage >= 90:
-            return 'A+'
-        elif percentage >= 80:
-            return 'A'
-        elif percentage >= 70:
-            return 'B'
-        elif percentage >= 60:
-            return 'C'
-        elif percentage >= 50:
-            return 'D'
-        else:
-            return 'F'
+        return grade_for_percentage(percentage)
 
     def update_term_assessment(self):
         """
@@ -689,3 +683,36 @@ class StudentSubjectScore(models.Model):
             return True
         return False
 
+
+
+class SearchDocument(models.Model):
+    """
+    The searchable text of a term review (its remarks) or a test (its
+    description), with the school, term, class and teacher that searches
+    filter on. Kept up to date by reports/search.py.
+    """
+    KIND_CHOICES = [
+        ('review', 'Term Report'),
+        ('test', 'Test'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField(help_text="ID of the StudentTermReview or Test")
+    school = models.ForeignKey('schools.School', on_delete=models.CASCADE, related_name='+')
+    term = models.ForeignKey('academics.Term', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    standard = models.ForeignKey('schools.Standard', on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+                                 help_text="The test's class, or the student's class in the term's year")
+    teacher = models.ForeignKey('core.UserProfile', on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+                                help_text="Who created the test, or who finalized the report (else the class teacher)")
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    source_updated_at = models.DateTimeField(help_text="updated_at of the source when it was indexed")
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+        indexes = [
+            models.Index(fields=['school', 'kind'], name='reports_searchdoc_school'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
@@ -0,0 +1,279 @@
+"""
+Full-text search over term report remarks and test descriptions.
+
+Each searchable text is copied into a SearchDocument row along with the
+school, term, class and teacher that searches filter on, so filtering never
+has to work out a student's class or a class's teacher at query time:
+
+- a review's class is the student's current (latest) class in the term's
+  year, and its teacher whoever finalized it, else that class's current
+  teacher
+- a test's class and teacher are its standard and creator
+
+Documents are kept current by the receivers in reports/signals.py. Changes
+made without signals (bulk_create, QuerySet.update()) are picked up by
+reindex() (the reindex_search_documents command) when they set updated_at,
+and by a full reindex otherwise.
+
+The body is indexed per database backend (both created by
+reports/migrations/0005):
+
+- PostgreSQL: a GIN index on to_tsvector('english', body), searched with
+  websearch_to_tsquery and ranked with ts_rank
+- SQLite (development): DOCUMENT_FTS, an FTS5 index with the porter stemmer
+  (see core/fts.py), ranked with bm25
+
+so "reading support" also finds "needs support with her reading". Other
+backends fall back to icontains filters, in order of recency.
+"""
+import re
+
+from django.db import connections, transaction
+from django.db.models import F, FloatField, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+from core.fts import SqliteFtsIndex, fts_query
+from .models import SearchDocument, StudentTermReview, Test
+
+DOCUMENT_SEARCH_INDEX = 'reports_searchdoc_body_fts'
+DOCUMENT_FTS = SqliteFtsIndex('reports_searchdocument_fts', 'reports_searchdocument', ['body'],
+                              tokenize='porter unicode61 remove_diacritics 2')
+
+SEARCH_CONFIG = 'english'
+INDEX_BATCH_SIZE = 500
+
+_TEST_TYPE_LABELS = dict(Test.TEST_TYPE_CHOICES)
+# "quoted phrases" or single words
+_QUERY_TERMS = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def document_vector():
+    """The tsvector of a document's body, identical in the index and in queries"""
+    from django.contrib.postgres.search import SearchVector
+
+    return SearchVector('body', config=SEARCH_CONFIG)
+
+
+def document_search_index():
+    """GIN index on document_vector() used by PostgreSQL searches."""
+    from django.contrib.postgres.indexes import GinIndex
+
+    return GinIndex(document_vector(), name=DOCUMENT_SEARCH_INDEX)
+
+
+def query_terms(query):
+    """The words and "quoted phrases" of a search query"""
+    return [phrase or word for phrase, word in _QUERY_TERMS.findall(query) if (phrase or word).strip()]
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), INDEX_BATCH_SIZE):
+        yield ids[start:start + INDEX_BATCH_SIZE]
+
+
+def _save_documents(kind, ids, documents):
+    """Upsert `documents` and delete the documents of the other `ids` (now empty or gone)"""
+    SearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['school', 'term', 'standard', 'teacher', 'title', 'body', 'source_updated_at'],
+    )
+    indexed = {document.object_id for document in documents}
+    SearchDocument.objects.filter(kind=kind, object_id__in=[pk for pk in ids if pk not in indexed]).delete()
+
+
+def index_reviews(review_ids):
+    """Create, update or remove the documents of the given term reviews"""
+    from academics.models import StandardEnrollment, StandardTeacher
+
+    class_id = StandardEnrollment.objects.filter(
+        student=OuterRef('student'),
+        year=OuterRef('term__year')
+    ).order_by('-created_at', '-id').values('standard')[:1]
+    class_teacher_id = StandardTeacher.objects.filter(
+        standard=OuterRef('class_id'),
+        year=OuterRef('term__year')
+    ).order_by('-created_at', '-id').values('teacher')[:1]
+
+    for ids in _chunks(review_ids):
+        reviews = StudentTermReview.objects.filter(
+            id__in=ids,
+            term__isnull=False
+        ).exclude(remarks='').annotate(
+            class_id=Subquery(class_id)
+        ).annotate(
+            teacher_id=Coalesce(F('finalized_by'), Subquery(class_teacher_id), output_field=IntegerField())
+        ).values(
+            'id', 'remarks', 'term_id', 'term__year__school_id', 'class_id', 'teacher_id',
+            'student__first_name', 'student__last_name', 'updated_at'
+        )
+        documents = [
+            SearchDocument(
+                kind='review',
+                object_id=review['id'],
+                school_id=review['term__year__school_id'],
+                term_id=review['term_id'],
+                standard_id=review['class_id'],
+                teacher_id=review['teacher_id'],
+                title=f"{review['student__first_name']} {review['student__last_name']}"[:255],
+                body=review['remarks'],
+                source_updated_at=review['updated_at'],
+            )
+            for review in reviews
+        ]
+        _save_documents('review', ids, documents)
+
+
+def index_tests(test_ids):
+    """Create, update or remove the documents of the given tests"""
+    for ids in _chunks(test_ids):
+        tests = Test.objects.filter(id__in=ids).exclude(description__isnull=True).exclude(description='').values(
+            'id', 'description', 'term_id', 'standard__school_id', 'standard_id', 'created_by_id',
+            'test_type', 'test_date', 'updated_at'
+        )
+        documents = [
+            SearchDocument(
+                kind='test',
+                object_id=test['id'],
+                school_id=test['standard__school_id'],
+                term_id=test['term_id'],
+                standard_id=test['standard_id'],
+                teacher_id=test['created_by_id'],
+                title=f"{_TEST_TYPE_LABELS.get(test['test_type'], test['test_type'])} on {test['test_date']:%Y-%m-%d}",
+                body=test['description'],
+                source_updated_at=test['updated_at'],
+            )
+            for test in tests
+        ]
+        _save_documents('test', ids, documents)
+
+
+def remove_documents(kind, object_ids):
+    """Delete the documents of deleted reviews or tests"""
+    SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+
+def _stale_ids(sources, kind, has_text, full):
+    """
+    IDs of `sources` whose document is out of date: missing for a source with
+    text, or older than the source.
+    """
+    if full:
+        return list(sources.values_list('id', flat=True))
+    indexed_at = SearchDocument.objects.filter(kind=kind, object_id=OuterRef('id')).values('source_updated_at')[:1]
+    return list(sources.annotate(indexed_at=Subquery(indexed_at)).filter(
+        (Q(indexed_at__isnull=True) & has_text) | Q(updated_at__gt=F('indexed_at'))
+    ).values_list('id', flat=True))
+
+
+def reindex(school=None, full=False):
+    """
+    Bring the documents up to date: index the reviews and tests changed since
+    they were last indexed (or all of them with `full`, which also refreshes
+    classes and teachers) and remove the documents of deleted sources.
+
+    Returns (reviews indexed, tests indexed, documents removed).
+    """
+    reviews = StudentTermReview.objects.all()
+    tests = Test.objects.all()
+    documents = SearchDocument.objects.all()
+    if school:
+        reviews = reviews.filter(term__year__school=school)
+        tests = tests.filter(standard__school=school)
+        documents = documents.filter(school=school)
+
+    review_ids = _stale_ids(reviews, 'review', ~Q(remarks=''), full)
+    test_ids = _stale_ids(tests, 'test', Q(description__isnull=False) & ~Q(description=''), full)
+    index_reviews(review_ids)
+    index_tests(test_ids)
+
+    removed, _ = documents.filter(kind='review').exclude(
+        object_id__in=StudentTermReview.objects.values('id')
+    ).delete()
+    removed_tests, _ = documents.filter(kind='test').exclude(object_id__in=Test.objects.values('id')).delete()
+    return len(review_ids), len(test_ids), removed + removed_tests
+
+
+def search_documents(school, query, kind=None, term=None, year=None, standard=None, teacher=None):
+    """
+    Documents of `school` matching `query`, best matches first (see
+    match_documents()), optionally filtered by kind, term (or academic year),
+    class and teacher.
+    """
+    documents = SearchDocument.objects.filter(school=school)
+    if kind:
+        documents = documents.filter(kind=kind)
+    if term:
+        documents = documents.filter(term=term)
+    if year:
+        documents = documents.filter(term__year=year)
+    if standard:
+        documents = documents.filter(standard=standard)
+    if teacher:
+        documents = documents.filter(teacher=teacher)
+
+    return match_documents(documents, query)
+
+
+def filter_documents(documents, query):
+    """
+    Limit a SearchDocument queryset to the documents matching `query`,
+    without ranking or ordering them (e.g. to use as a subquery).
+    """
+    terms = query_terms(query)
+    if not terms:
+        return documents.none()
+
+    if connections[documents.db].vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery
+
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return documents.alias(vector=document_vector()).filter(vector=search_query)
+
+    if DOCUMENT_FTS.is_available(documents.db):
+        return documents.filter(id__in=RawSQL(DOCUMENT_FTS.match_sql(), [fts_query(terms)]))
+
+    for search_term in terms:
+        documents = documents.filter(Q(body__icontains=search_term))
+    return documents
+
+
+def match_documents(documents, query):
+    """
+    Limit a SearchDocument queryset to the documents matching `query`,
+    annotated with their rank (higher is better, None on backends without a
+    full-text index) and ordered best first.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return documents.none()
+
+    if connections[documents.db].vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return filter_documents(documents, query).annotate(
+            rank=SearchRank(document_vector(), search_query)
+        ).order_by('-rank', '-source_updated_at', 'id')
+
+    if DOCUMENT_FTS.is_available(documents.db):
+        match = fts_query(terms)
+        # bm25 is lower for better matches; negate it so rank sorts like ts_rank
+        return filter_documents(documents, query).annotate(
+            rank=RawSQL(f"-({DOCUMENT_FTS.rank_sql()})", [match], output_field=FloatField())
+        ).order_by('-rank', '-source_updated_at', 'id')
+
+    return filter_documents(documents, query).annotate(
+        rank=Value(None, output_field=FloatField())
+    ).order_by('-source_updated_at', 'id')
+
+
+def on_commit_index(kind, object_ids):
+    """Index documents once the surrounding transaction commits"""
+    index = index_reviews if kind == 'review' else index_tests
+    object_ids = list(object_ids)
+    if object_ids:
+        transaction.on_commit(lambda: index(object_ids))
@@ -0,0 +1,69 @@
+"""
+Signals that keep the search documents current (see reports/search.py).
+
+Saving a review or test re-indexes it once the transaction commits; deleting
+one removes its document. A review's document also records the student's
+class and its teacher, so changes to class assignments re-index the reviews
+they affect:
+
+- a StandardEnrollment re-indexes the student's reviews in that year
+- a StandardTeacher re-indexes that year's reviews of the class, and of
+  the teacher's previous class
+"""
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from academics.models import StandardEnrollment, StandardTeacher
+from .models import SearchDocument, StudentTermReview, Test
+from .search import on_commit_index, remove_documents
+
+
+@receiver(post_save, sender=StudentTermReview)
+def index_saved_review(sender, instance, raw=False, **kwargs):
+    if not raw:
+        on_commit_index('review', [instance.pk])
+
+
+@receiver(post_save, sender=Test)
+def index_saved_test(sender, instance, raw=False, **kwargs):
+    if not raw:
+        on_commit_index('test', [instance.pk])
+
+
+@receiver(post_delete, sender=StudentTermReview)
+def remove_review_document(sender, instance, **kwargs):
+    remove_documents('review', [instance.pk])
+
+
+@receiver(post_delete, sender=Test)
+def remove_test_document(sender, instance, **kwargs):
+    remove_documents('test', [instance.pk])
+
+
+@receiver(post_save, sender=StandardEnrollment)
+def reindex_student_reviews(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    on_commit_index('review', StudentTermReview.objects.filter(
+        student_id=instance.student_id,
+        term__year_id=instance.year_id
+    ).exclude(remarks='').values_list('id', flat=True))
+
+
+@receiver(post_save, sender=StandardTeacher)
+def reindex_class_reviews(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    affected = Q()
+    if instance.standard_id:
+        affected |= Q(standard_id=instance.standard_id)
+    if instance.teacher_id:
+        affected |= Q(teacher_id=instance.teacher_id)
+    if not affected:
+        return
+    on_commit_index('review', SearchDocument.objects.filter(
+        affected,
+        kind='review',
+        term__year_id=instance.year_id
+    ).values_list('object_id', flat=True))
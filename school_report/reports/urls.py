@@ -23,6 +23,7 @@ urlpatterns = [
     
     # Test status
     path('tests/<int:test_id>/finalize/', views.test_finalize, name='test_finalize'),
+    path('tests/scores/export/', views.export_test_scores, name='export_test_scores'),
     
     # Subject management
     path('subjects/', views.subject_list, name='subject_list'),
@@ -32,9 +33,12 @@ urlpatterns = [
 
     # Report management
     path('reports/', views.report_list, name='report_list'),
+    path('reports/export/', views.export_term_reviews, name='export_term_reviews'),
+    path('reports/search/', views.report_search, name='report_search'),
     path('reports/term/<int:term_id>/class/<int:class_id>/', views.term_class_report_list, name='term_class_report_list'),
     path('reports/term/<int:term_id>/class/<int:class_id>/finalize/', views.finalize_class_reports, name='finalize_class_reports'),
     path('reports/term/<int:term_id>/class/<int:class_id>/bulk-pdf/', views.bulk_generate_class_reports_pdf, name='bulk_generate_class_reports_pdf'),
+    path('reports/term/<int:term_id>/class/<int:class_id>/broadsheet/', views.class_broadsheet, name='class_broadsheet'),
     path('reports/<int:report_id>/', views.report_detail, name='report_detail'),
     path('reports/<int:report_id>/download-pdf/', views.download_report_pdf, name='download_report_pdf'),
     path('reports/<int:report_id>/edit/', views.report_edit, name='report_edit'),
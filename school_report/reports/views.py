@@ -4,14 +4,21 @@ from django.contrib import messages
 from django.http import HttpResponseForbidden, JsonResponse, HttpResponse
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import Q
+from django.core.paginator import Paginator
+from django.urls import reverse
 from django.forms import modelformset_factory
 from django.template.loader import render_to_string
 from django.conf import settings
-from academics.models import StandardSubject, StandardTeacher, SchoolStaff, SchoolYear, Term, StandardEnrollment
-from schools.models import Student, School, Standard
+from academics.models import StandardSubject, StandardTeacher, Term, StandardEnrollment
+from schools.models import Student, Standard
 from core.models import UserProfile
-from core.utils import get_current_year_and_term, get_teacher_class_from_session, get_current_teacher_assignment, cleanup_old_pdf_files
+from core.utils import get_current_teacher_assignment, cleanup_old_pdf_files
+from core.context import school_staff_required, teacher_required
 from core.activity_utils import create_test_activity, create_report_finalization_activity
+from core.audit import audit_changeset
+from core.exports import export_response, get_export_format, get_filter_object
+from schools.exports import class_name
 import json
 import os
 import zipfile
@@ -23,6 +30,11 @@ except (ImportError, OSError) as e:
     WEASYPRINT_AVAILABLE = False
     print(f"WeasyPrint not available: {e}")
 from .models import Test, TestSubject, TestScore, StudentTermReview, StudentSubjectScore
+from .exports import test_score_rows, term_review_rows
+from .broadsheet import get_broadsheet, broadsheet_table, broadsheet_filename
+from .search import search_documents
+
+SEARCH_RESULTS_PER_PAGE = 20
 
 
 def generate_report_pdf(report, school, school_slug, request, subject_scores=None, current_enrollment=None):
@@ -232,42 +244,18 @@ class StudentTermReviewForm(forms.ModelForm):
             self.fields['days_late'].widget.attrs['max'] = term_days
 
 @login_required
+@teacher_required("You don't have permission to view tests for this school.")
 def test_list(request, school_slug):
     """
     View to list all tests created by the teacher
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    from academics.models import SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to view tests for this school.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
     # Get the teacher's assigned standard using the new historical system
-    from core.utils import get_current_year_and_term, get_current_teacher_assignment
-    current_year, current_term, vacation_status = get_current_year_and_term(school=school)
-
-    teacher_assignment = None
-    teacher_standard = None
-    if current_year:
-        teacher_assignment = get_current_teacher_assignment(teacher, current_year)
-        if teacher_assignment:
-            teacher_standard = teacher_assignment.standard
+    current_year = ctx.year
+    teacher_standard = ctx.teacher_standard
 
     if not teacher_standard:
         messages.warning(request, "You are not assigned to any class. Please contact the administrator.")
@@ -305,40 +293,18 @@ def test_list(request, school_slug):
     })
 
 @login_required
+@teacher_required("You don't have permission to create tests for this school.")
 def test_create(request, school_slug):
     """
     View to create a new test
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to create tests for this school.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
     # Get the teacher's assigned standard using the new historical system
-    current_year, current_term, vacation_status = get_current_year_and_term(school=school)
-
-    teacher_assignment = None
-    teacher_standard = None
-    if current_year:
-        teacher_assignment = get_current_teacher_assignment(teacher, current_year)
-        if teacher_assignment:
-            teacher_standard = teacher_assignment.standard
+    current_year, current_term = ctx.year, ctx.term_number
+    teacher_standard = ctx.teacher_standard
 
     if not teacher_standard:
         messages.warning(request, "You are not assigned to any class. Please contact the administrator.")
@@ -391,30 +357,14 @@ def test_create(request, school_slug):
     })
 
 @login_required
+@teacher_required("You don't have permission to view tests for this school.")
 def test_detail(request, school_slug, test_id):
     """
     View to show test details
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to view tests for this school.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
     test = get_object_or_404(Test, id=test_id)
 
@@ -490,30 +440,14 @@ def test_detail(request, school_slug, test_id):
     })
 
 @login_required
+@teacher_required("You don't have permission to edit tests for this school.")
 def test_edit(request, school_slug, test_id):
     """
     View to edit a test
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to edit tests for this school.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
     test = get_object_or_404(Test, id=test_id)
 
@@ -527,13 +461,8 @@ def test_edit(request, school_slug, test_id):
         return redirect('reports:test_detail', school_slug=school_slug, test_id=test_id)
 
     # Get the teacher's assigned standard using the new historical system
-    current_year, current_term, is_on_vacation = get_current_year_and_term(school=school)
-    teacher_assignment = None
-    teacher_standard = None
-    if current_year:
-        teacher_assignment = get_current_teacher_assignment(teacher, current_year)
-        if teacher_assignment:
-            teacher_standard = teacher_assignment.standard
+    current_year = ctx.year
+    teacher_standard = ctx.teacher_standard
 
     if request.method == 'POST':
         form = TestForm(request.POST, instance=test, school=school, current_year=current_year)
@@ -555,30 +484,14 @@ def test_edit(request, school_slug, test_id):
     })
 
 @login_required
+@teacher_required("You don't have permission to delete tests for this school.")
 def test_delete(request, school_slug, test_id):
     """
     View to delete a test
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to delete tests for this school.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
     test = get_object_or_404(Test, id=test_id)
 
@@ -606,30 +519,14 @@ def test_delete(request, school_slug, test_id):
     })
 
 @login_required
+@teacher_required("You don't have permission to edit tests for this school.")
 def test_subject_add(request, school_slug, test_id):
     """
     View to manage subjects for a test (bulk enable/disable with max scores)
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to edit tests for this school.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
     test = get_object_or_404(Test, id=test_id)
 
@@ -690,30 +587,14 @@ def test_subject_add(request, school_slug, test_id):
     })
 
 @login_required
+@teacher_required("You don't have permission to edit tests for this school.")
 def test_subject_edit(request, school_slug, test_id, subject_id):
     """
     View to edit a subject in a test
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to edit tests for this school.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
     test = get_object_or_404(Test, id=test_id)
     test_subject = get_object_or_404(TestSubject, id=subject_id, test=test)
@@ -748,30 +629,14 @@ def test_subject_edit(request, school_slug, test_id, subject_id):
     })
 
 @login_required
+@teacher_required("You don't have permission to edit tests for this school.")
 def test_subject_delete(request, school_slug, test_id, subject_id):
     """
     View to delete a subject from a test
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to edit tests for this school.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
     test = get_object_or_404(Test, id=test_id)
     test_subject = get_object_or_404(TestSubject, id=subject_id, test=test)
@@ -796,6 +661,7 @@ def test_subject_delete(request, school_slug, test_id, subject_id):
     })
 
 @login_required
+@teacher_required("You don't have permission to manage scores for this school.")
 def test_scores(request, school_slug, test_id):
     """
     View to manage scores for a test - redirects to test detail page
@@ -804,32 +670,16 @@ def test_scores(request, school_slug, test_id):
     return redirect('reports:test_detail', school_slug=school_slug, test_id=test_id)
 
 @login_required
+@teacher_required("You don't have permission to manage scores for this school.")
 def test_scores_bulk(request, school_slug, test_id):
     """
     View to manage all scores for a test in a matrix format
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to manage scores for this school.")
-        return redirect('core:home')
-
-    test = get_object_or_404(Test, id=test_id)
+    test = get_object_or_404(Test, id=test_id, standard__school=school)
 
     # check if test was already finalized
     if test.is_finalized:
@@ -869,7 +719,10 @@ def test_scores_bulk(request, school_slug, test_id):
 
     # Process form submission
     if request.method == 'POST':
-        with transaction.atomic():
+        # One audit changeset for the whole grid instead of a LogEntry per cell
+        with transaction.atomic(), audit_changeset(
+            request.user, f"Scores entered for {test.get_test_type_display()} (test {test.id})", school=school
+        ):
             updated_count = 0
 
             for student in students:
@@ -919,30 +772,14 @@ def test_scores_bulk(request, school_slug, test_id):
     })
 
 @login_required
+@teacher_required("You don't have permission to manage scores for this school.")
 def subject_scores(request, school_slug, test_id, subject_id):
     """
     View to add/edit scores for a specific subject in a test
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to manage scores for this school.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
     test = get_object_or_404(Test, id=test_id)
     test_subject = get_object_or_404(TestSubject, id=subject_id, test=test)
@@ -973,7 +810,11 @@ def subject_scores(request, school_slug, test_id, subject_id):
 
     # Create or update scores for each student
     if request.method == 'POST':
-        with transaction.atomic():
+        with transaction.atomic(), audit_changeset(
+            request.user,
+            f"{test_subject.standard_subject.subject_name} scores entered for {test.get_test_type_display()} (test {test.id})",
+            school=school
+        ):
             for student in students:
                 score_value = request.POST.get(f'score_{student.id}', 0)
                 if not score_value:
@@ -1019,30 +860,14 @@ def subject_scores(request, school_slug, test_id, subject_id):
     })
 
 @login_required
+@teacher_required("You don't have permission to finalize tests for this school.")
 def test_finalize(request, school_slug, test_id):
     """
     View to finalize a test
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to finalize tests for this school.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
     test = get_object_or_404(Test, id=test_id)
 
@@ -1106,52 +931,24 @@ def test_finalize(request, school_slug, test_id):
     })
 
 @login_required
+@teacher_required("You don't have permission to view subjects for this school.")
 def subject_list(request, school_slug):
     """
     View to list all subjects
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    # Get teacher's class from session (much faster than database queries)
-    class_id, class_name, year_id = get_teacher_class_from_session(request)
-
-    if not class_id:
-        # Enhanced debugging: Check if teacher actually has an assignment
-        teacher = request.user.profile
-        from core.utils import get_current_year_and_term, get_current_teacher_assignment
-        current_year, current_term, vacation_status = get_current_year_and_term(school=school)
+    ctx = request.school_ctx
+    school = ctx.school
 
-        if current_year:
-            teacher_assignment = get_current_teacher_assignment(teacher, current_year)
-            if teacher_assignment:
-                # Teacher has assignment but session is missing - this is a session bug
-                messages.error(request, f"Session error detected. You are assigned to {teacher_assignment.standard} but session data is missing. Please log out and log back in.")
-            else:
-                # Teacher genuinely has no assignment
-                messages.warning(request, "You are not assigned to any class. Please contact the administrator.")
-        else:
-            messages.error(request, "No academic year set up for this school. Please contact the administrator.")
-        return redirect('core:home')
+    # Get the teacher's standard and current year from the request context
+    current_year = ctx.year
+    teacher_standard = ctx.teacher_standard
 
-    # Get the teacher's standard and current year from session data
-    try:
-        from schools.models import Standard
-        from academics.models import SchoolYear
-        teacher_standard = Standard.objects.get(id=class_id)
-        current_year = SchoolYear.objects.get(id=year_id)
-    except (Standard.DoesNotExist, SchoolYear.DoesNotExist):
-        messages.error(request, f"Invalid class assignment data (Class ID: {class_id}, Year ID: {year_id}). Please log out and log back in, or contact the administrator.")
+    if not current_year:
+        messages.error(request, "No academic year set up for this school. Please contact the administrator.")
         return redirect('core:home')
 
-    # Verify the standard belongs to the current school
-    if teacher_standard.school != school:
-        messages.error(request, "You don't have permission to view subjects for this school.")
+    if not teacher_standard:
+        messages.warning(request, "You are not assigned to any class. Please contact the administrator.")
         return redirect('core:home')
 
     # Get subjects assigned to teacher's class for the current year
@@ -1169,42 +966,23 @@ def subject_list(request, school_slug):
     })
 
 @login_required
+@teacher_required("You don't have permission to create subjects for this school.")
 def subject_create(request, school_slug):
     """
     View to create a new subject
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
-    # Get teacher's class from session (much faster than database queries)
-    class_id, class_name, year_id = get_teacher_class_from_session(request)
+    # Get the teacher's standard and current year from the request context
+    current_year = ctx.year
+    teacher_standard = ctx.teacher_standard
 
-    if not class_id:
+    if not teacher_standard:
         messages.warning(request, "You are not assigned to any class. Please contact the administrator.")
         return redirect('reports:subject_list', school_slug=school_slug)
 
-    # Get the teacher's standard and current year from session data
-    try:
-        from schools.models import Standard
-        from academics.models import SchoolYear
-        teacher_standard = Standard.objects.get(id=class_id)
-        current_year = SchoolYear.objects.get(id=year_id)
-    except (Standard.DoesNotExist, SchoolYear.DoesNotExist):
-        messages.error(request, "Invalid class assignment. Please contact the administrator.")
-        return redirect('reports:subject_list', school_slug=school_slug)
-
-    # Verify the standard belongs to the current school
-    if teacher_standard.school != school:
-        messages.error(request, "You don't have permission to create subjects for this school.")
-        return redirect('core:home')
-
     if request.method == 'POST':
         form = SubjectForm(request.POST)
         if form.is_valid():
@@ -1231,40 +1009,28 @@ def subject_create(request, school_slug):
     })
 
 @login_required
+@teacher_required("You don't have permission to edit subjects for this school.")
 def subject_edit(request, school_slug, subject_id):
     """
     View to edit a subject
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
+    ctx = request.school_ctx
+    school = ctx.school
 
-    # Get teacher's class from session (much faster than database queries)
-    class_id, class_name, year_id = get_teacher_class_from_session(request)
-
-    if not class_id:
+    teacher_standard = ctx.teacher_standard
+    if not teacher_standard:
         messages.warning(request, "You are not assigned to any class. Please contact the administrator.")
         return redirect('reports:subject_list', school_slug=school_slug)
 
     # Get the StandardSubject (not Subject)
     standard_subject = get_object_or_404(StandardSubject, id=subject_id)
 
-    # Verify this subject belongs to the teacher's class (using session data)
-    if standard_subject.standard.id != class_id or standard_subject.year.id != year_id:
+    # Verify this subject belongs to the teacher's class for the current year
+    # (the teacher's class always belongs to this school)
+    if standard_subject.standard_id != teacher_standard.id or standard_subject.year_id != ctx.year.id:
         messages.error(request, "You can only edit subjects for your assigned class.")
         return redirect('reports:subject_list', school_slug=school_slug)
 
-    # Verify the standard belongs to the current school
-    if standard_subject.standard.school != school:
-        messages.error(request, "You don't have permission to edit subjects for this school.")
-        return redirect('core:home')
-
     if request.method == 'POST':
         form = SubjectForm(request.POST)
         if form.is_valid():
@@ -1289,40 +1055,28 @@ def subject_edit(request, school_slug, subject_id):
     })
 
 @login_required
+@teacher_required("You don't have permission to delete subjects for this school.")
 def subject_delete(request, school_slug, subject_id):
     """
     View to delete a subject
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can access this page.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
+    ctx = request.school_ctx
+    school = ctx.school
 
-    # Get teacher's class from session (much faster than database queries)
-    class_id, class_name, year_id = get_teacher_class_from_session(request)
-
-    if not class_id:
+    teacher_standard = ctx.teacher_standard
+    if not teacher_standard:
         messages.warning(request, "You are not assigned to any class. Please contact the administrator.")
         return redirect('reports:subject_list', school_slug=school_slug)
 
     # Get the StandardSubject (not Subject)
     standard_subject = get_object_or_404(StandardSubject, id=subject_id)
 
-    # Verify this subject belongs to the teacher's class (using session data)
-    if standard_subject.standard.id != class_id or standard_subject.year.id != year_id:
+    # Verify this subject belongs to the teacher's class for the current year
+    # (the teacher's class always belongs to this school)
+    if standard_subject.standard_id != teacher_standard.id or standard_subject.year_id != ctx.year.id:
         messages.error(request, "You can only delete subjects for your assigned class.")
         return redirect('reports:subject_list', school_slug=school_slug)
 
-    # Verify the standard belongs to the current school
-    if standard_subject.standard.school != school:
-        messages.error(request, "You don't have permission to delete subjects for this school.")
-        return redirect('core:home')
-
     # Check if the subject is used in any tests
     if TestSubject.objects.filter(standard_subject=standard_subject).exists():
         messages.error(request, f"Cannot delete subject '{standard_subject.subject_name}' because it is used in one or more tests.")
@@ -1341,51 +1095,37 @@ def subject_delete(request, school_slug, subject_id):
     })
 
 @login_required
+@school_staff_required(['teacher', 'principal', 'administration'])
 def report_list(request, school_slug):
     """
     View to show available terms with reports (term selection page)
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check user permissions
-    if not hasattr(request.user, 'profile'):
-        messages.error(request, "Access denied.")
-        return redirect('core:home')
-
-    user_profile = request.user.profile
+    ctx = request.school_ctx
+    school = ctx.school
+    user_profile = ctx.profile
 
     # Check permissions based on user type
     if user_profile.user_type == 'teacher':
         # Teachers can only see reports for their assigned class
-        class_id, class_name, year_id = get_teacher_class_from_session(request)
+        teacher_standard = ctx.teacher_standard
 
-        if not class_id:
+        if not teacher_standard:
             messages.error(request, "You are not assigned to any class.")
             return redirect('core:home')
 
-        # Get terms that have reports for students in teacher's class
-        from core.utils import get_current_student_enrollment
-        from schools.models import Standard
-
-        teacher_standard = get_object_or_404(Standard, id=class_id)
-
         # Get terms that have reports for this standard
         available_terms = Term.objects.filter(
             year__school=school,
             student_reviews__student__standard_enrollments__standard=teacher_standard,
-            student_reviews__student__standard_enrollments__year__id=year_id
+            student_reviews__student__standard_enrollments__year=ctx.year
         ).distinct().order_by('year__start_year', 'term_number')
 
-    elif user_profile.user_type in ['principal', 'administration']:
+    else:
         # Principals and admins see all terms with reports
         available_terms = Term.objects.filter(
             year__school=school,
             student_reviews__isnull=False
         ).distinct().order_by('year__start_year', 'term_number')
-    else:
-        messages.error(request, "Access denied.")
-        return redirect('core:home')
 
     # Build data for table display
     terms_with_data = []
@@ -1483,44 +1223,31 @@ def report_list(request, school_slug):
     })
 
 @login_required
+@school_staff_required(['teacher', 'principal', 'administration'])
 def term_class_report_list(request, school_slug, term_id, class_id):
     """
     View to list all reports for a specific term and class
     """
     # Get the school, term, and class
-    school = get_object_or_404(School, slug=school_slug)
+    ctx = request.school_ctx
+    school = ctx.school
     term = get_object_or_404(Term, id=term_id, year__school=school)
-    from schools.models import Standard
     standard = get_object_or_404(Standard, id=class_id, school=school)
 
-    # Check user permissions
-    if not hasattr(request.user, 'profile'):
-        messages.error(request, "Access denied.")
-        return redirect('core:home')
-
-    user_profile = request.user.profile
-
-    # Base queryset
-    reports = StudentTermReview.objects.filter(term=term).select_related('student').order_by('student__last_name', 'student__first_name')
+    user_profile = ctx.profile
 
     # Check permissions based on user type
     if user_profile.user_type == 'teacher':
         # Teachers can only see reports for their assigned class
-        teacher_class_id, _, _ = get_teacher_class_from_session(request)
-
-        if not teacher_class_id:
+        if not ctx.teacher_standard:
             messages.error(request, "You are not assigned to any class.")
             return redirect('core:home')
 
         # Verify teacher is accessing their own class
-        if teacher_class_id != class_id:
+        if ctx.teacher_standard.id != class_id:
             messages.error(request, "You can only view reports for your assigned class.")
             return redirect('core:home')
 
-    elif user_profile.user_type not in ['principal', 'administration']:
-        messages.error(request, "Access denied.")
-        return redirect('core:home')
-
     # Filter reports to only students in the specified class for this term
     reports = StudentTermReview.objects.filter(
         term=term,
@@ -1546,56 +1273,97 @@ def term_class_report_list(request, school_slug, term_id, class_id):
     })
 
 @login_required
-def report_detail(request, school_slug, report_id):
+@school_staff_required(['teacher', 'principal', 'administration'])
+def class_broadsheet(request, school_slug, term_id, class_id):
     """
-    View to show detailed term report for a student
+    Class broadsheet for a term: every student against every subject with
+    term assessment, exam, total, average, grade and position.
+    Rendered as HTML, or as CSV, XLSX or PDF with ?format=.
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
+    ctx = request.school_ctx
+    school = ctx.school
+    term = get_object_or_404(Term.objects.select_related('year'), id=term_id, year__school=school)
+    standard = get_object_or_404(Standard, id=class_id, school=school)
 
-    # Check user permissions
-    if not hasattr(request.user, 'profile'):
-        messages.error(request, "Access denied.")
-        return redirect('core:home')
+    # Teachers can only see the broadsheet of their assigned class
+    if ctx.role == 'teacher':
+        if not ctx.teacher_standard:
+            messages.error(request, "You are not assigned to any class.")
+            return redirect('core:home')
+        if ctx.teacher_standard.id != class_id:
+            messages.error(request, "You can only view reports for your assigned class.")
+            return redirect('core:home')
+
+    broadsheet = get_broadsheet(term, standard)
+    filename = broadsheet_filename(school_slug, term, standard)
+    file_format = request.GET.get('format')
+
+    if file_format in ('csv', 'xlsx'):
+        header, rows = broadsheet_table(broadsheet)
+        return export_response(filename, header, rows, file_format)
+
+    context = {
+        'broadsheet': broadsheet,
+        'term': term,
+        'standard': standard,
+        'school': school,
+        'school_slug': school_slug,
+    }
 
-    user_profile = request.user.profile
+    if file_format == 'pdf':
+        if not WEASYPRINT_AVAILABLE:
+            messages.error(request, "PDF generation is not available. WeasyPrint library is not installed.")
+            return redirect('reports:class_broadsheet', school_slug=school_slug, term_id=term.id, class_id=standard.id)
+
+        html_content = render_to_string('reports/broadsheet_pdf.html', context, request=request)
+        pdf_content = weasyprint.HTML(
+            string=html_content,
+            base_url=request.build_absolute_uri()
+        ).write_pdf(presentational_hints=True)
+        response = HttpResponse(pdf_content, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.pdf"'
+        return response
+
+    return render(request, 'reports/broadsheet.html', context)
+
+@login_required
+@school_staff_required(['teacher', 'principal', 'administration'])
+def report_detail(request, school_slug, report_id):
+    """
+    View to show detailed term report for a student
+    """
+    ctx = request.school_ctx
+    school = ctx.school
+    user_profile = ctx.profile
 
     # Get the report
-    report = get_object_or_404(StudentTermReview, id=report_id)
+    report = get_object_or_404(StudentTermReview.objects.select_related('student', 'term__year'), id=report_id)
 
     # Verify school access
-    if report.term.year.school != school:
+    if report.term.year.school_id != school.id:
         messages.error(request, "Report not found in this school.")
         return redirect('core:home')
 
+    # Get the student's current enrollment to determine their class
+    from core.utils import get_current_student_enrollment
+    current_enrollment = get_current_student_enrollment(report.student, report.term.year)
+
     # Check permissions based on user type
     if user_profile.user_type == 'teacher':
         # Teachers can only view reports for their assigned class
-        class_id, class_name, year_id = get_teacher_class_from_session(request)
-
-        if not class_id:
+        if not ctx.teacher_standard:
             messages.error(request, "You are not assigned to any class.")
             return redirect('core:home')
 
         # Check if this student is in teacher's class
-        from core.utils import get_current_student_enrollment
-        current_enrollment = get_current_student_enrollment(report.student, report.term.year)
-
-        if not current_enrollment or current_enrollment.standard.id != class_id:
+        if not current_enrollment or current_enrollment.standard_id != ctx.teacher_standard.id:
             messages.error(request, "You can only view reports for students in your assigned class.")
             return redirect('reports:report_list', school_slug=school_slug)
 
-    elif user_profile.user_type not in ['principal', 'administration']:
-        messages.error(request, "Access denied.")
-        return redirect('core:home')
-
     # Get subject scores for this report
     subject_scores = report.subject_scores.all().select_related('standard_subject').order_by('standard_subject__subject_name')
 
     # Get previous and next students for navigation
-    # Get the student's current enrollment to determine their class
-    from core.utils import get_current_student_enrollment
-    current_enrollment = get_current_student_enrollment(report.student, report.term.year)
 
     if current_enrollment:
         # Get all reports for the same term and class, ordered by student last name, first name
@@ -1658,28 +1426,18 @@ def report_detail(request, school_slug, report_id):
     })
 
 @login_required
+@school_staff_required(['teacher', 'principal', 'administration'])
 def generate_blank_reports(request, school_slug):
     """
     View to generate blank reports for a term and standard
     Only accessible by teachers, principals, and admins
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check user permissions
-    if not hasattr(request.user, 'profile'):
-        messages.error(request, "Access denied.")
-        return redirect('core:home')
-
-    user_profile = request.user.profile
-
-    if user_profile.user_type not in ['teacher', 'principal', 'administration']:
-        messages.error(request, "Access denied.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    user_profile = ctx.profile
 
     # Get current year and available terms
-    from core.utils import get_current_year_and_term
-    current_year, current_term, vacation_status = get_current_year_and_term(school=school)
+    current_year = ctx.year
 
     if not current_year:
         messages.error(request, "No academic year set up for this school.")
@@ -1690,21 +1448,13 @@ def generate_blank_reports(request, school_slug):
     # Get available standards based on user type
     if user_profile.user_type == 'teacher':
         # Teachers can only generate for their assigned class
-        class_id, class_name, year_id = get_teacher_class_from_session(request)
-
-        if not class_id:
+        if not ctx.teacher_standard:
             messages.error(request, "You are not assigned to any class.")
             return redirect('core:home')
 
-        try:
-            from schools.models import Standard
-            available_standards = [Standard.objects.get(id=class_id)]
-        except Standard.DoesNotExist:
-            messages.error(request, "Invalid class assignment.")
-            return redirect('core:home')
+        available_standards = [ctx.teacher_standard]
     else:
         # Principals and admins can generate for any class in their school
-        from schools.models import Standard
         available_standards = Standard.objects.filter(school=school).order_by('name')
 
     if request.method == 'POST':
@@ -1749,25 +1499,20 @@ def generate_blank_reports(request, school_slug):
     })
 
 @login_required
+@school_staff_required(['teacher', 'principal', 'administration'])
 def report_edit(request, school_slug, report_id):
     """
     View to edit a term report (attendance, behavioral ratings, remarks)
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check user permissions
-    if not hasattr(request.user, 'profile'):
-        messages.error(request, "Access denied.")
-        return redirect('core:home')
-
-    user_profile = request.user.profile
+    ctx = request.school_ctx
+    school = ctx.school
+    user_profile = ctx.profile
 
     # Get the report
-    report = get_object_or_404(StudentTermReview, id=report_id)
+    report = get_object_or_404(StudentTermReview.objects.select_related('student', 'term__year'), id=report_id)
 
     # Verify school access
-    if report.term.year.school != school:
+    if report.term.year.school_id != school.id:
         messages.error(request, "Report not found in this school.")
         return redirect('core:home')
 
@@ -1778,11 +1523,10 @@ def report_edit(request, school_slug, report_id):
     # Check permissions based on user type
     if user_profile.user_type == 'teacher':
         # Teachers can only edit reports for their assigned class
-        class_id, _, _ = get_teacher_class_from_session(request)
-
-        if not class_id:
+        if not ctx.teacher_standard:
             messages.error(request, "You are not assigned to any class.")
             return redirect('core:home')
+        class_id = ctx.teacher_standard.id
 
         # Check if this student is in teacher's class
         if not current_enrollment or current_enrollment.standard.id != class_id:
@@ -1851,16 +1595,17 @@ def download_report_pdf(request, school_slug, report_id):
     Download a pre-generated PDF for a single student report
     """
     # Get the report and related objects
-    report = get_object_or_404(StudentTermReview, id=report_id)
-    school = get_object_or_404(School, slug=school_slug)
+    ctx = request.school_ctx
+    report = get_object_or_404(StudentTermReview.objects.select_related('student', 'term__year'), id=report_id)
+    school = ctx.school
 
     # Verify the report belongs to this school
-    if report.term.year.school != school:
+    if report.term.year.school_id != school.id:
         messages.error(request, "Report not found for this school.")
         return redirect('core:home')
 
     # Check permissions - teachers can only access their own class reports
-    user_profile = request.user.profile
+    user_profile = ctx.profile
     if user_profile.user_type == 'teacher':
         # Get current enrollment to check if this student is in teacher's class
         current_enrollment = StandardEnrollment.objects.filter(
@@ -1874,9 +1619,8 @@ def download_report_pdf(request, school_slug, report_id):
             return redirect('core:home')
 
         # Check if teacher is assigned to this standard
-        from core.utils import get_current_teacher_assignment
         teacher_assignment = get_current_teacher_assignment(user_profile, report.term.year)
-        if not teacher_assignment or teacher_assignment.standard != current_enrollment.standard:
+        if not teacher_assignment or teacher_assignment.standard_id != current_enrollment.standard_id:
             messages.error(request, "You don't have permission to access this report.")
             return redirect('core:home')
 
@@ -1911,35 +1655,26 @@ def download_report_pdf(request, school_slug, report_id):
 
 
 @login_required
+@school_staff_required(['teacher', 'principal', 'administration'])
 def bulk_generate_class_reports_pdf(request, school_slug, term_id, class_id):
     """
     Download pre-generated ZIP file containing all class reports
     """
     # Get the school, term, and class
-    school = get_object_or_404(School, slug=school_slug)
+    ctx = request.school_ctx
+    school = ctx.school
     term = get_object_or_404(Term, id=term_id, year__school=school)
     standard = get_object_or_404(Standard, id=class_id, school=school)
 
-    # Check user permissions
-    if not hasattr(request.user, 'profile'):
-        messages.error(request, "Access denied.")
-        return redirect('core:home')
-
-    user_profile = request.user.profile
+    user_profile = ctx.profile
 
     # Check permissions based on user type
     if user_profile.user_type == 'teacher':
         # Teachers can only generate reports for their assigned class
-        class_id_session, class_name, _ = get_teacher_class_from_session(request)
-
-        if not class_id_session or class_id_session != class_id:
+        if not ctx.teacher_standard or ctx.teacher_standard.id != class_id:
             messages.error(request, "You can only generate reports for your assigned class.")
             return redirect('core:home')
 
-    elif user_profile.user_type not in ['principal', 'administration']:
-        messages.error(request, "Access denied.")
-        return redirect('core:home')
-
     # Get all reports for this term and class
     reports = StudentTermReview.objects.filter(
         term=term,
@@ -2001,39 +1736,29 @@ def bulk_generate_class_reports_pdf(request, school_slug, term_id, class_id):
 
 
 @login_required
+@school_staff_required(
+    'teacher',
+    role_message="Only teachers can finalize reports.",
+    staff_message="You don't have permission to finalize reports for this school."
+)
 def finalize_class_reports(request, school_slug, term_id, class_id):
     """
     View to finalize all reports for a class/term and generate PDFs
     """
-    # Get the school
-    school = get_object_or_404(School, slug=school_slug)
-
-    # Check if user is a teacher
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'teacher':
-        messages.error(request, "Only teachers can finalize reports.")
-        return redirect('core:home')
-
-    teacher = request.user.profile
-
-    # Verify teacher belongs to this school using SchoolStaff
-    school_staff = SchoolStaff.objects.filter(
-        staff=teacher,
-        school=school,
-        is_active=True
-    ).first()
-
-    if not school_staff:
-        messages.error(request, "You don't have permission to finalize reports for this school.")
-        return redirect('core:home')
+    ctx = request.school_ctx
+    school = ctx.school
+    teacher = ctx.profile
 
     # Get the term and standard
-    term = get_object_or_404(Term, id=term_id, year__school=school)
+    term = get_object_or_404(Term.objects.select_related('year'), id=term_id, year__school=school)
     standard = get_object_or_404(Standard, id=class_id)
 
     # Verify teacher is assigned to this standard
-    from core.utils import get_current_teacher_assignment
-    teacher_assignment = get_current_teacher_assignment(teacher, term.year)
-    if not teacher_assignment or teacher_assignment.standard != standard:
+    if term.year_id == getattr(ctx.year, 'id', None):
+        teacher_assignment = ctx.teacher_assignment
+    else:
+        teacher_assignment = get_current_teacher_assignment(teacher, term.year)
+    if not teacher_assignment or teacher_assignment.standard_id != standard.id:
         messages.error(request, "You don't have permission to finalize reports for this class.")
         return redirect('core:home')
 
@@ -2068,9 +1793,12 @@ def finalize_class_reports(request, school_slug, term_id, class_id):
                            school_slug=school_slug, term_id=term_id, class_id=class_id)
 
         # Finalize all reports
-        success_count, error_count, error_messages, term_finalized = StudentTermReview.finalize_class_reports(
-            term, standard, teacher
-        )
+        with transaction.atomic(), audit_changeset(
+            request.user, f"Reports finalized for {standard.get_name_display()}, {term}", school=school
+        ):
+            success_count, error_count, error_messages, term_finalized = StudentTermReview.finalize_class_reports(
+                term, standard, teacher
+            )
 
         if success_count > 0:
             # Create activity stream entry
@@ -2118,6 +1846,134 @@ def finalize_class_reports(request, school_slug, term_id, class_id):
     })
 
 
+@login_required
+@school_staff_required(['teacher', 'principal', 'administration'])
+def export_test_scores(request, school_slug):
+    """
+    Stream test scores as CSV (or XLSX with ?format=xlsx), optionally for
+    ?term=<id> or ?test=<id>. Teachers export the scores of their own tests.
+    """
+    ctx = request.school_ctx
+    school = ctx.school
+
+    term = get_filter_object(request, 'term', Term.objects.filter(year__school=school))
+    test = get_filter_object(request, 'test', Test.objects.filter(standard__school=school))
+
+    created_by = ctx.profile if ctx.role == 'teacher' else None
+    if created_by and test and test.created_by != created_by:
+        return HttpResponseForbidden("You don't have permission to view this test.")
+
+    header, rows = test_score_rows(school, created_by=created_by, term=term, test=test)
+    filename = f"{school_slug}-test-scores"
+    if test:
+        filename += f"-test-{test.id}"
+    elif term:
+        filename += f"-{term.year.start_year}-term-{term.term_number}"
+    return export_response(filename, header, rows, get_export_format(request))
+
+
+@login_required
+@school_staff_required(['teacher', 'principal', 'administration'])
+def export_term_reviews(request, school_slug):
+    """
+    Stream term reviews with their subject scores as CSV (or XLSX with
+    ?format=xlsx), optionally for ?term=<id> and ?class=<id>. Teachers
+    export their current class for the current year only.
+    """
+    ctx = request.school_ctx
+    school = ctx.school
+
+    term = get_filter_object(request, 'term', Term.objects.filter(year__school=school))
+    standard = year = None
+
+    if ctx.role == 'teacher':
+        # Teachers can only see reports for their assigned class
+        standard = ctx.teacher_standard
+        if not standard:
+            messages.error(request, "You are not assigned to any class.")
+            return redirect('core:home')
+        year = ctx.year
+    else:
+        standard = get_filter_object(request, 'class', Standard.objects.filter(school=school))
+
+    header, rows = term_review_rows(school, standard=standard, year=year, term=term)
+    filename = f"{school_slug}-term-reviews"
+    if term:
+        filename += f"-{term.year.start_year}-term-{term.term_number}"
+    if standard:
+        filename += f"-{standard.name.lower()}-{standard.group_number}"
+    return export_response(filename, header, rows, get_export_format(request))
+
+
+@login_required
+@school_staff_required(['teacher', 'principal', 'administration'])
+def report_search(request, school_slug):
+    """
+    Full-text search over term report remarks and test descriptions, best
+    matches first, filtered by ?kind=, ?term=, ?class= and ?teacher=.
+    Teachers search this year's reports of their current class and their
+    own tests of this year.
+    """
+    ctx = request.school_ctx
+    school = ctx.school
+
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('kind') if request.GET.get('kind') in ('review', 'test') else None
+    terms = Term.objects.filter(year__school=school)
+    if ctx.role == 'teacher':
+        terms = terms.filter(year=ctx.year)
+    term = get_filter_object(request, 'term', terms)
+    standard = teacher = None
+
+    if ctx.role != 'teacher':
+        standard = get_filter_object(request, 'class', Standard.objects.filter(school=school))
+        teacher = get_filter_object(request, 'teacher', UserProfile.objects.filter(
+            school_employment__school=school, user_type='teacher'
+        ).distinct())
+
+    documents = search_documents(school, query, kind=kind, term=term, standard=standard, teacher=teacher)
+    if ctx.role == 'teacher':
+        # This year's reports of their current class (if any) and their own tests
+        visible = Q(kind='test', teacher=ctx.profile)
+        if ctx.teacher_standard:
+            visible |= Q(kind='review', standard=ctx.teacher_standard)
+        documents = documents.filter(visible, term__year=ctx.year) if ctx.year else documents.none()
+    documents = documents.select_related('term__year', 'standard', 'teacher__user')
+
+    page_obj = Paginator(documents, SEARCH_RESULTS_PER_PAGE).get_page(request.GET.get('page'))
+    for document in page_obj:
+        document.class_name = class_name(document.standard.name, document.standard.group_number) if document.standard else None
+        if document.kind == 'review':
+            document.url = reverse('reports:report_detail', kwargs={'school_slug': school_slug, 'report_id': document.object_id})
+        elif document.teacher_id == ctx.profile.id:
+            document.url = reverse('reports:test_detail', kwargs={'school_slug': school_slug, 'test_id': document.object_id})
+
+    params = request.GET.copy()
+    params.pop('page', None)
+
+    context = {
+        'school': school,
+        'school_slug': school_slug,
+        'query': query,
+        'kind': kind,
+        'selected_term': term,
+        'selected_standard': standard,
+        'selected_teacher': teacher,
+        'page_obj': page_obj,
+        'filter_params': params.urlencode(),
+        'terms': terms.select_related('year').order_by('-year__start_year', '-term_number'),
+    }
+    if ctx.role != 'teacher':
+        context['standards'] = [
+            (standard.id, class_name(standard.name, standard.group_number))
+            for standard in Standard.objects.filter(school=school).order_by('name', 'group_number')
+        ]
+        context['teachers'] = UserProfile.objects.filter(
+            school_employment__school=school, school_employment__is_active=True, user_type='teacher'
+        ).select_related('user').order_by('user__first_name', 'user__last_name').distinct()
+    return render(request, 'reports/report_search.html', context)
+
+
 def generate_class_report_pdfs(reports, school, school_slug, request):
     """
     Generate PDF files for a queryset of finalized reports
@@ -3,6 +3,7 @@ Base Django settings for school_report project.
 Contains settings common to all environments.
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,8 +39,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'auditlog.middleware.AuditlogMiddleware',  # Automatic audit logging
-    'core.middleware.PasswordChangeMiddleware',
-    'core.middleware.IdleTimeoutMiddleware',
+    'core.middleware.AuthContextMiddleware',  # Password change, idle timeout, session snapshot
+    'core.middleware.SchoolContextMiddleware',  # request.school_ctx for school views
 ]
 
 ROOT_URLCONF = 'school_report.urls'
@@ -102,13 +103,61 @@ LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'  # This will be handled by HomeView which redirects to school dashboard
 LOGOUT_REDIRECT_URL = '/'
 
+# Users are loaded with their profile and active school membership in one query.
+# ModelBackend stays listed so sessions created before the switch remain valid.
+AUTHENTICATION_BACKENDS = [
+    'core.auth_backends.StaffContextBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Session settings
 SESSION_COOKIE_AGE = 30 * 24 * 60 * 60  # 30 days (only applies when "Remember me" is checked)
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True  # Default behavior when "Remember me" is NOT checked
 
+# SESSION_BACKEND selects where sessions are stored:
+#   'db'             - database table (default)
+#   'cache'          - the default cache only; needs a shared, persistent cache (e.g. Redis)
+#   'cached_db'      - the default cache, written through to the database
+#   'signed_cookies' - signed cookie in the browser, no server-side storage
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('SESSION_BACKEND', 'db')]
+
+# Cache configuration
+# CACHE_BACKEND selects the backend used by core.cache:
+#   'locmem' - per-process memory (default; fine for a single worker)
+#   'file'   - shared directory, CACHE_LOCATION is the path
+#   'db'     - database table, run `python manage.py createcachetable` first
+CACHE_BACKEND_CLASSES = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+}
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': 'school-report',
+    'file': str(BASE_DIR / 'cache'),
+    'db': 'school_report_cache',
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND_CLASSES[CACHE_BACKEND],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_DEFAULT_LOCATIONS[CACHE_BACKEND]),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 60 * 60)),  # 1 hour
+        'KEY_PREFIX': 'school_report',
+    }
+}
+
 # Idle timeout settings (in seconds)
 IDLE_TIMEOUT_MINUTES = 30  # 30 minutes of inactivity
 IDLE_TIMEOUT_SECONDS = IDLE_TIMEOUT_MINUTES * 60
+# Only re-save the session's last activity time once it is this many seconds old
+# (see `python manage.py benchmark_session_writes`)
+IDLE_ACTIVITY_GRANULARITY_SECONDS = int(os.environ.get('IDLE_ACTIVITY_GRANULARITY', 60))
 
 # ============================================================================
 # AUDIT LOGGING & ACTIVITY TRACKING SETTINGS
@@ -128,3 +177,25 @@ ACTSTREAM_SETTINGS = {
     'USE_JSONFIELD': True,
     'GFK_FETCH_DEPTH': 1,
 }
+
+# Activity stream entries are buffered per transaction and bulk inserted on
+# commit (core/activity_buffer.py). Set to true to do the insert in a
+# background thread instead of the request thread.
+ACTIVITY_STREAM_BACKGROUND_FLUSH = os.environ.get('ACTIVITY_STREAM_BACKGROUND_FLUSH', 'False').lower() == 'true'
+
+# Where `manage.py archive_audit` moves old audit log and activity stream rows
+# (core/audit_archive.py)
+AUDIT_ARCHIVE_ROOT = os.environ.get('AUDIT_ARCHIVE_ROOT', str(BASE_DIR / 'audit_archives'))
+
+# Student CSV imports are processed in a background thread, a chunk of rows
+# per transaction (schools/student_import.py). Set STUDENT_IMPORT_BACKGROUND
+# to false to process uploads in the request instead.
+STUDENT_IMPORT_BACKGROUND = os.environ.get('STUDENT_IMPORT_BACKGROUND', 'True').lower() == 'true'
+STUDENT_IMPORT_CHUNK_SIZE = int(os.environ.get('STUDENT_IMPORT_CHUNK_SIZE', 500))
+# `manage.py resume_student_imports` only takes over imports that have made no
+# progress for this long, so it never runs one alongside its live worker
+STUDENT_IMPORT_STALE_MINUTES = int(os.environ.get('STUDENT_IMPORT_STALE_MINUTES', 10))
+
+# CSV/XLSX exports read their querysets in chunks of this many rows
+# (core/exports.py)
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
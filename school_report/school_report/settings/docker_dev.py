@@ -99,9 +99,7 @@ CACHES = {
     }
 }
 
-# Session configuration (optional: use Redis for sessions)
-# SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
-# SESSION_CACHE_ALIAS = 'default'
+# Session configuration (optional: set SESSION_BACKEND=cache to use Redis for sessions)
 
 # Development-specific security settings
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'dev-secret-key-change-in-production-2024')
@@ -62,6 +62,15 @@ EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = True
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL')
 
+# Cache: share the cache between worker processes so invalidation reaches
+# all of them. Uses the database cache table unless CACHE_BACKEND is set
+# (the build scripts run `python manage.py createcachetable` after migrating).
+if 'CACHE_BACKEND' not in os.environ:
+    CACHES['default'].update({
+        'BACKEND': CACHE_BACKEND_CLASSES['db'],
+        'LOCATION': CACHE_DEFAULT_LOCATIONS['db'],
+    })
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import School, Standard, Student
+from .models import School, Standard, Student, ImportRun
 from academics.models import SchoolStaff
 
 
@@ -76,6 +76,21 @@ class StudentAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    list_display = ('file_name', link_to_school, 'standard', 'year', 'status', 'processed_rows', 'created_count', 'duplicate_count', 'error_count', 'warning_count', 'created_at')
+    list_filter = ('status', 'school', 'created_at')
+    search_fields = ('file_name', 'school__name')
+    ordering = ('-created_at',)
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(SchoolStaff)
 class SchoolStaffAdmin(admin.ModelAdmin):
     list_display = ('staff', link_to_school, 'position', 'hire_date', 'is_active', 'created_at', 'updated_at')
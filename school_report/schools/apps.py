@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class SchoolsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'schools'
+
+    def ready(self):
+        from .student_search import STUDENT_FTS
+        post_migrate.connect(STUDENT_FTS.ensure_triggers, sender=self)
@@ -2,9 +2,10 @@ from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
-from .models import School, Standard, Student
+from .models import School
+from .metrics import get_dashboard_metrics
 from academics.models import SchoolStaff
-from core.utils import get_current_year_and_term
+from core.utils import get_cached_roster_summary
 
 class SchoolDashboardView(LoginRequiredMixin, TemplateView):
     """
@@ -36,31 +37,11 @@ class SchoolDashboardView(LoginRequiredMixin, TemplateView):
         # Add the school slug to the context for URL generation
         context['school_slug'] = self.school.slug
 
-        # Get current school year
-        current_year, current_term, is_on_vacation = get_current_year_and_term(school=self.school)
+        # Counts and report progress come from the cached metrics service
+        metrics = get_dashboard_metrics(self.school)
+        context.update(metrics)
 
-        # Count teachers and admin staff through SchoolStaff
-        teacher_count = SchoolStaff.objects.filter(
-            school=self.school,
-            staff__user_type='teacher',
-            is_active=True
-        ).count()
-
-        admin_staff_count = SchoolStaff.objects.filter(
-            school=self.school,
-            staff__user_type__in=['principal', 'administration'],
-            is_active=True
-        ).count()
-        # Count students through StudentEnrollment
-        student_count = Student.objects.filter(
-            standard_enrollments__year=current_year,
-            standard_enrollments__standard__school=self.school
-        ).distinct().count()
-
-
-        context['teacher_count'] = teacher_count
-        context['admin_staff_count'] = admin_staff_count
-        context['student_count'] = student_count
-        context['current_year'] = current_year
+        # Class list with current teacher and student count (one cached query)
+        context['class_roster'] = get_cached_roster_summary(self.school, metrics['current_year'])
 
         return context
@@ -0,0 +1,87 @@
+"""
+Rows for the student roster and enrollment history exports (see core/exports.py).
+
+Each function returns (header, rows) where rows is a generator reading a
+values_list() queryset with iterator(chunk_size=EXPORT_CHUNK_SIZE).
+"""
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from .models import Standard
+
+_STANDARD_LABELS = dict(Standard.STANDARD_CHOICES)
+
+
+def class_name(name, group_number):
+    """'Infant 1 - 2' for a standard's name and group (the teacher-less Standard.get_display_name())"""
+    if not name:
+        return 'Unassigned'
+    return f"{_STANDARD_LABELS.get(name, name)} - {group_number}"
+
+
+def roster_rows(school, year, standard=None):
+    """
+    The students whose current (latest) class assignment in `year` is at
+    `school`, or in `standard` only, ordered by class and name.
+    """
+    from academics.models import SchoolEnrollment
+    from core.utils import get_current_enrollments
+
+    header = [
+        'Student ID', 'First Name', 'Last Name', 'Date of Birth', 'Parent/Guardian',
+        'Contact Phone', 'Contact Email', 'Class', 'Registered On', 'Assigned to Class',
+    ]
+
+    registration_date = SchoolEnrollment.objects.filter(
+        student=OuterRef('student'),
+        school=school,
+        is_active=True
+    ).order_by('-created_at').values('enrollment_date')[:1]
+
+    enrollments = get_current_enrollments(school, year, standard).annotate(
+        registered_on=Subquery(registration_date)
+    ).order_by(
+        'standard__name', 'standard__group_number', 'student__last_name', 'student__first_name', 'student_id'
+    ).values_list(
+        'student_id', 'student__first_name', 'student__last_name', 'student__date_of_birth',
+        'student__parent_name', 'student__contact_phone', 'student__contact_email',
+        'standard__name', 'standard__group_number', 'registered_on', 'created_at'
+    )
+
+    def rows():
+        for (student_id, first_name, last_name, dob, parent_name, phone, email,
+             standard_name, group_number, registered_on, assigned_at) in enrollments.iterator(
+                chunk_size=settings.EXPORT_CHUNK_SIZE):
+            yield (student_id, first_name, last_name, dob, parent_name, phone, email,
+                   class_name(standard_name, group_number), registered_on, assigned_at)
+
+    return header, rows()
+
+
+def enrollment_history_rows(school):
+    """Every class assignment record of every school year of `school`, oldest year first"""
+    from academics.models import StandardEnrollment
+
+    header = [
+        'Academic Year', 'Student ID', 'First Name', 'Last Name', 'Class', 'Recorded At',
+        'Recorded By',
+    ]
+
+    enrollments = StandardEnrollment.objects.filter(
+        year__school=school
+    ).order_by(
+        'year__start_year', 'student__last_name', 'student__first_name', 'student_id', 'created_at', 'id'
+    ).values_list(
+        'year__start_year', 'student_id', 'student__first_name', 'student__last_name',
+        'standard__name', 'standard__group_number', 'created_at',
+        'enrolled_by__user__first_name', 'enrolled_by__user__last_name'
+    )
+
+    def rows():
+        for (start_year, student_id, first_name, last_name, standard_name, group_number, created_at,
+             by_first_name, by_last_name) in enrollments.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+            recorded_by = ' '.join(part for part in (by_first_name, by_last_name) if part)
+            yield (f"{start_year}-{start_year + 1}", student_id, first_name, last_name,
+                   class_name(standard_name, group_number), created_at, recorded_by)
+
+    return header, rows()
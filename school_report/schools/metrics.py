@@ -0,0 +1,95 @@
+"""
+Dashboard metrics for a school.
+
+All counts are gathered in a single query (one scalar subquery per metric)
+and cached per school year until the underlying data changes (see core/cache_signals.py).
+"""
+from django.db.models import IntegerField, Q, Subquery
+
+from .models import School
+
+
+class SubqueryCount(Subquery):
+    """COUNT(*) over an arbitrary queryset, usable as an annotation."""
+    template = "(SELECT COUNT(*) FROM (%(subquery)s) _count)"
+    output_field = IntegerField()
+
+
+def _compute_dashboard_metrics(school, current_year, current_term):
+    from academics.models import SchoolStaff, StandardEnrollment
+    from reports.models import StudentTermReview
+
+    active_staff = SchoolStaff.objects.filter(school=school, is_active=True)
+
+    annotations = {
+        'teacher_count': SubqueryCount(
+            active_staff.filter(staff__user_type='teacher').values('id')
+        ),
+        'admin_staff_count': SubqueryCount(
+            active_staff.filter(staff__user_type__in=['principal', 'administration']).values('id')
+        ),
+        # Students with an enrollment in one of the school's classes this year
+        'student_count': SubqueryCount(
+            StandardEnrollment.objects.filter(
+                year=current_year,
+                standard__school=school
+            ).values('student_id').distinct()
+        ),
+    }
+
+    if current_term:
+        term_reviews = StudentTermReview.objects.filter(
+            term__year=current_year,
+            term__term_number=current_term
+        )
+        annotations.update({
+            'reports_total': SubqueryCount(term_reviews.values('id')),
+            # A report counts as completed once the teacher has written remarks
+            'reports_completed': SubqueryCount(
+                term_reviews.exclude(Q(remarks='') | Q(remarks__isnull=True)).values('id')
+            ),
+            'reports_finalized': SubqueryCount(term_reviews.filter(is_finalized=True).values('id')),
+        })
+
+    metrics = School.objects.filter(pk=school.pk).annotate(**annotations).values(*annotations).first()
+
+    if current_term:
+        total = metrics['reports_total']
+        metrics['reports_completed_percentage'] = int(metrics['reports_completed'] * 100 / total) if total else 0
+        metrics['reports_finalized_percentage'] = int(metrics['reports_finalized'] * 100 / total) if total else 0
+
+    return metrics
+
+
+def get_dashboard_metrics(school):
+    """
+    Get staff, student and current-term report metrics for a school dashboard.
+
+    Returns a dict with teacher_count, admin_staff_count, student_count and,
+    during a term, reports_total, reports_completed, reports_finalized and
+    their percentages. Also includes current_year, current_term and
+    vacation_status.
+    """
+    from core.cache import cached_for_year
+    from core.utils import get_cached_year_and_term
+
+    current_year, current_term, vacation_status = get_cached_year_and_term(school)
+
+    metrics = {}
+    if current_year:
+        metrics = cached_for_year(
+            school.id,
+            current_year.id,
+            f'dashboard_metrics:term{current_term}',
+            lambda: _compute_dashboard_metrics(school, current_year, current_term)
+        )
+
+    return {
+        'teacher_count': 0,
+        'admin_staff_count': 0,
+        'student_count': 0,
+        **metrics,
+        'current_year': current_year,
+        'current_term': current_term,
+        'vacation_status': vacation_status,
+    }
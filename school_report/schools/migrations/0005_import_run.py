@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-19 05:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_schoolenrollment_enrolled_by_schoolstaff_added_by_and_more'),
+        ('core', '0004_auditchangeset'),
+        ('schools', '0004_student_created_by'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='student_imports/%Y/%m/')),
+                ('file_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total_rows', models.PositiveIntegerField(blank=True, help_text='Data rows in the file, once counted', null=True)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('duplicate_count', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True, help_text='Why the import failed as a whole')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_runs', to='core.userprofile')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_runs', to='schools.school')),
+                ('standard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_runs', to='schools.standard')),
+                ('year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_runs', to='academics.schoolyear')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField(help_text='Line in the file, counting the header as row 1')),
+                ('status', models.CharField(choices=[('error', 'Error'), ('duplicate', 'Duplicate')], max_length=20)),
+                ('data', models.JSONField(default=dict, help_text='The row as read from the file')),
+                ('message', models.TextField(blank=True)),
+                ('same_school', models.BooleanField(default=False)),
+                ('already_enrolled', models.BooleanField(default=False)),
+                ('existing_school', models.ForeignKey(blank=True, help_text='School the existing student is registered at', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='schools.school')),
+                ('existing_student', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='schools.student')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='schools.importrun')),
+            ],
+            options={
+                'ordering': ['row_number'],
+                'indexes': [models.Index(fields=['run', 'status', 'row_number'], name='schools_importrow_run_status')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0005_import_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='identity_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='student_identity_key() of the names and date of birth, kept up to date on save', max_length=64),
+        ),
+    ]
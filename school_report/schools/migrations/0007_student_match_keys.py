@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-19 05:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0006_student_identity_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importrow',
+            name='imported_student',
+            field=models.ForeignKey(blank=True, help_text='The student created from this row (warnings)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='schools.student'),
+        ),
+        migrations.AddField(
+            model_name='importrun',
+            name='warning_count',
+            field=models.PositiveIntegerField(default=0, help_text='Imported rows that look like an existing student'),
+        ),
+        migrations.AlterField(
+            model_name='importrow',
+            name='status',
+            field=models.CharField(choices=[('error', 'Error'), ('duplicate', 'Duplicate'), ('warning', 'Possible duplicate')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='StudentMatchKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_keys', to='schools.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'student'], name='schools_matchkey_key')],
+                'unique_together': {('student', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+from django.db import migrations, OperationalError
+
+# The SQL of schools.student_search's indexes as of this migration, written
+# out so later changes to that module do not change what this migration does
+
+# PostgreSQL: trigram index on StudentSearchText()
+CREATE_TRIGRAM_INDEX = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX schools_student_search_trgm ON schools_student USING gin "
+    "((LOWER(first_name || ' ' || last_name || ' ' || parent_name || ' ' || COALESCE(contact_phone, ''))) "
+    "gin_trgm_ops)",
+]
+DROP_TRIGRAM_INDEX = [
+    "DROP INDEX IF EXISTS schools_student_search_trgm",
+]
+
+# SQLite: STUDENT_FTS, the FTS5 index and the triggers keeping it current
+CREATE_FTS = [
+    "CREATE VIRTUAL TABLE schools_student_fts USING fts5(first_name, last_name, parent_name, contact_phone, "
+    "content='schools_student', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER schools_student_fts_ai AFTER INSERT ON schools_student BEGIN "
+    "INSERT INTO schools_student_fts (rowid, first_name, last_name, parent_name, contact_phone) "
+    "VALUES (new.id, new.first_name, new.last_name, new.parent_name, new.contact_phone); END",
+    "CREATE TRIGGER schools_student_fts_ad AFTER DELETE ON schools_student BEGIN "
+    "INSERT INTO schools_student_fts (schools_student_fts, rowid, first_name, last_name, parent_name, contact_phone) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.parent_name, old.contact_phone); END",
+    "CREATE TRIGGER schools_student_fts_au AFTER UPDATE ON schools_student BEGIN "
+    "INSERT INTO schools_student_fts (schools_student_fts, rowid, first_name, last_name, parent_name, contact_phone) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.parent_name, old.contact_phone); "
+    "INSERT INTO schools_student_fts (rowid, first_name, last_name, parent_name, contact_phone) "
+    "VALUES (new.id, new.first_name, new.last_name, new.parent_name, new.contact_phone); END",
+    # Index the existing students
+    "INSERT INTO schools_student_fts (schools_student_fts) VALUES ('rebuild')",
+]
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS schools_student_fts_ai",
+    "DROP TRIGGER IF EXISTS schools_student_fts_ad",
+    "DROP TRIGGER IF EXISTS schools_student_fts_au",
+    "DROP TABLE IF EXISTS schools_student_fts",
+]
+
+
+def _execute(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def add_search_index(apps, schema_editor):
+    # The index depends on the database backend, so it is created here rather
+    # than through Student.Meta.indexes
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _execute(schema_editor, CREATE_TRIGRAM_INDEX)
+    elif vendor == 'sqlite':
+        try:
+            _execute(schema_editor, CREATE_FTS)
+        except OperationalError:
+            # SQLite built without FTS5: searches fall back to icontains
+            pass
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _execute(schema_editor, DROP_TRIGRAM_INDEX)
+    elif vendor == 'sqlite':
+        _execute(schema_editor, DROP_FTS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0007_student_match_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
@@ -0,0 +1,52 @@
+import hashlib
+import unicodedata
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+# Frozen copies of schools.models.normalize_identity_part() and
+# student_identity_key() as of this migration; later changes to those need
+# their own migration (or `backfill_student_identity_keys --all`).
+def normalize_identity_part(value):
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.casefold().split())
+
+
+def student_identity_key(first_name, last_name, date_of_birth, parent_name):
+    dob = date_of_birth.isoformat() if hasattr(date_of_birth, 'isoformat') else str(date_of_birth or '')
+    parts = [normalize_identity_part(first_name), normalize_identity_part(last_name), dob,
+             normalize_identity_part(parent_name)]
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
+
+
+def backfill_identity_keys(apps, schema_editor):
+    Student = apps.get_model('schools', 'Student')
+    students = Student.objects.using(schema_editor.connection.alias).filter(identity_key='').only(
+        'id', 'first_name', 'last_name', 'date_of_birth', 'parent_name'
+    ).order_by('pk')
+
+    last_pk = 0
+    while True:
+        batch = list(students.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for student in batch:
+            student.identity_key = student_identity_key(
+                student.first_name, student.last_name, student.date_of_birth, student.parent_name
+            )
+        Student.objects.using(schema_editor.connection.alias).bulk_update(batch, ['identity_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0008_student_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_identity_keys, migrations.RunPython.noop),
+    ]
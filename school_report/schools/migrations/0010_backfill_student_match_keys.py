@@ -0,0 +1,88 @@
+import unicodedata
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+
+# Frozen copies of schools.models.normalize_identity_part() and
+# schools.student_matching.soundex() / blocking_keys() as of this migration;
+# later changes to the keys need their own migration (or
+# `find_duplicate_students --rebuild-index`).
+def normalize_identity_part(value):
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.casefold().split())
+
+
+def soundex(name):
+    letters = [char for char in normalize_identity_part(name) if 'a' <= char <= 'z']
+    if not letters:
+        return ''
+
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], '')
+    for char in letters[1:]:
+        digit = _SOUNDEX_CODES.get(char, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if char not in 'hw':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def blocking_keys(first_name, last_name, date_of_birth):
+    first = normalize_identity_part(first_name)
+    last = normalize_identity_part(last_name)
+    keys = set()
+    if first and last:
+        keys.add(f'sx:{soundex(first)}:{soundex(last)}')
+        if date_of_birth:
+            keys.add(f'ib:{first[0]}{last[0]}:{date_of_birth.year}')
+    return keys
+
+
+def backfill_match_keys(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Student = apps.get_model('schools', 'Student')
+    StudentMatchKey = apps.get_model('schools', 'StudentMatchKey')
+    students = Student.objects.using(db_alias).filter(match_keys__isnull=True).only(
+        'id', 'first_name', 'last_name', 'date_of_birth'
+    ).order_by('pk')
+
+    last_pk = 0
+    while True:
+        batch = list(students.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        StudentMatchKey.objects.using(db_alias).bulk_create(
+            [
+                StudentMatchKey(student_id=student.pk, key=key)
+                for student in batch
+                for key in sorted(blocking_keys(student.first_name, student.last_name, student.date_of_birth))
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0009_backfill_student_identity_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_match_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0010_backfill_student_match_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importrun',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Saved with every chunk, so a running import that stops updating it was interrupted'),
+            preserve_default=False,
+        ),
+    ]
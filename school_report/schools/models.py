@@ -1,3 +1,6 @@
+import hashlib
+import unicodedata
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils.text import slugify
@@ -93,6 +96,25 @@ class Standard(models.Model):
     def __str__(self):
         return f"{self.school.name} - {self.get_display_name()}"
 
+def normalize_identity_part(value):
+    """Case-fold, strip accents and collapse whitespace"""
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.casefold().split())
+
+
+def student_identity_key(first_name, last_name, date_of_birth, parent_name):
+    """
+    The normalized identity used to detect duplicate students: a SHA-256 hash
+    of the case-folded, accent- and whitespace-normalized names and the date
+    of birth, so "José  Pérez" and "jose perez" match.
+    """
+    dob = date_of_birth.isoformat() if hasattr(date_of_birth, 'isoformat') else str(date_of_birth or '')
+    parts = [normalize_identity_part(first_name), normalize_identity_part(last_name), dob,
+             normalize_identity_part(parent_name)]
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
+
+
 class Student(models.Model):
     """
     Represents a student in the school system
@@ -107,20 +129,145 @@ class Student(models.Model):
     is_active = models.BooleanField(default=True)
     created_by = models.ForeignKey('core.UserProfile', on_delete=models.SET_NULL, null=True, blank=True,
                                   related_name='created_students', help_text="User who created this student record")
+    identity_key = models.CharField(max_length=64, blank=True, db_index=True, editable=False,
+                                    help_text="student_identity_key() of the names and date of birth, kept up to date on save")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Fields that make up identity_key
+    IDENTITY_FIELDS = ('first_name', 'last_name', 'date_of_birth', 'parent_name')
+
     class Meta:
         ordering = ['last_name', 'first_name']
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    def save(self, *args, **kwargs):
+        self.identity_key = self.compute_identity_key()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'identity_key' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'identity_key']
+        super().save(*args, **kwargs)
+
+    def compute_identity_key(self):
+        return student_identity_key(self.first_name, self.last_name, self.date_of_birth, self.parent_name)
+
+    def find_duplicates(self):
+        """Other students with the same identity key"""
+        return Student.objects.filter(identity_key=self.compute_identity_key()).exclude(pk=self.pk)
+
     def get_full_name(self):
         """Return the student's full name"""
         return f"{self.first_name} {self.last_name}"
 
 
+class StudentMatchKey(models.Model):
+    """
+    A blocking key of a student for fuzzy duplicate matching (see
+    schools/student_matching.py). Only students sharing a key are compared.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='match_keys')
+    key = models.CharField(max_length=64)
+
+    class Meta:
+        unique_together = ['student', 'key']
+        indexes = [
+            models.Index(fields=['key', 'student'], name='schools_matchkey_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.student_id})"
+
+
+class ImportRun(models.Model):
+    """
+    A student CSV import, processed in the background (see schools/student_import.py).
+    Rows that were not imported are kept as ImportRow records.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='import_runs')
+    standard = models.ForeignKey(Standard, on_delete=models.CASCADE, related_name='import_runs')
+    year = models.ForeignKey('academics.SchoolYear', on_delete=models.CASCADE, related_name='import_runs')
+    file = models.FileField(upload_to='student_imports/%Y/%m/')
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.PositiveIntegerField(null=True, blank=True, help_text="Data rows in the file, once counted")
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    duplicate_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    warning_count = models.PositiveIntegerField(default=0, help_text="Imported rows that look like an existing student")
+    error_message = models.TextField(blank=True, help_text="Why the import failed as a whole")
+    created_by = models.ForeignKey('core.UserProfile', on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='import_runs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, help_text="Saved with every chunk, so a running import "
+                                                                "that stops updating it was interrupted")
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.file_name} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+
+    @property
+    def percent_complete(self):
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, int(self.processed_rows * 100 / self.total_rows))
+
+
+class ImportRow(models.Model):
+    """
+    A CSV row of an ImportRun that needs attention: not imported because it was
+    invalid or a duplicate of an existing student, or imported with a warning
+    because it closely resembles an existing student
+    """
+    STATUS_CHOICES = [
+        ('error', 'Error'),
+        ('duplicate', 'Duplicate'),
+        ('warning', 'Possible duplicate'),
+    ]
+
+    run = models.ForeignKey(ImportRun, on_delete=models.CASCADE, related_name='rows')
+    row_number = models.PositiveIntegerField(help_text="Line in the file, counting the header as row 1")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    data = models.JSONField(default=dict, help_text="The row as read from the file")
+    message = models.TextField(blank=True)
+    existing_student = models.ForeignKey(Student, on_delete=models.SET_NULL, null=True, blank=True,
+                                         related_name='+')
+    existing_school = models.ForeignKey(School, on_delete=models.SET_NULL, null=True, blank=True,
+                                        related_name='+', help_text="School the existing student is registered at")
+    same_school = models.BooleanField(default=False)
+    already_enrolled = models.BooleanField(default=False)
+    imported_student = models.ForeignKey(Student, on_delete=models.SET_NULL, null=True, blank=True,
+                                         related_name='+', help_text="The student created from this row (warnings)")
+
+    class Meta:
+        ordering = ['row_number']
+        indexes = [
+            models.Index(fields=['run', 'status', 'row_number'], name='schools_importrow_run_status'),
+        ]
+
+    def __str__(self):
+        return f"Row {self.row_number}: {self.get_status_display()}"
+
+
 # Signal to create standard classes when a school is created
 @receiver(post_save, sender=School)
 def create_standard_classes(sender, instance, created, **kwargs):
@@ -137,4 +284,12 @@ def create_standard_classes(sender, instance, created, **kwargs):
                     school=instance,
                     name=standard_code,
                     group_number=group_number
-                )
\ No newline at end of file
+                )
+
+
+@receiver(post_save, sender=Student)
+def update_student_match_keys(sender, instance, raw=False, **kwargs):
+    """Keep the fuzzy matching keys of a student in step with their details"""
+    if not raw:
+        from .student_matching import index_students
+        index_students([instance])
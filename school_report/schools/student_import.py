@@ -0,0 +1,389 @@
+"""
+Student CSV import.
+
+An upload is saved as an ImportRun and processed by a background job
+(start_import). The job streams the stored file: it is decoded line by line
+and read in chunks of STUDENT_IMPORT_CHUNK_SIZE rows, so the whole file is
+never held in memory. Each chunk is imported in its own transaction:
+
+- the rows are validated and normalized
+- duplicates are resolved against the Student table with one query on the
+  indexed identity keys (plus one each for their school registrations and
+  class assignments)
+- the new students with their SchoolEnrollment and StandardEnrollment rows
+  are inserted with bulk_create
+- new students closely resembling an existing student (student_matching)
+  are imported with a warning
+- rejected and flagged rows are saved as ImportRow records and the run's
+  progress counters are updated
+
+Because a chunk and its progress commit together, an interrupted run can be
+resumed from the last committed chunk (`manage.py resume_student_imports`).
+A worker claims a run with a conditional update (claim_import) before
+processing it, and every chunk refreshes the run's updated_at, so a run is
+only taken over once it has stopped making progress.
+
+bulk_create sends no model signals, so the import records its own audit
+changesets, activity entry and cache invalidation.
+"""
+import codecs
+import csv
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ['first_name', 'last_name', 'date_of_birth', 'parent_name']
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y']
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def parse_student_row(row):
+    """
+    Validate and normalize one CSV row.
+
+    Returns a dict of Student field values; raises ValueError with a message
+    for the user if the row is invalid.
+    """
+    for field in REQUIRED_FIELDS:
+        if not row.get(field) or row.get(field).strip() == '':
+            raise ValueError(f"Missing required field: {field}")
+
+    date_str = row['date_of_birth'].strip()
+    date_of_birth = None
+    for date_format in DATE_FORMATS:
+        try:
+            date_of_birth = datetime.strptime(date_str, date_format).date()
+            break
+        except ValueError:
+            continue
+    if date_of_birth is None:
+        raise ValueError("Invalid date format. Accepted formats: YYYY-MM-DD or DD/MM/YYYY.")
+
+    return {
+        'first_name': row['first_name'].strip(),
+        'last_name': row['last_name'].strip(),
+        'date_of_birth': date_of_birth,
+        'parent_name': row['parent_name'].strip(),
+        'contact_phone': (row.get('contact_phone') or '').strip(),
+    }
+
+
+def row_identity_key(values):
+    """student_identity_key() of a parse_student_row() result"""
+    from .models import student_identity_key
+
+    return student_identity_key(values['first_name'], values['last_name'], values['date_of_birth'], values['parent_name'])
+
+
+def find_existing_students(keys):
+    """
+    Look up the students with any of the given identity keys, using the
+    indexed Student.identity_key.
+
+    Returns {key: Student}, with the student's active school registrations
+    (school selected) prefetched as `active_registrations`.
+    """
+    from academics.models import SchoolEnrollment
+    from .models import Student
+
+    if not keys:
+        return {}
+
+    candidates = Student.objects.filter(identity_key__in=keys).prefetch_related(
+        Prefetch(
+            'school_registrations',
+            queryset=SchoolEnrollment.objects.filter(is_active=True).select_related('school'),
+            to_attr='active_registrations'
+        )
+    )
+
+    existing = {}
+    for student in candidates:
+        existing.setdefault(student.identity_key, student)
+    return existing
+
+
+def read_rows(run):
+    """
+    Yield (row number, row dict) for the data rows of an import file,
+    decoding it incrementally. Row numbers count the header as row 1.
+    """
+    with run.file.open('rb') as csv_file:
+        # utf-8-sig also accepts files saved by Excel with a byte order mark
+        reader = csv.DictReader(codecs.iterdecode(csv_file, 'utf-8-sig'))
+        yield from enumerate(reader, start=2)
+
+
+def read_chunks(run, skip=0, chunk_size=None):
+    """Yield lists of (row number, row dict), skipping the first `skip` data rows."""
+    chunk_size = chunk_size or getattr(settings, 'STUDENT_IMPORT_CHUNK_SIZE', 500)
+    rows = islice(read_rows(run), skip, None)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_chunk(run, numbered_rows, enrollment_date):
+    """
+    Import one chunk of rows for an ImportRun in a single transaction,
+    saving its rejected and flagged rows and updating the run's counters.
+    """
+    from academics.models import SchoolEnrollment, StandardEnrollment
+    from core.audit import audit_changeset
+    from core.cache import bump_year_version
+    from .models import ImportRow, Student
+    from .student_matching import active_schools, find_similar_students, index_students
+
+    school, standard, academic_year = run.school, run.standard, run.year
+    flagged = []
+
+    parsed = []
+    for row_num, row in numbered_rows:
+        try:
+            parsed.append((row_num, row, parse_student_row(row)))
+        except ValueError as e:
+            flagged.append(ImportRow(run=run, row_number=row_num, status='error', data=row, message=str(e)))
+
+    keys = {row_identity_key(values) for _row_num, _row, values in parsed}
+    existing = find_existing_students(keys)
+    enrolled_ids = set(StandardEnrollment.objects.filter(
+        student__in=[student.id for student in existing.values()],
+        year=academic_year,
+        standard__school=school
+    ).values_list('student_id', flat=True)) if existing else set()
+
+    new_students = []
+    new_rows = []  # (row number, row) of each new student
+    repeated = []  # rows repeating an earlier row of the same chunk
+    first_row_for_key = {}
+    for row_num, row, values in parsed:
+        key = row_identity_key(values)
+        student = existing.get(key)
+        if student is not None:
+            registration = student.active_registrations[0] if student.active_registrations else None
+            flagged.append(_duplicate_row(
+                run, row_num, row, student,
+                same_school=any(reg.school_id == school.id for reg in student.active_registrations),
+                already_enrolled=student.id in enrolled_ids,
+                school=registration.school if registration else None,
+            ))
+        elif key in first_row_for_key:
+            repeated.append((row_num, row, first_row_for_key[key]))
+        else:
+            first_row_for_key[key] = len(new_students)
+            # bulk_create skips Student.save(), so the identity key is set here
+            new_students.append(Student(**values, identity_key=key, is_active=True, created_by=run.created_by))
+            new_rows.append((row_num, row))
+
+    # Near-duplicates are imported, with a warning for the user to review
+    similar = find_similar_students(new_students)
+    similar_schools = active_schools([matches[0][1].pk for matches in similar.values()])
+
+    with transaction.atomic(), audit_changeset(
+        run.created_by, f"Imported students into {standard.get_display_name()} ({run.file_name})", school=school
+    ) as changeset:
+        if new_students:
+            Student.objects.bulk_create(new_students, batch_size=500)
+            school_enrollments = SchoolEnrollment.objects.bulk_create([
+                SchoolEnrollment(
+                    school=school,
+                    student=student,
+                    enrollment_date=enrollment_date,
+                    is_active=True,
+                    enrolled_by=run.created_by
+                )
+                for student in new_students
+            ], batch_size=500)
+            standard_enrollments = StandardEnrollment.objects.bulk_create([
+                StandardEnrollment(
+                    year=academic_year,
+                    standard=standard,
+                    student=student,
+                    enrolled_by=run.created_by
+                )
+                for student in new_students
+            ], batch_size=500)
+
+            for objects in (new_students, school_enrollments, standard_enrollments):
+                changeset.log_created(objects)
+            # Student post_save is skipped too
+            index_students(new_students)
+
+            for index, matches in similar.items():
+                score, match = matches[0]
+                row_num, row = new_rows[index]
+                match_school = similar_schools.get(match.pk)
+                flagged.append(ImportRow(
+                    run=run,
+                    row_number=row_num,
+                    status='warning',
+                    data=row,
+                    message=(f"Imported, but looks like {match.get_full_name()} (ID: {match.id}, born "
+                             f"{match.date_of_birth:%Y-%m-%d}, {match_school.name if match_school else 'no school'}): "
+                             f"{score:.0%} similar"),
+                    existing_student=match,
+                    existing_school=match_school,
+                    same_school=match_school is not None and match_school.id == school.id,
+                    imported_student=new_students[index],
+                ))
+
+            # bulk_create skips model signals, so invalidate the cached rosters here
+            transaction.on_commit(lambda: bump_year_version(school.id, academic_year.id))
+
+        # A row repeating an earlier one is a duplicate of the student just created
+        for row_num, row, index in repeated:
+            flagged.append(_duplicate_row(
+                run, row_num, row, new_students[index], same_school=True, already_enrolled=True, school=school
+            ))
+        ImportRow.objects.bulk_create(flagged, batch_size=500)
+
+        run.processed_rows += len(numbered_rows)
+        run.created_count += len(new_students)
+        run.duplicate_count += sum(1 for row in flagged if row.status == 'duplicate')
+        run.error_count += sum(1 for row in flagged if row.status == 'error')
+        run.warning_count += sum(1 for row in flagged if row.status == 'warning')
+        run.save(update_fields=['processed_rows', 'created_count', 'duplicate_count', 'error_count', 'warning_count',
+                                'updated_at'])
+
+
+def _duplicate_row(run, row_num, row, student, same_school, already_enrolled, school):
+    from .models import ImportRow
+
+    if same_school:
+        message = f"Student already exists in this school (ID: {student.id}, {student.get_full_name()})"
+    else:
+        message = (f"Student already exists in another school: {school.name if school else 'Unknown'} "
+                   f"(ID: {student.id}, {student.get_full_name()})")
+    return ImportRow(
+        run=run,
+        row_number=row_num,
+        status='duplicate',
+        data=row,
+        message=message,
+        existing_student=student,
+        existing_school=school,
+        same_school=same_school,
+        already_enrolled=already_enrolled,
+    )
+
+
+def _fail(run, message):
+    run.status = 'failed'
+    run.error_message = message
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'error_message', 'finished_at', 'updated_at'])
+
+
+def claim_import(run_id, stale_before=None):
+    """
+    Mark an ImportRun as running for the caller, in one conditional update so
+    that two workers never process the same run. A pending run can always be
+    claimed; with `stale_before`, so can a running one last saved before then.
+
+    Returns whether the run was claimed.
+    """
+    from .models import ImportRun
+
+    claimable = Q(status='pending')
+    if stale_before is not None:
+        claimable |= Q(status='running', updated_at__lt=stale_before)
+    return ImportRun.objects.filter(claimable, pk=run_id).update(status='running', updated_at=timezone.now()) == 1
+
+
+def run_import(run_id, claimed=False):
+    """
+    Process an ImportRun, continuing after its last committed chunk. Unless
+    the caller has `claimed` it, the run is claimed first; a run that is
+    finished or being processed by another worker is returned untouched.
+
+    Runs in the background job; failures are recorded on the run.
+    """
+    from core.activity_buffer import record_activity
+    from .models import ImportRun
+
+    if not claimed and not claim_import(run_id):
+        return ImportRun.objects.get(pk=run_id)
+
+    run = ImportRun.objects.select_related('school', 'standard', 'year', 'created_by').get(pk=run_id)
+    if run.started_at is None:
+        run.started_at = timezone.now()
+        run.save(update_fields=['started_at', 'updated_at'])
+
+    try:
+        if run.total_rows is None:
+            run.total_rows = sum(1 for _row in read_rows(run))
+            run.save(update_fields=['total_rows', 'updated_at'])
+        if not run.total_rows:
+            _fail(run, "The uploaded CSV file is empty or has no data rows.")
+            return run
+
+        first_term = run.year.terms.first()
+        enrollment_date = first_term.start_date if first_term else date(run.year.start_year, 9, 1)
+
+        for chunk in read_chunks(run, skip=run.processed_rows):
+            import_chunk(run, chunk, enrollment_date)
+    except (UnicodeDecodeError, csv.Error):
+        _fail(run, "The uploaded file could not be read. Please upload a UTF-8 encoded CSV file.")
+        return run
+    except Exception as e:
+        logger.exception("Student import %s failed", run.pk)
+        _fail(run, f"The import stopped after {run.processed_rows} rows: {e}")
+        return run
+
+    run.status = 'completed'
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+    # One summary entry instead of the per-student model signal activity
+    if run.created_count and run.created_by:
+        record_activity(
+            run.created_by,
+            verb='enrolled',
+            target=run.standard,
+            description=f"Imported {run.created_count} students into {run.standard.get_display_name()}",
+            school_id=run.school_id
+        )
+    return run
+
+
+def _run_import_in_background(run_id):
+    try:
+        run_import(run_id)
+    except Exception:
+        logger.exception("Student import %s could not be run", run_id)
+    finally:
+        # The worker thread has its own database connection
+        connection.close()
+
+
+def _background_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='student-import')
+    return _executor
+
+
+def start_import(run):
+    """
+    Process an ImportRun once the current transaction commits: in a
+    background thread, or in the calling thread if
+    STUDENT_IMPORT_BACKGROUND is off.
+    """
+    if getattr(settings, 'STUDENT_IMPORT_BACKGROUND', True):
+        transaction.on_commit(lambda: _background_executor().submit(_run_import_in_background, run.pk))
+    else:
+        transaction.on_commit(lambda: run_import(run.pk))
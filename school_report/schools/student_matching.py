@@ -0,0 +1,248 @@
+"""
+Fuzzy duplicate student matching.
+
+Student.identity_key only catches exact duplicates. Students who transfer
+between schools are often re-entered with small differences ("Jon" and
+"John", a mistyped date of birth) that it misses. Comparing every pair of
+students would be quadratic, so matching uses blocking: each student gets a
+few coarse keys, stored in StudentMatchKey, and only students sharing a key
+are scored:
+
+- 'sx:' + the Soundex codes of the first and last name, which ignores the
+  date of birth so DOB typos still meet
+- 'ib:' + the initials and birth year, which catches spellings that change
+  the Soundex code
+
+Blocks larger than MAX_BLOCK_SIZE (very common names) are skipped, so the
+work stays close to linear in the number of students. Candidates are scored
+with match_score(): string similarity of the names and parent name plus a
+date of birth comparison that tolerates a single wrong field.
+
+The keys are kept up to date by a post_save receiver on Student; code that
+creates students with bulk_create calls index_students() itself.
+"""
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import groupby
+
+from django.db import transaction
+
+from .models import Student, StudentMatchKey, normalize_identity_part
+
+DEFAULT_THRESHOLD = 0.85
+MAX_BLOCK_SIZE = 500
+
+# Weights of the compared fields in match_score()
+WEIGHTS = {
+    'first_name': 0.3,
+    'last_name': 0.3,
+    'parent_name': 0.15,
+    'date_of_birth': 0.25,
+}
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+
+def soundex(name):
+    """American Soundex code of a name ('' for a name without letters)"""
+    letters = [char for char in normalize_identity_part(name) if 'a' <= char <= 'z']
+    if not letters:
+        return ''
+
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], '')
+    for char in letters[1:]:
+        digit = _SOUNDEX_CODES.get(char, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code; vowels do
+        if char not in 'hw':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def blocking_keys(first_name, last_name, date_of_birth):
+    """The StudentMatchKey keys for a student's details"""
+    first = normalize_identity_part(first_name)
+    last = normalize_identity_part(last_name)
+    keys = set()
+    if first and last:
+        keys.add(f'sx:{soundex(first)}:{soundex(last)}')
+        if date_of_birth:
+            keys.add(f'ib:{first[0]}{last[0]}:{date_of_birth.year}')
+    return keys
+
+
+def _text_similarity(a, b):
+    a, b = normalize_identity_part(a), normalize_identity_part(b)
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _date_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    # Day and month swapped (DD/MM vs MM/DD)
+    if a.year == b.year and a.month == b.day and a.day == b.month:
+        return 0.9
+    wrong_fields = sum(1 for field in ('year', 'month', 'day') if getattr(a, field) != getattr(b, field))
+    return 0.8 if wrong_fields == 1 else 0.0
+
+
+def match_score(a, b):
+    """
+    Similarity of two students (or anything with first_name, last_name,
+    parent_name and date_of_birth attributes), from 0 to 1.
+    """
+    return (
+        WEIGHTS['first_name'] * _text_similarity(a.first_name, b.first_name)
+        + WEIGHTS['last_name'] * _text_similarity(a.last_name, b.last_name)
+        + WEIGHTS['parent_name'] * _text_similarity(a.parent_name, b.parent_name)
+        + WEIGHTS['date_of_birth'] * _date_similarity(a.date_of_birth, b.date_of_birth)
+    )
+
+
+def index_students(students):
+    """Store the blocking keys of saved students, replacing keys that changed."""
+    wanted = {
+        student.pk: blocking_keys(student.first_name, student.last_name, student.date_of_birth)
+        for student in students
+    }
+    if not wanted:
+        return
+
+    current = defaultdict(set)
+    for student_id, key in StudentMatchKey.objects.filter(student_id__in=wanted).values_list('student_id', 'key'):
+        current[student_id].add(key)
+
+    stale = [(student_id, current[student_id] - keys) for student_id, keys in wanted.items() if current[student_id] - keys]
+    new = [
+        StudentMatchKey(student_id=student_id, key=key)
+        for student_id, keys in wanted.items()
+        for key in keys - current[student_id]
+    ]
+    if not stale and not new:
+        return
+
+    with transaction.atomic():
+        for student_id, keys in stale:
+            StudentMatchKey.objects.filter(student_id=student_id, key__in=keys).delete()
+        StudentMatchKey.objects.bulk_create(new, batch_size=1000)
+
+
+def rebuild_match_index(batch_size=1000):
+    """Recompute the blocking keys of every student. Returns the number of students."""
+    students = Student.objects.only('id', 'first_name', 'last_name', 'date_of_birth').order_by('pk')
+    count = 0
+    last_pk = 0
+    while True:
+        batch = list(students.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return count
+        last_pk = batch[-1].pk
+        index_students(batch)
+        count += len(batch)
+
+
+def find_similar_students(candidates, threshold=DEFAULT_THRESHOLD, exclude_ids=()):
+    """
+    Find existing students resembling each candidate (objects with the
+    Student name and date of birth attributes, e.g. unsaved Students), with
+    one query over the candidates' blocking keys.
+
+    Returns {candidate index: [(score, Student)]}, best match first.
+    """
+    keys_for = {
+        index: blocking_keys(candidate.first_name, candidate.last_name, candidate.date_of_birth)
+        for index, candidate in enumerate(candidates)
+    }
+    all_keys = set().union(*keys_for.values()) if keys_for else set()
+    if not all_keys:
+        return {}
+
+    students_by_key = defaultdict(list)
+    match_keys = StudentMatchKey.objects.filter(key__in=all_keys).exclude(
+        student_id__in=exclude_ids
+    ).select_related('student')
+    for match_key in match_keys:
+        students_by_key[match_key.key].append(match_key.student)
+
+    matches = {}
+    for index, keys in keys_for.items():
+        scored = {}
+        for key in keys:
+            block = students_by_key.get(key, [])
+            if len(block) > MAX_BLOCK_SIZE:
+                continue
+            for student in block:
+                if student.pk not in scored:
+                    scored[student.pk] = (match_score(candidates[index], student), student)
+        found = sorted((match for match in scored.values() if match[0] >= threshold),
+                       key=lambda match: match[0], reverse=True)
+        if found:
+            matches[index] = found
+    return matches
+
+
+def active_schools(student_ids):
+    """{student id: School of the student's active registration}"""
+    from academics.models import SchoolEnrollment
+
+    if not student_ids:
+        return {}
+    registrations = SchoolEnrollment.objects.filter(
+        student_id__in=student_ids, is_active=True
+    ).select_related('school')
+    return {registration.student_id: registration.school for registration in registrations}
+
+
+def find_duplicate_pairs(threshold=DEFAULT_THRESHOLD, batch_size=2000):
+    """
+    Yield (score, student id, student id) for every pair of students sharing
+    a block and scoring at least `threshold`. Each pair is yielded once.
+
+    The index is read in key order and the students of a batch of blocks are
+    loaded together, so memory is bounded by the batch size.
+    """
+    fields = ('id', 'first_name', 'last_name', 'date_of_birth', 'parent_name')
+    seen = set()
+
+    def score_blocks(blocks):
+        ids = set().union(*blocks)
+        students = {student.pk: student for student in Student.objects.only(*fields).filter(pk__in=ids)}
+        for block in blocks:
+            block = sorted(student_id for student_id in block if student_id in students)
+            for i, a in enumerate(block):
+                for b in block[i + 1:]:
+                    if (a, b) in seen:
+                        continue
+                    seen.add((a, b))
+                    score = match_score(students[a], students[b])
+                    if score >= threshold:
+                        yield score, a, b
+
+    rows = StudentMatchKey.objects.order_by('key', 'student_id').values_list('key', 'student_id')
+    pending, pending_size = [], 0
+    for _key, group in groupby(rows.iterator(chunk_size=batch_size), key=lambda row: row[0]):
+        block = [student_id for _key, student_id in group]
+        if len(block) < 2 or len(block) > MAX_BLOCK_SIZE:
+            continue
+        pending.append(block)
+        pending_size += len(block)
+        if pending_size >= batch_size:
+            yield from score_blocks(pending)
+            pending, pending_size = [], 0
+    if pending:
+        yield from score_blocks(pending)
@@ -0,0 +1,119 @@
+"""
+Student search for the autocomplete box (name, parent name and phone).
+
+Matching is done by an index on each database backend, so a lookup costs
+about the same with a hundred students or tens of thousands:
+
+- PostgreSQL: a pg_trgm GIN index on StudentSearchText(), the lowercased
+  names, parent name and phone in one string. Each search word becomes a
+  LIKE '%word%' on the same expression, which the trigram index answers.
+- SQLite (development): STUDENT_FTS, an FTS5 index (see core/fts.py). Each
+  search word is a prefix query ("ann"*), so "ann smi" finds Anne Smith and
+  "555" finds her phone number.
+
+Both are created by schools/migrations/0008. Other backends (or SQLite built
+without FTS5) fall back to icontains filters.
+
+Results are limited to the students registered at the school and ordered
+with name prefix matches first.
+"""
+from django.db import connection
+from django.db.models import Case, Exists, F, Func, IntegerField, OuterRef, Q, Subquery, TextField, Value, When
+from django.db.models.expressions import RawSQL
+
+from core.fts import SqliteFtsIndex, fts_query
+from .models import Student
+
+STUDENT_TRIGRAM_INDEX = 'schools_student_search_trgm'
+
+MAX_RESULTS = 20
+# Words of a query beyond this are ignored
+MAX_WORDS = 5
+
+_SEARCH_FIELDS = ('first_name', 'last_name', 'parent_name', 'contact_phone')
+
+STUDENT_FTS = SqliteFtsIndex('schools_student_fts', 'schools_student', _SEARCH_FIELDS, prefix='2 3')
+
+
+class StudentSearchText(Func):
+    """The lowercased searchable fields of a student as one indexable string."""
+    # Rendered identically in the index and in queries, so the index is used
+    template = "LOWER(%(expressions)s)"
+    arg_joiner = " || ' ' || "
+    output_field = TextField()
+
+    def __init__(self):
+        super().__init__(
+            F('first_name'), F('last_name'), F('parent_name'),
+            Func(F('contact_phone'), template="COALESCE(%(expressions)s, '')")
+        )
+
+
+def student_trigram_index():
+    """Trigram index on StudentSearchText() used by PostgreSQL searches."""
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+
+    return GinIndex(OpClass(StudentSearchText(), name='gin_trgm_ops'), name=STUDENT_TRIGRAM_INDEX)
+
+
+def search_words(query):
+    """The lowercased words of a search query"""
+    return query.lower().split()[:MAX_WORDS]
+
+
+def filter_students(queryset, words):
+    """Limit a Student queryset to the students matching every word"""
+    if connection.vendor == 'postgresql':
+        queryset = queryset.alias(search_text=StudentSearchText())
+        for word in words:
+            queryset = queryset.filter(search_text__contains=word)
+        return queryset
+
+    if STUDENT_FTS.is_available(queryset.db):
+        return queryset.filter(id__in=RawSQL(STUDENT_FTS.match_sql(), [fts_query(words, prefix=True)]))
+
+    for word in words:
+        matches = Q()
+        for field in _SEARCH_FIELDS:
+            matches |= Q(**{f'{field}__icontains': word})
+        queryset = queryset.filter(matches)
+    return queryset
+
+
+def search_students(school, query, year=None, standard=None, limit=10):
+    """
+    Students registered at `school` matching `query`, as a list of dicts with
+    id, first_name, last_name, parent_name, contact_phone and standard_id
+    (their current class in `year`, or None).
+
+    `standard` limits the results to the students currently in that class.
+    """
+    from academics.models import SchoolEnrollment, StandardEnrollment
+
+    words = search_words(query)
+    if not words:
+        return []
+
+    # Checked per matching student, so the cost follows the matches, not the school size
+    registered = SchoolEnrollment.objects.filter(student=OuterRef('pk'), school=school, is_active=True)
+    students = filter_students(Student.objects.filter(Exists(registered)), words)
+
+    current_class = StandardEnrollment.objects.filter(
+        student=OuterRef('pk'),
+        year=year
+    ).order_by('-created_at', '-id').values('standard')[:1]
+    students = students.annotate(
+        standard_id=Subquery(current_class) if year else Value(None, output_field=IntegerField())
+    )
+    if standard:
+        students = students.filter(standard_id=standard.id)
+
+    # Students whose first or last name starts with the first word come first
+    name_prefix = Q(first_name__istartswith=words[0]) | Q(last_name__istartswith=words[0])
+    students = students.annotate(
+        prefix_match=Case(When(name_prefix, then=Value(0)), default=Value(1), output_field=IntegerField())
+    ).order_by('prefix_match', 'last_name', 'first_name', 'id')
+
+    return list(students.values(
+        'id', 'first_name', 'last_name', 'parent_name', 'contact_phone', 'standard_id'
+    )[:min(limit, MAX_RESULTS)])
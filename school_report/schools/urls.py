@@ -1,9 +1,10 @@
 from django.urls import path
 from .views import (
-    StaffListView, TeacherCreateView, AdminStaffCreateView, StudentListView,
+    StaffListView, StaffListDataView, TeacherCreateView, AdminStaffCreateView, StudentListView, StudentListDataView,
     StandardListView, StandardDetailView, TeacherAssignmentCreateView,
     TeacherUnassignView, StudentCreateView, StudentUpdateView, StudentDetailView,
-    EnrollmentCreateView, StudentBulkUploadView, student_csv_template
+    EnrollmentCreateView, StudentBulkUploadView, StudentImportDetailView, StudentImportProgressView,
+    StudentSearchView, StudentExportView, EnrollmentHistoryExportView, student_csv_template
 )
 from .dashboard import SchoolDashboardView
 from core.views import ProfileView
@@ -19,14 +20,21 @@ urlpatterns = [
 
     # Staff URLs
     path('staff/', StaffListView.as_view(), name='staff_list'),
+    path('staff/data/', StaffListDataView.as_view(), name='staff_list_data'),
     path('staff/add-teacher/', TeacherCreateView.as_view(), name='teacher_add'),
     path('staff/add-admin/', AdminStaffCreateView.as_view(), name='admin_staff_add'),
 
     # Student URLs
     path('students/', StudentListView.as_view(), name='student_list'),
+    path('students/data/', StudentListDataView.as_view(), name='student_list_data'),
+    path('students/search/', StudentSearchView.as_view(), name='student_search'),
     path('students/add/', StudentCreateView.as_view(), name='student_add'),
     path('students/upload/', StudentBulkUploadView.as_view(), name='student_upload'),
     path('students/csv-template/', student_csv_template, name='student_csv_template'),
+    path('students/export/', StudentExportView.as_view(), name='student_export'),
+    path('students/enrollments/export/', EnrollmentHistoryExportView.as_view(), name='enrollment_history_export'),
+    path('students/imports/<int:pk>/', StudentImportDetailView.as_view(), name='student_import_detail'),
+    path('students/imports/<int:pk>/progress/', StudentImportProgressView.as_view(), name='student_import_progress'),
     path('students/<int:pk>/', StudentDetailView.as_view(), name='student_detail'),
     path('students/<int:pk>/edit/', StudentUpdateView.as_view(), name='student_edit'),
     path('students/<int:student_id>/enroll/', EnrollmentCreateView.as_view(), name='student_enroll'),
@@ -1,32 +1,45 @@
-from django.views.generic import ListView, CreateView, UpdateView, DetailView, View
+from django.views.generic import ListView, CreateView, UpdateView, DetailView, TemplateView, View
 from django.views.generic.edit import FormView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.urls import reverse_lazy, reverse
 from django import forms
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import redirect, get_object_or_404, render
 from django.contrib import messages
 from django.core.validators import FileExtensionValidator
+from django.core.paginator import Paginator
+from django.db.models import CharField, IntegerField, OuterRef, Subquery, Value
+from django.template.defaultfilters import date as date_format
+from django.utils.html import escape, format_html
 from core.models import UserProfile
-from core.utils import get_current_year_and_term, unassign_teacher, get_current_teacher_assignment, unenroll_student, get_current_student_enrollment
-from core.mixins import SchoolAccessRequiredMixin
+from core.utils import (
+    get_current_year_and_term, unassign_teacher, get_current_teacher_assignment, unenroll_student,
+    get_current_student_enrollment, get_current_enrollments, get_cached_roster_summary
+)
+from core.context import get_school_context
+from core.mixins import SchoolAccessRequiredMixin, SchoolAdminRequiredMixin
 from core.activity_utils import create_student_enrollment_activity, create_teacher_assignment_activity
+from core.datatables import DataTableColumn, DataTablesMixin
+from core.exports import export_response, get_export_format, get_filter_object
 from academics.models import SchoolYear, Term, StandardTeacher, SchoolEnrollment, StandardEnrollment, SchoolStaff
 # Backward compatibility alias
 Enrollment = StandardEnrollment
-from .models import School, Standard, Student
+from .models import School, Standard, Student, ImportRun
+from .student_import import start_import
+from .student_search import search_students
+from .exports import class_name, roster_rows, enrollment_history_rows
 import csv
-from datetime import datetime, date
+from datetime import date
 
 
-class StaffListView(LoginRequiredMixin, ListView):
+class StaffListView(LoginRequiredMixin, TemplateView):
     """
-    View for listing all staff (teachers and administration) in a school
+    View for listing all staff (teachers and administration) in a school.
+
+    The table is filled page by page from StaffListDataView.
     """
-    model = UserProfile
     template_name = 'schools/staff_list.html'
-    context_object_name = 'staff_members'
 
     def dispatch(self, request, *args, **kwargs):
         # Get the school by slug
@@ -47,81 +60,104 @@ class StaffListView(LoginRequiredMixin, ListView):
 
         return super().dispatch(request, *args, **kwargs)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['school'] = self.school
+        context['school_slug'] = self.school_slug
+        context['has_staff'] = SchoolStaff.objects.filter(school=self.school, is_active=True).exists()
+        return context
+
+
+class StaffListDataView(SchoolAccessRequiredMixin, DataTablesMixin, View):
+    """
+    Server-side DataTables endpoint for the staff list.
+
+    Each teacher's current class comes from their latest StandardTeacher record
+    of the current year (as in get_current_teacher_assignment()), annotated
+    onto the staff query.
+    """
+    columns = [
+        DataTableColumn('name', order_by=('staff__user__first_name', 'staff__user__last_name'),
+                        search=('staff__user__first_name', 'staff__user__last_name')),
+        DataTableColumn('username', order_by=('staff__user__username',), search=('staff__user__username',)),
+        DataTableColumn('email', order_by=('staff__user__email',), search=('staff__user__email',)),
+        DataTableColumn('phone', order_by=('staff__phone_number',), search=('staff__phone_number',)),
+        DataTableColumn('type', order_by=('staff__user_type', 'position'), search=('position',)),
+        DataTableColumn('assigned_to', order_by=('assigned_standard_name', 'assigned_group_number')),
+        DataTableColumn('status'),
+        DataTableColumn('actions'),
+    ]
+
     def get_queryset(self):
-        # Get all active staff from this school via SchoolStaff
-        # No longer tied to academic year - staff employment persists across years
-        school_staff = SchoolStaff.objects.filter(
+        staff = SchoolStaff.objects.filter(
             school=self.school,
             is_active=True
         ).select_related('staff__user')
 
-        # Create a list to hold all staff members with their type
-        staff_list = []
-
-        # Get current teacher assignments for the current year using historical logic
-        teacher_assignments = {}
-
-        # Get current academic year for teacher assignments
-        current_year, current_term, is_on_vacation = get_current_year_and_term(school=self.school)
-
-        # Get all teachers in this school
-        teacher_profiles = [staff.staff for staff in school_staff if staff.staff.user_type == 'teacher']
-
-        if current_year:  # Only get assignments if we have a current year
-            for teacher_profile in teacher_profiles:
-                current_assignment = get_current_teacher_assignment(teacher_profile, current_year)
-                if current_assignment:
-                    teacher_assignments[teacher_profile.id] = {
-                        'standard': current_assignment.standard,
-                        'assignment_id': current_assignment.id
-                    }
-
-        # Process each staff member
-        for staff_member in school_staff:
-            user_profile = staff_member.staff
-
-            # Check if this is a teacher with an assignment
-            assignment_info = teacher_assignments.get(user_profile.id)
-            assigned_standard = assignment_info['standard'] if assignment_info else None
-            assignment_id = assignment_info['assignment_id'] if assignment_info else None
-
-            # Determine staff type display
-            if user_profile.user_type == 'teacher':
-                type_display = 'Teacher'
-                is_teacher = True
-            elif user_profile.user_type == 'principal':
-                type_display = f'Principal ({staff_member.position})' if staff_member.position else 'Principal'
-                is_teacher = False
-            else:  # administration
-                type_display = f'Administration ({staff_member.position})' if staff_member.position else 'Administration'
-                is_teacher = False
-
-            staff_list.append({
-                'id': user_profile.id,
-                'name': user_profile.get_full_name(),
-                'email': user_profile.user.email,
-                'phone': user_profile.phone_number,
-                'username': user_profile.user.username,
-                'type': type_display,
-                'is_teacher': is_teacher,
-                'is_active': staff_member.is_active,
-                'assigned_standard': assigned_standard,
-                'assignment_id': assignment_id,
-                'obj': user_profile,
-                'staff_obj': staff_member
-            })
-
-        # Sort the combined list by name
-        staff_list.sort(key=lambda x: x['name'])
-
-        return staff_list
+        year = self.school_ctx.year
+        if not year:
+            return staff.annotate(
+                assignment_id=Value(None, output_field=IntegerField()),
+                assigned_standard_name=Value(None, output_field=CharField()),
+                assigned_group_number=Value(None, output_field=IntegerField()),
+            )
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['school'] = self.school
-        context['school_slug'] = self.school_slug
-        return context
+        # Latest assignment record of the teacher (standard is null when unassigned)
+        latest_assignment = StandardTeacher.objects.filter(
+            teacher=OuterRef('staff'),
+            year=year
+        ).order_by('-created_at', '-id')
+        return staff.annotate(
+            assignment_id=Subquery(latest_assignment.values('id')[:1]),
+            assigned_standard_name=Subquery(latest_assignment.values('standard__name')[:1]),
+            assigned_group_number=Subquery(latest_assignment.values('standard__group_number')[:1]),
+        )
 
+    def get_default_order(self):
+        return ['staff__user__first_name', 'staff__user__last_name']
+
+    def render_row(self, staff_member):
+        profile = staff_member.staff
+        if profile.user_type == 'teacher':
+            type_display = 'Teacher'
+        elif profile.user_type == 'principal':
+            type_display = f'Principal ({staff_member.position})' if staff_member.position else 'Principal'
+        else:
+            type_display = f'Administration ({staff_member.position})' if staff_member.position else 'Administration'
+
+        is_assigned = profile.user_type == 'teacher' and staff_member.assigned_standard_name
+        if is_assigned:
+            assigned_to = format_html('<span class="badge bg-info">{}</span>', class_name(
+                staff_member.assigned_standard_name, staff_member.assigned_group_number
+            ))
+        else:
+            assigned_to = format_html('<span class="badge bg-secondary">Not Applicable</span>')
+
+        if is_assigned:
+            actions = format_html(
+                '<a href="{}" class="btn btn-sm btn-warning"><i class="bi bi-x-circle"></i> Remove Class</a>',
+                reverse('schools:unassign_teacher', kwargs={
+                    'school_slug': self.school_slug, 'assignment_id': staff_member.assignment_id
+                })
+            )
+        elif profile.user_type == 'teacher':
+            actions = format_html(
+                '<a href="{}" class="btn btn-sm btn-success"><i class="bi bi-check-circle"></i> Assign Class</a>',
+                reverse('schools:assign_teacher', kwargs={'school_slug': self.school_slug, 'pk': profile.pk})
+            )
+        else:
+            actions = format_html('<span class="text-muted">No actions</span>')
+
+        return [
+            escape(profile.get_full_name()),
+            escape(profile.user.username),
+            escape(profile.user.email),
+            escape(profile.phone_number or '-'),
+            escape(type_display),
+            assigned_to,
+            format_html('<span class="badge bg-success">Active</span>'),
+            actions,
+        ]
 
 class TeacherCreateForm(forms.Form):
     """
@@ -224,13 +260,14 @@ class TeacherCreateView(LoginRequiredMixin, FormView):
         return redirect(self.get_success_url())
 
 
-class StudentListView(LoginRequiredMixin, ListView):
+class StudentListView(LoginRequiredMixin, TemplateView):
     """
-    View for listing students in a school or class
+    View for listing students in a school or class.
+
+    The table is filled page by page from StudentListDataView; ?class=<id>
+    limits it to one class.
     """
-    model = Student
     template_name = 'schools/student_list.html'
-    context_object_name = 'students'
 
     def dispatch(self, request, *args, **kwargs):
         # Get the school by slug
@@ -251,53 +288,6 @@ class StudentListView(LoginRequiredMixin, ListView):
 
         return super().dispatch(request, *args, **kwargs)
 
-    def get_queryset(self):
-        # Get current school year using the centralized function
-        current_year, current_term, vacation_status = get_current_year_and_term(school=self.school)
-
-        # Current year is guaranteed to exist now
-        # For principals and administration, show all students currently enrolled in this school
-        if self.request.user.profile.user_type in ['principal', 'administration']:
-            # Get all students who have current class assignments (non-null standard) in this school
-            students = Student.objects.filter(
-                standard_enrollments__year=current_year,
-                standard_enrollments__standard__school=self.school,
-                standard_enrollments__standard__isnull=False  # Only current assignments
-            ).distinct()
-
-            # Filter to only students with current (latest) enrollment
-            current_students = []
-            for student in students:
-                current_enrollment = get_current_student_enrollment(student, current_year)
-                if current_enrollment and current_enrollment.standard.school == self.school:
-                    current_students.append(student)
-
-            return current_students
-
-        # For teachers, show only students in their assigned classes
-        elif self.request.user.profile.user_type == 'teacher':
-            user_profile = self.request.user.profile
-            teacher_assignment = get_current_teacher_assignment(user_profile, current_year)
-
-            if teacher_assignment:
-                # Get students currently assigned to teacher's class
-                students = Student.objects.filter(
-                    standard_enrollments__year=current_year,
-                    standard_enrollments__standard=teacher_assignment.standard,
-                    standard_enrollments__standard__isnull=False
-                ).distinct()
-
-                # Filter to only students with current enrollment in this class
-                current_students = []
-                for student in students:
-                    current_enrollment = get_current_student_enrollment(student, current_year)
-                    if current_enrollment and current_enrollment.standard == teacher_assignment.standard:
-                        current_students.append(student)
-
-                return current_students
-
-        return Student.objects.none()
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
@@ -307,24 +297,90 @@ class StudentListView(LoginRequiredMixin, ListView):
 
         # Get current school year using the centralized function
         current_year, current_term, vacation_status = get_current_year_and_term(school=self.school)
+        roster = get_cached_roster_summary(self.school, current_year)
+
+        # Teachers only see their current class
+        teacher_standard = None
+        if self.request.user.profile.user_type == 'teacher':
+            teacher_assignment = get_current_teacher_assignment(self.request.user.profile, current_year)
+            teacher_standard = teacher_assignment.standard if teacher_assignment else None
+            roster = [row for row in roster if teacher_standard and row['standard_id'] == teacher_standard.id]
+
+        # Classes for filtering
+        context['standards'] = roster
+        selected_class = self.request.GET.get('class', '')
+        context['selected_standard'] = next(
+            (row for row in roster if str(row['standard_id']) == selected_class), None
+        )
 
-        # Add standards for filtering
-        if self.request.user.profile.user_type in ['principal', 'administration']:
-            context['standards'] = Standard.objects.filter(school=self.school)
-        elif self.request.user.profile.user_type == 'teacher':
-            user_profile = self.request.user.profile
-            if current_year:
-                context['standards'] = Standard.objects.filter(
-                    school=self.school,
-                    teacher_assignments__teacher=user_profile,
-                    teacher_assignments__year=current_year
-                ).distinct()
-            else:
-                context['standards'] = Standard.objects.none()
+        if self.request.user.profile.user_type == 'teacher' and not teacher_standard:
+            context['has_students'] = False
+        else:
+            context['has_students'] = current_year is not None and get_current_enrollments(
+                self.school, current_year, teacher_standard
+            ).exists()
 
         return context
 
 
+class StudentListDataView(SchoolAccessRequiredMixin, DataTablesMixin, View):
+    """
+    Server-side DataTables endpoint for the student list.
+
+    Rows are the current class assignments of the year (get_current_enrollments()):
+    the whole school for principals and administration staff, optionally
+    limited to ?class=<id>, and their own class for teachers.
+    """
+    columns = [
+        DataTableColumn('name', order_by=('student__first_name', 'student__last_name'),
+                        search=('student__first_name', 'student__last_name')),
+        DataTableColumn('class', order_by=('standard__name', 'standard__group_number')),
+        DataTableColumn('date_of_birth', order_by=('student__date_of_birth',)),
+        DataTableColumn('parent_name', order_by=('student__parent_name',), search=('student__parent_name',)),
+        DataTableColumn('actions'),
+    ]
+
+    def get_queryset(self):
+        ctx = self.school_ctx
+        if not ctx.year:
+            return StandardEnrollment.objects.none()
+
+        if ctx.role == 'teacher':
+            standard = ctx.teacher_standard
+            if not standard:
+                return StandardEnrollment.objects.none()
+        else:
+            standard = get_filter_object(self.request, 'class', Standard.objects.filter(school=self.school))
+
+        return get_current_enrollments(self.school, ctx.year, standard).select_related('student')
+
+    def get_default_order(self):
+        return ['student__first_name', 'student__last_name']
+
+    def get_page_context(self, objects):
+        return {
+            'classes': {
+                row['standard_id']: row['display_name']
+                for row in get_cached_roster_summary(self.school, self.school_ctx.year)
+            }
+        }
+
+    def render_row(self, enrollment):
+        student = enrollment.student
+        actions = format_html(
+            '<a href="{}" class="btn btn-sm btn-primary"><i class="bi bi-eye"></i> View</a> '
+            '<a href="{}" class="btn btn-sm btn-info"><i class="bi bi-pencil"></i> Edit</a>',
+            reverse('schools:student_detail', kwargs={'school_slug': self.school_slug, 'pk': student.id}),
+            reverse('schools:student_edit', kwargs={'school_slug': self.school_slug, 'pk': student.id}),
+        )
+        return [
+            escape(f"{student.first_name} {student.last_name}"),
+            escape(self.page_context['classes'].get(enrollment.standard_id, '')),
+            date_format(student.date_of_birth, "Y, M d") or '-',
+            escape(student.parent_name),
+            actions,
+        ]
+
 class StandardListView(LoginRequiredMixin, ListView):
     """
     View for listing standards/classes in a school
@@ -389,87 +445,93 @@ class StandardListView(LoginRequiredMixin, ListView):
 class StandardDetailView(LoginRequiredMixin, DetailView):
     """
     View for showing details of a standard/class
+
+    The page is built from a fixed number of queries however large the class:
+    the current teachers and students are resolved with set-based "latest
+    record wins" subqueries, and each student's report for the current term
+    is annotated onto the roster.
     """
     model = Standard
     template_name = 'schools/standard_detail.html'
     context_object_name = 'standard'
 
     def dispatch(self, request, *args, **kwargs):
-        # Get the school by slug
         self.school_slug = kwargs.get('school_slug')
-        self.school = get_object_or_404(School, slug=self.school_slug)
+        self.school_ctx = get_school_context(request, self.school_slug)
+        self.school = self.school_ctx.school
 
         # Check if user has access to this school via SchoolStaff
-        user_profile = request.user.profile
-        school_staff = SchoolStaff.objects.filter(
-            staff=user_profile,
-            school=self.school,
-            is_active=True
-        ).first()
-
-        if not school_staff:
+        if not self.school_ctx.is_staff_member:
             messages.warning(request, "You do not have access to this school.")
             return redirect('core:home')
 
         return super().dispatch(request, *args, **kwargs)
 
-    def get_object(self, queryset=None):
-        # Get the standard by ID and ensure it belongs to the correct school
-        standard = super().get_object(queryset)
-        if standard.school != self.school:
-            raise Http404("Standard not found in this school")
-        return standard
+    def get_queryset(self):
+        # Standards of other schools are not found
+        return Standard.objects.filter(school=self.school)
+
+    def get_teacher_assignments(self, standard, current_year):
+        """
+        Assignments of the teachers whose current (latest) assignment in the
+        year is this standard (the set-based get_current_teacher_assignment())
+        """
+        latest_assignment_id = StandardTeacher.objects.filter(
+            teacher=OuterRef('teacher'),
+            year=current_year
+        ).order_by('-created_at', '-id').values('id')[:1]
+
+        return list(StandardTeacher.objects.filter(
+            standard=standard,
+            year=current_year,
+            teacher__isnull=False,
+            id=Subquery(latest_assignment_id)
+        ).select_related('teacher__user').order_by('created_at', 'id'))
+
+    def get_enrolled_students(self, standard, current_year, current_term):
+        """
+        Students currently enrolled in this standard, each with report_id and
+        report_finalized for their report of the current term (None if none)
+        """
+        students = Student.objects.filter(
+            id__in=get_current_enrollments(self.school, current_year, standard).values('student')
+        )
+        if current_term:
+            from reports.models import StudentTermReview
+
+            report = StudentTermReview.objects.filter(student=OuterRef('pk'), term=current_term)
+            students = students.annotate(
+                report_id=Subquery(report.values('id')[:1]),
+                report_finalized=Subquery(report.values('is_finalized')[:1]),
+            )
+        return list(students.order_by('first_name', 'last_name', 'id'))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        standard = self.get_object()
+        standard = self.object
 
         # Add school and school_slug to context
         context['school'] = self.school
         context['school_slug'] = self.school_slug
 
-        # Get current school year using the centralized function
-        current_year, current_term, vacation_status = get_current_year_and_term(school=self.school)
+        current_year = self.school_ctx.year
+        current_term = self.school_ctx.term
+        context['current_term'] = current_term
 
-        # Get current teacher assignments for this standard using historical logic
         if current_year:
-            # Get all teachers who might be assigned to this standard
-            all_assignments = StandardTeacher.objects.filter(
-                standard=standard,
-                year=current_year
-            ).values_list('teacher', flat=True).distinct()
-
-            current_assignments = []
-            for teacher in all_assignments:
-                # teacher = UserProfile.objects.get(id=teacher.id)
-                current_assignment = get_current_teacher_assignment(teacher, current_year)
-                if current_assignment and current_assignment.standard == standard:
-                    current_assignments.append(current_assignment)
-
-            context['teacher_assignments'] = current_assignments
+            context['teacher_assignments'] = self.get_teacher_assignments(standard, current_year)
+            context['enrolled_students'] = self.get_enrolled_students(standard, current_year, current_term)
         else:
             context['teacher_assignments'] = []
-
-        # Get students currently enrolled in this standard using historical logic
-        if current_year:
-            # Get all students who might be enrolled in this standard
-            all_enrollments = StandardEnrollment.objects.filter(
-                standard=standard,
-                year=current_year
-            ).values_list('student', flat=True).distinct()
-
-            current_students = []
-            for student_id in all_enrollments:
-                from schools.models import Student
-                student = Student.objects.get(id=student_id)
-                current_enrollment = get_current_student_enrollment(student, current_year)
-                if current_enrollment and current_enrollment.standard == standard:
-                    current_students.append(student)
-
-            context['enrolled_students'] = current_students
-        else:
             context['enrolled_students'] = []
 
+        # Same name as standard.get_display_name(), from the cached roster summary
+        context['standard_display_name'] = next(
+            (row['display_name'] for row in get_cached_roster_summary(self.school, current_year)
+             if row['standard_id'] == standard.id),
+            None
+        ) or standard.get_display_name()
+
         return context
 
 
@@ -784,6 +846,8 @@ class StudentCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         # Create the student
         student = form.save(commit=False)
+        if not self.check_duplicate(form, student):
+            return self.form_invalid(form)
         student.is_active = True
         student.created_by = self.request.user.profile
         student.save()
@@ -820,6 +884,19 @@ class StudentCreateView(LoginRequiredMixin, CreateView):
 
         return redirect(self.get_success_url())
 
+    @staticmethod
+    def check_duplicate(form, student):
+        """
+        Add a form error and return False if another student has the same
+        identity (one lookup on the indexed Student.identity_key).
+        """
+        duplicate = student.find_duplicates().first()
+        if duplicate:
+            form.add_error(None, f"A student with the same name, date of birth and parent/guardian already exists "
+                                 f"(ID: {duplicate.id}, {duplicate.get_full_name()}).")
+            return False
+        return True
+
 
 class StudentUpdateView(LoginRequiredMixin, UpdateView):
     """
@@ -902,7 +979,13 @@ class StudentUpdateView(LoginRequiredMixin, UpdateView):
 
     def form_valid(self, form):
         # Update the student
-        student = form.save()
+        student = form.save(commit=False)
+        # Only an edit to the identity can create a duplicate, so students
+        # already flagged as duplicates can still be edited (e.g. to fix that)
+        identity_changed = any(field in form.changed_data for field in Student.IDENTITY_FIELDS)
+        if identity_changed and not StudentCreateView.check_duplicate(form, student):
+            return self.form_invalid(form)
+        student.save()
         messages.success(self.request, f"Student {student} has been updated successfully!")
         return redirect(self.get_success_url())
 
@@ -1133,14 +1216,7 @@ class StudentBulkUploadView(LoginRequiredMixin, FormView):
         context = super().get_context_data(**kwargs)
         context['school'] = self.school
         context['school_slug'] = self.school_slug
-
-        # Clear any previous import errors and duplicates when displaying the form
-        if 'import_errors' in self.request.session:
-            del self.request.session['import_errors']
-
-        if 'duplicate_records' in self.request.session:
-            del self.request.session['duplicate_records']
-
+        context['recent_imports'] = ImportRun.objects.filter(school=self.school).select_related('standard', 'year')[:5]
         return context
 
     def form_valid(self, form):
@@ -1154,232 +1230,19 @@ class StudentBulkUploadView(LoginRequiredMixin, FormView):
             messages.warning(self.request, "Please upload a CSV file.")
             return self.form_invalid(form)
 
-        # Process the file
-        decoded_file = csv_file.read().decode('utf-8').splitlines()
-        reader = csv.DictReader(decoded_file)
-
-        # Convert to list to ensure we can iterate multiple times if needed
-        rows = list(reader)
-
-        # Check if file is empty or has no data rows
-        if not rows or len(rows) == 1:
-            messages.warning(self.request, "The uploaded CSV file is empty or has no data rows.")
-            return self.form_invalid(form)
-
-        # Track results
-        success_count = 0
-        error_records = []
-        duplicate_records = []
-
-        # Process each row
-        from django.db import transaction
-        for row_num, row in enumerate(rows, start=2):  # Start at 2 to account for header row
-            try:
-                # Validate required fields
-                required_fields = ['first_name', 'last_name', 'date_of_birth', 'parent_name']
-                for field in required_fields:
-                    if not row.get(field) or row.get(field).strip() == '':
-                        raise ValueError(f"Missing required field: {field}")
-
-                # Validate date format - try multiple formats
-                date_str = row['date_of_birth'].strip()
-                date_of_birth = None
-
-                # Try different date formats
-                date_formats = ['%Y-%m-%d', '%d/%m/%Y']
-                for date_format in date_formats:
-                    try:
-                        date_of_birth = datetime.strptime(date_str, date_format).date()
-                        break  # Exit the loop if successful
-                    except ValueError:
-                        continue  # Try the next format
-
-                # If all formats failed
-                if date_of_birth is None:
-                    raise ValueError("Invalid date format. Accepted formats: YYYY-MM-DD or DD/MM/YYYY.")
-
-                # Check for duplicate students
-                first_name = row['first_name'].strip()
-                last_name = row['last_name'].strip()
-                parent_name = row['parent_name'].strip()
-
-                # Check if a student with the same details already exists
-                existing_student = Student.objects.filter(
-                    first_name__iexact=first_name,
-                    last_name__iexact=last_name,
-                    date_of_birth=date_of_birth,
-                    parent_name__iexact=parent_name
-                ).first()
-
-                if existing_student:
-                    # Check if the student is already registered in this school
-                    school_registration = SchoolEnrollment.objects.filter(
-                        student=existing_student,
-                        school=self.school,
-                        is_active=True
-                    ).exists()
-
-                    # Check if the student is already assigned to a class in this school for this academic year
-                    existing_class_assignment = StandardEnrollment.objects.filter(
-                        student=existing_student,
-                        year=academic_year,
-                        standard__school=self.school
-                    ).exists()
-
-                    # Add to duplicate records - store only necessary info, not the entire object
-                    duplicate_records.append({
-                        'row': row_num,
-                        'data': row,
-                        'existing_student_id': existing_student.id,
-                        'existing_student_name': f"{existing_student.first_name} {existing_student.last_name}",
-                        'already_enrolled': existing_class_assignment,
-                        'same_school': school_registration,
-                        'school_name': existing_student.school_registrations.filter(is_active=True).first().school.name if existing_student.school_registrations.filter(is_active=True).exists() else 'Unknown'
-                    })
-                    continue  # Skip to the next row
-
-                # Create the student with transaction
-                with transaction.atomic():
-                    # Create the student
-                    student = Student.objects.create(
-                        first_name=first_name,
-                        last_name=last_name,
-                        date_of_birth=date_of_birth,
-                        parent_name=parent_name,
-                        contact_phone=row.get('contact_phone', '').strip(),
-                        is_active=True,
-                        created_by=self.request.user.profile
-                    )
-
-                    # First, enroll student in the school (persistent relationship)
-                    # Get the first term's start date or use a default date
-                    enrollment_date = academic_year.terms.first().start_date if academic_year.terms.exists() else date(academic_year.start_year, 9, 1)
-                    SchoolEnrollment.objects.get_or_create(
-                        school=self.school,
-                        student=student,
-                        defaults={
-                            'enrollment_date': enrollment_date,
-                            'is_active': True,
-                            'enrolled_by': self.request.user.profile
-                        }
-                    )
-
-                    # Then, assign student to the class for this year
-                    StandardEnrollment.objects.create(
-                        year=academic_year,
-                        standard=standard,
-                        student=student,
-                        enrolled_by=self.request.user.profile
-                    )
-
-                # Increment success count
-                success_count += 1
-
-            except Exception as e:
-                # Add to error records
-                error_records.append({
-                    'row': row_num,
-                    'data': row,
-                    'error': str(e)
-                })
-                # Continue processing the next row
-
-        # Display results
-        if success_count > 0:
-            messages.success(
-                self.request,
-                f"Successfully imported {success_count} students into {standard.get_name_display()} for the {academic_year} academic year."
-            )
-
-        # Handle error records
-        if error_records:
-            # Store error records in session for display
-            self.request.session['import_errors'] = error_records
-            err_table = """
-                <table class="table"><thead><tr>
-                    <th scope="col">first_name</th>
-                    <th scope="col">last_name</th>
-                    <th scope="col">date_of_birth</th>
-                    <th scope="col">parent_name</th>
-                    <th scope="col">contact_phone</th>
-                    <th scope="col"><i class="bi bi-exclamation-circle text-danger"></i><span class="text-danger">Error</span></th>
-                </tr></thead><tbody>"""
-            for error in error_records:
-                err_table += f"""
-                <tr>
-                    <td>{error['data']['first_name']}</td>
-                    <td>{error['data']['last_name']}</td>
-                    <td>{error['data']['date_of_birth']}</td>
-                    <td>{error['data']['parent_name']}</td>
-                    <td>{error['data'].get('contact_phone', '')}</td>
-                    <td class="text-danger">{error['error']}</td>
-                </tr>"""
-            err_table += "</tbody></table>"
-            from django.utils.safestring import mark_safe
-            messages.warning(
-                self.request,
-                mark_safe(f"Encountered {len(error_records)} errors during import. "
-                f"<button type='button' class='btn btn-link p-0 m-0 align-baseline' "
-                f"data-bs-toggle='collapse' data-bs-target='#csv-errors' aria-expanded='false'>View details</button>"
-                f'<div class="collapse" id="csv-errors">'
-                f'<div class="card card-body">'
-                f'{err_table}'
-                f'</div></div>'
-                )
-            )
-
-        # Handle duplicate records
-        if duplicate_records:
-            # Store duplicate records in session for display
-            self.request.session['duplicate_records'] = duplicate_records
-            dup_table = """
-                <table class="table"><thead><tr>
-                    <th scope="col">first_name</th>
-                    <th scope="col">last_name</th>
-                    <th scope="col">date_of_birth</th>
-                    <th scope="col">parent_name</th>
-                    <th scope="col">contact_phone</th>
-                    <th scope="col"><i class="bi bi-exclamation-triangle text-warning"></i><span class="text-warning">Existing Student</span></th>
-                </tr></thead><tbody>"""
-            for duplicate in duplicate_records:
-                student_id = duplicate['existing_student_id']
-                student_name = duplicate['existing_student_name']
-                school_name = duplicate['school_name']
-                same_school = duplicate['same_school']
-
-                # Prepare the message based on whether the student is in the same school or a different one
-                if same_school:
-                    duplicate_message = f"Student already exists in this school (ID: {student_id}, {student_name})"
-                else:
-                    duplicate_message = f"Student already exists in another school: {school_name} (ID: {student_id}, {student_name})"
-
-                dup_table += f"""
-                <tr>
-                    <td>{duplicate['data']['first_name']}</td>
-                    <td>{duplicate['data']['last_name']}</td>
-                    <td>{duplicate['data']['date_of_birth']}</td>
-                    <td>{duplicate['data']['parent_name']}</td>
-                    <td>{duplicate['data'].get('contact_phone', '')}</td>
-                    <td class="text-warning">
-                        {duplicate_message} -
-                        <a href="{reverse('schools:student_detail', kwargs={'school_slug': self.school_slug if same_school else duplicate['school_slug'], 'pk': student_id})}">View</a>
-                    </td>
-                </tr>"""
-            dup_table += "</tbody></table>"
-            from django.utils.safestring import mark_safe
-            messages.warning(
-                self.request,
-                mark_safe(f"Found {len(duplicate_records)} duplicate students during import. These records were not imported. "
-                f"<button type='button' class='btn btn-link p-0 m-0 align-baseline' "
-                f"data-bs-toggle='collapse' data-bs-target='#csv-duplicates' aria-expanded='false'>View details</button>"
-                f'<div class="collapse" id="csv-duplicates">'
-                f'<div class="card card-body">'
-                f'{dup_table}'
-                f'</div></div>'
-                )
-            )
+        # The file is stored with the run and imported by a background job
+        run = ImportRun.objects.create(
+            school=self.school,
+            standard=standard,
+            year=academic_year,
+            file=csv_file,
+            file_name=csv_file.name[:255],
+            created_by=self.request.user.profile
+        )
+        start_import(run)
 
-        return super().form_valid(form)
+        messages.info(self.request, f"Importing {csv_file.name} into {standard.get_name_display()} for the {academic_year} academic year.")
+        return redirect('schools:student_import_detail', school_slug=self.school_slug, pk=run.pk)
 
     def form_invalid(self, form):
         # Check for file validation errors (example)
@@ -1393,6 +1256,138 @@ class StudentBulkUploadView(LoginRequiredMixin, FormView):
         return super().form_invalid(form)
 
 
+class StudentImportDetailView(SchoolAdminRequiredMixin, DetailView):
+    """
+    Progress and results of a student CSV import. The rows that were not
+    imported or were flagged are paged; ?status=error, ?status=duplicate or
+    ?status=warning shows one kind.
+    """
+    model = ImportRun
+    template_name = 'schools/student_import_detail.html'
+    context_object_name = 'run'
+    rows_per_page = 50
+
+    def get_queryset(self):
+        return ImportRun.objects.filter(school=self.school).select_related('standard', 'year', 'created_by')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        status = self.request.GET.get('status')
+        if status not in ('error', 'duplicate', 'warning'):
+            status = None
+
+        rows = self.object.rows.select_related('existing_school', 'imported_student')
+        if status:
+            rows = rows.filter(status=status)
+        context['status'] = status
+        context['page_obj'] = Paginator(rows, self.rows_per_page).get_page(self.request.GET.get('page'))
+        return context
+
+
+class StudentImportProgressView(SchoolAdminRequiredMixin, View):
+    """Progress of a student CSV import as JSON, polled by the import page"""
+
+    def get(self, request, *args, **kwargs):
+        run = get_object_or_404(ImportRun, pk=kwargs['pk'], school=self.school)
+        return JsonResponse({
+            'status': run.status,
+            'finished': run.is_finished,
+            'total_rows': run.total_rows,
+            'processed_rows': run.processed_rows,
+            'percent': run.percent_complete,
+            'created': run.created_count,
+            'duplicates': run.duplicate_count,
+            'errors': run.error_count,
+            'warnings': run.warning_count,
+            'error_message': run.error_message,
+        })
+
+
+class StudentSearchView(SchoolAccessRequiredMixin, View):
+    """
+    Autocomplete endpoint: students matching ?q= (name, parent name or phone)
+    as JSON, limited to ?limit= results.
+
+    Principals and administration staff search the whole school, teachers
+    their current class.
+    """
+
+    def get(self, request, *args, **kwargs):
+        ctx = self.school_ctx
+        query = request.GET.get('q', '').strip()
+        try:
+            limit = int(request.GET.get('limit', 10))
+        except ValueError:
+            limit = 10
+
+        standard = None
+        if ctx.role == 'teacher':
+            standard = ctx.teacher_standard
+            if not standard:
+                return JsonResponse({'results': []})
+
+        students = search_students(self.school, query, year=ctx.year, standard=standard, limit=max(limit, 1))
+        classes = {row['standard_id']: row['display_name'] for row in get_cached_roster_summary(self.school, ctx.year)}
+
+        return JsonResponse({
+            'results': [
+                {
+                    'id': student['id'],
+                    'name': f"{student['first_name']} {student['last_name']}",
+                    'parent_name': student['parent_name'],
+                    'contact_phone': student['contact_phone'] or '',
+                    'class': classes.get(student['standard_id'], ''),
+                    'url': reverse('schools:student_detail', kwargs={
+                        'school_slug': self.school_slug, 'pk': student['id']
+                    }),
+                }
+                for student in students
+            ]
+        })
+
+
+class StudentExportView(SchoolAccessRequiredMixin, View):
+    """
+    Stream the student roster as CSV (or XLSX with ?format=xlsx).
+
+    Principals and administration staff export every class of the school, for
+    the current year or ?year=<id>, optionally limited to ?class=<id>.
+    Teachers export their current class only.
+    """
+
+    def get(self, request, *args, **kwargs):
+        ctx = self.school_ctx
+        year = ctx.year
+        standard = None
+
+        if ctx.role == 'teacher':
+            standard = ctx.teacher_standard
+            if not standard:
+                messages.warning(request, "You are not assigned to any class.")
+                return redirect('schools:student_list', school_slug=self.school_slug)
+        else:
+            year = get_filter_object(request, 'year', SchoolYear.objects.filter(school=self.school)) or year
+            standard = get_filter_object(request, 'class', Standard.objects.filter(school=self.school))
+
+        if not year:
+            messages.warning(request, "There is no current academic year to export.")
+            return redirect('schools:student_list', school_slug=self.school_slug)
+
+        header, rows = roster_rows(self.school, year, standard)
+        filename = f"{self.school_slug}-students-{year.start_year}"
+        if standard:
+            filename += f"-{standard.name.lower()}-{standard.group_number}"
+        return export_response(filename, header, rows, get_export_format(request))
+
+
+class EnrollmentHistoryExportView(SchoolAdminRequiredMixin, View):
+    """Stream every class assignment record of the school as CSV (or XLSX with ?format=xlsx)"""
+
+    def get(self, request, *args, **kwargs):
+        header, rows = enrollment_history_rows(self.school)
+        return export_response(f"{self.school_slug}-enrollment-history", header, rows, get_export_format(request))
+
+
 def student_csv_template(request, school_slug=None):
     """
     View for downloading a CSV template for student bulk upload
@@ -26,6 +26,10 @@ python manage.py collectstatic --noinput
 echo "Running database migrations..."
 python manage.py migrate
 
+# Create the database cache table (no-op if it exists or the cache is not database-backed)
+echo "Creating cache table..."
+python manage.py createcachetable
+
 # Create superuser if it doesn't exist (only if credentials are provided)
 if [ -n "$DJANGO_SUPERUSER_USERNAME" ] && [ -n "$DJANGO_SUPERUSER_EMAIL" ] && [ -n "$DJANGO_SUPERUSER_PASSWORD" ]; then
     echo "Creating superuser..."